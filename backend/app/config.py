@@ -26,6 +26,19 @@ class Settings:
     cloudsql_password: str
     cloudsql_database: str
     cloudsql_connect_timeout: int
+    cloudsql_pool_size: int
+    cloudsql_pool_recycle_seconds: float
+    cloudsql_pool_acquire_timeout: float
+    cloudsql_pool_health_check_seconds: float
+    catalog_cache_enabled: bool
+    catalog_cache_ttl_seconds: float
+    catalog_snapshot_enabled: bool
+    startup_warmup_enabled: bool
+    metrics_enabled: bool
+    profiling_enabled: bool
+    profiling_sample_rate: float
+    profiling_interval_ms: float
+    admin_token: Optional[str]
     gcp_project_id: str | None
     gcp_region: str
     gcp_firestore_database: str
@@ -33,7 +46,20 @@ class Settings:
     use_firestore: bool
     use_vertex_ai: bool
     vertex_model: str
+    vertex_stub_url: Optional[str]
     vertex_temperature: float
+    vertex_max_concurrency: int
+    vertex_shard_size: int
+    vertex_prompt_token_budget: int
+    vertex_streaming: bool
+    vertex_warmup_request: bool
+    llm_cache_enabled: bool
+    llm_cache_path: Optional[Path]
+    llm_cache_ttl_seconds: float
+    llm_cache_memory_entries: int
+    llm_cache_disk_entries: int
+    llm_cache_maintenance_seconds: float
+    llm_single_flight_enabled: bool
     base_dir: Path
     backend_dir: Path
     frontend_dir: Path
@@ -45,6 +71,7 @@ def load_settings() -> Settings:
     base_dir = Path(__file__).resolve().parents[2]
     frontend_dir = base_dir / "frontend"
     data_dir = backend_dir / "data"
+    llm_cache_path = os.getenv("LLM_CACHE_PATH", str(backend_dir / ".cache" / "llm_cache.sqlite3")).strip()
 
     return Settings(
         app_env=os.getenv("APP_ENV", "local"),
@@ -59,6 +86,19 @@ def load_settings() -> Settings:
         cloudsql_password=os.getenv("CLOUDSQL_PASSWORD", ""),
         cloudsql_database=os.getenv("CLOUDSQL_DATABASE", "hojokin_db"),
         cloudsql_connect_timeout=int(os.getenv("CLOUDSQL_CONNECT_TIMEOUT", "5")),
+        cloudsql_pool_size=int(os.getenv("CLOUDSQL_POOL_SIZE", "5")),
+        cloudsql_pool_recycle_seconds=float(os.getenv("CLOUDSQL_POOL_RECYCLE_SECONDS", "1800")),
+        cloudsql_pool_acquire_timeout=float(os.getenv("CLOUDSQL_POOL_ACQUIRE_TIMEOUT", "10")),
+        cloudsql_pool_health_check_seconds=float(os.getenv("CLOUDSQL_POOL_HEALTH_CHECK_SECONDS", "30")),
+        catalog_cache_enabled=_to_bool(os.getenv("CATALOG_CACHE_ENABLED"), True),
+        catalog_cache_ttl_seconds=float(os.getenv("CATALOG_CACHE_TTL_SECONDS", "30")),
+        catalog_snapshot_enabled=_to_bool(os.getenv("CATALOG_SNAPSHOT_ENABLED"), True),
+        startup_warmup_enabled=_to_bool(os.getenv("STARTUP_WARMUP_ENABLED"), True),
+        metrics_enabled=_to_bool(os.getenv("METRICS_ENABLED"), True),
+        profiling_enabled=_to_bool(os.getenv("PROFILING_ENABLED"), False),
+        profiling_sample_rate=float(os.getenv("PROFILING_SAMPLE_RATE", "0")),
+        profiling_interval_ms=float(os.getenv("PROFILING_INTERVAL_MS", "5")),
+        admin_token=os.getenv("ADMIN_TOKEN", "").strip() or None,
         gcp_project_id=os.getenv("GCP_PROJECT_ID"),
         gcp_region=os.getenv("GCP_REGION", "asia-northeast1"),
         gcp_firestore_database=os.getenv("GCP_FIRESTORE_DATABASE", "(default)"),
@@ -66,7 +106,20 @@ def load_settings() -> Settings:
         use_firestore=_to_bool(os.getenv("USE_FIRESTORE"), False),
         use_vertex_ai=_to_bool(os.getenv("USE_VERTEX_AI"), False),
         vertex_model=os.getenv("VERTEX_MODEL", "gemini-2.5-flash"),
+        vertex_stub_url=os.getenv("VERTEX_STUB_URL", "").strip() or None,
         vertex_temperature=float(os.getenv("VERTEX_TEMPERATURE", "0.2")),
+        vertex_max_concurrency=int(os.getenv("VERTEX_MAX_CONCURRENCY", "32")),
+        vertex_shard_size=int(os.getenv("VERTEX_SHARD_SIZE", "0")),
+        vertex_prompt_token_budget=int(os.getenv("VERTEX_PROMPT_TOKEN_BUDGET", "0")),
+        vertex_streaming=_to_bool(os.getenv("VERTEX_STREAMING"), True),
+        vertex_warmup_request=_to_bool(os.getenv("VERTEX_WARMUP_REQUEST"), False),
+        llm_cache_enabled=_to_bool(os.getenv("LLM_CACHE_ENABLED"), True),
+        llm_cache_path=Path(llm_cache_path) if llm_cache_path else None,
+        llm_cache_ttl_seconds=float(os.getenv("LLM_CACHE_TTL_SECONDS", "3600")),
+        llm_cache_memory_entries=int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "256")),
+        llm_cache_disk_entries=int(os.getenv("LLM_CACHE_DISK_ENTRIES", "10000")),
+        llm_cache_maintenance_seconds=float(os.getenv("LLM_CACHE_MAINTENANCE_SECONDS", "60")),
+        llm_single_flight_enabled=_to_bool(os.getenv("LLM_SINGLE_FLIGHT_ENABLED"), True),
         base_dir=base_dir,
         backend_dir=backend_dir,
         frontend_dir=frontend_dir,
@@ -1,25 +1,145 @@
 ﻿from __future__ import annotations
 
+import asyncio
+import json
+import threading
+from contextlib import asynccontextmanager, suppress
 from datetime import datetime
+from typing import AsyncIterator, Optional
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 
 from .config import load_settings
-from .models import ProgramRecommendation, RecommendationResponse, UserInput
-from .services.data_store import get_store
-from .services.rag_engine import recommend_programs
-from .services.vertex_llm import LLM_SCHEMA_DESCRIPTION, call_vertex_ai_batch
+from .models import (
+    BatchRecommendationItem,
+    BatchRecommendationRequest,
+    BatchRecommendationResponse,
+    LLMBatchProgramFormat,
+    ProgramRecommendation,
+    RecommendationResponse,
+    UserInput,
+)
+from .services.catalog_index import program_list_item
+from .services.data_store import AsyncProgramStore, get_async_store
+from .services.eligibility_matrix import CompiledCatalog
+from .services.rag_engine import (
+    recommend_programs,
+    recommend_programs_batch,
+    region_memo_stats,
+    remember_compiled_catalog,
+)
+from .services.llm_cache import llm_cache_stats
+from .services.llm_client import get_llm_client
+from .services.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from .services.metrics import RequestMetricsMiddleware, field_samples, gauge_lines, hit_ratio, registry, stage
+from .services.profiler import ProfilingMiddleware, SamplingProfiler, is_admin_token
+from .services.prompt_builder import prompt_stats
+from .services.program_record import ProgramLike, to_program
+from .services.stage_timing import StageTimings
+from .services.startup import StartupTracker
+from .services.vertex_llm import (
+    LLM_SCHEMA_DESCRIPTION,
+    call_vertex_ai_batch_async,
+    single_flight_stats,
+    stream_vertex_ai_batch,
+)
 
 load_dotenv()
 settings = load_settings()
-store = get_store(settings)
+startup = StartupTracker()
+registry.enabled = settings.metrics_enabled
+profiler: Optional[SamplingProfiler] = (
+    SamplingProfiler(interval=settings.profiling_interval_ms / 1000) if settings.profiling_enabled else None
+)
+_store: Optional[AsyncProgramStore] = None
+_store_lock = threading.Lock()
 
-app = FastAPI(title="自治体給付金・補助金 判定AI", version="mvp-0.1")
 TARGET_MUNICIPALITY = "港区"
+MAX_BATCH_USERS = 10000
+# enrich_top_n を指定したときに LLM で補う（ユーザーごとに Vertex AI を呼ぶ）ユーザー数の上限
+MAX_BATCH_ENRICH_USERS = 100
+# ルール判定をワーカースレッドで行う1回あたりのユーザー数
+BATCH_CHUNK_USERS = 500
+
+
+def current_store() -> AsyncProgramStore:
+    # ストアの生成（と DB クライアントの import）は起動処理か最初の利用時まで遅らせる
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = get_async_store(settings)
+    return _store
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    phases = {}
+    if settings.startup_warmup_enabled:
+        phases = {"store": True, "catalog": True}
+        if settings.use_vertex_ai:
+            # LLM クライアントの準備はリクエストを受ける条件にはしない
+            phases["llm_client"] = False
+    startup.begin(phases)
+    # 重い処理はバックグラウンドで行い、/api/health にはすぐ応答できるようにする
+    warm_up = asyncio.create_task(_warm_up()) if phases else None
+    try:
+        yield
+    finally:
+        if warm_up is not None:
+            warm_up.cancel()
+            with suppress(asyncio.CancelledError):
+                await warm_up
+        close = getattr(_store, "close", None)
+        if close is not None:
+            await close()
+
+
+async def _warm_up() -> None:
+    await startup.run("store", lambda: asyncio.to_thread(current_store))
+    steps = [startup.run("catalog", _warm_catalog)]
+    if "llm_client" in startup.phases:
+        steps.append(startup.run("llm_client", _warm_llm_client))
+    await asyncio.gather(*steps)
+
+
+async def _warm_llm_client() -> dict:
+    client = get_llm_client()
+    if not await asyncio.to_thread(client.warm_up, settings):
+        metrics = client.metrics()
+        raise RuntimeError(metrics["warmup_error"] or metrics["last_error"] or "Vertex AI client is not available")
+    return client.metrics()
+
+
+async def _warm_catalog() -> int:
+    programs = await current_store().list_programs(TARGET_MUNICIPALITY)
+
+    def compile_programs() -> CompiledCatalog:
+        # 内容ハッシュ（cached_property）もここで計算しておく
+        catalog = CompiledCatalog(programs)
+        catalog.fingerprint
+        return catalog
+
+    remember_compiled_catalog(await asyncio.to_thread(compile_programs))
+    return len(programs)
+
+
+app = FastAPI(title="自治体給付金・補助金 判定AI", version="mvp-0.1", lifespan=lifespan)
+
+if settings.metrics_enabled:
+    app.add_middleware(RequestMetricsMiddleware)
+if profiler is not None:
+    # 無効時はミドルウェア自体を登録しない（リクエストごとのコストなし）
+    app.add_middleware(
+        ProfilingMiddleware,
+        profiler=profiler,
+        sample_rate=settings.profiling_sample_rate,
+        admin_token=settings.admin_token,
+    )
 
 app.add_middleware(
     CORSMiddleware,
@@ -54,43 +174,291 @@ async def health() -> dict:
     }
 
 
+@app.get("/api/ready")
+async def ready() -> JSONResponse:
+    # /api/health は生存確認、こちらはカタログの読み込みなど起動処理の完了を返す
+    return JSONResponse(startup.as_dict(), status_code=200 if startup.ready else 503)
+
+
 @app.get("/api/llm/format")
 async def llm_format() -> dict:
     return {"format": LLM_SCHEMA_DESCRIPTION}
 
 
+@app.get("/api/store/metrics")
+async def store_metrics() -> dict:
+    store = current_store()
+    pool_metrics = getattr(store, "pool_metrics", None)
+    cache_metrics = getattr(store, "cache_metrics", None)
+    return {
+        "store": type(store).__name__,
+        "pool": pool_metrics() if pool_metrics else None,
+        "cache": cache_metrics() if cache_metrics else None,
+    }
+
+
+@app.get("/api/metrics")
+async def metrics() -> PlainTextResponse:
+    # Prometheus のテキスト形式。段階ごとの所要時間・LLM 呼び出し・キャッシュ・ストアの統計
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+
+def _runtime_metrics() -> list[str]:
+    # 他のモジュールが持っている統計値は、スクレイプ時にだけ読み取る
+    lines: list[str] = []
+    llm_caches = llm_cache_stats()
+    lines += gauge_lines(
+        "hojokin_llm_cache_hit_ratio",
+        "LLM response cache hit ratio by namespace.",
+        [({"namespace": stats["namespace"]}, stats["hit_ratio"]) for stats in llm_caches],
+    )
+    lines += gauge_lines(
+        "hojokin_llm_cache",
+        "LLM response cache counters by namespace.",
+        [sample for stats in llm_caches for sample in field_samples(stats, namespace=stats["namespace"])],
+    )
+    prompt = prompt_stats()
+    lines += gauge_lines(
+        "hojokin_prompt_fragment_hit_ratio",
+        "Prompt fragment cache hit ratio.",
+        [({}, hit_ratio(prompt["hits"], prompt["misses"]))],
+    )
+    lines += gauge_lines("hojokin_prompt_fragments", "Prompt fragment cache counters.", field_samples(prompt))
+    memo = region_memo_stats()
+    lines += gauge_lines(
+        "hojokin_rule_memo_hit_ratio",
+        "Rule-engine result memo hit ratio (users in the same threshold region).",
+        [({}, hit_ratio(memo["hits"], memo["misses"]))],
+    )
+    lines += gauge_lines("hojokin_rule_memo", "Rule-engine result memo counters.", field_samples(memo))
+    lines += gauge_lines(
+        "hojokin_llm_single_flight",
+        "Concurrent identical Vertex AI calls: leader calls, coalesced waiters, shared failures.",
+        field_samples(single_flight_stats()),
+    )
+    store = _store
+    if store is not None:
+        cache_metrics = getattr(store, "cache_metrics", None)
+        if cache_metrics is not None:
+            cache = cache_metrics()
+            lines += gauge_lines(
+                "hojokin_catalog_cache_hit_ratio",
+                "Catalog cache hit ratio (stale hits count as hits).",
+                [({}, hit_ratio(cache.get("hits", 0) + cache.get("stale_hits", 0), cache.get("misses", 0)))],
+            )
+            lines += gauge_lines("hojokin_catalog_cache", "Catalog cache counters.", field_samples(cache))
+        pool_metrics = getattr(store, "pool_metrics", None)
+        lines += gauge_lines(
+            "hojokin_store_pool", "Database connection pool state.", field_samples(pool_metrics() if pool_metrics else None)
+        )
+    lines += gauge_lines("hojokin_llm_client", "Vertex AI client initialisation.", field_samples(get_llm_client().metrics()))
+    return lines
+
+
+registry.register_collector(_runtime_metrics)
+
+
+def _require_profiler(token: Optional[str]) -> SamplingProfiler:
+    # 管理用エンドポイントは ADMIN_TOKEN が設定され、一致したときだけ使える
+    if profiler is None or not settings.admin_token:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not is_admin_token(settings.admin_token, token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    return profiler
+
+
+@app.get("/api/admin/profile")
+async def admin_profile(
+    reset: bool = False,
+    x_admin_token: Optional[str] = Header(default=None),
+) -> PlainTextResponse:
+    # flamegraph.pl / speedscope にそのまま渡せる collapsed 形式（"thread;outer;...;leaf 件数"）
+    active = _require_profiler(x_admin_token)
+    body = active.collapsed()
+    if reset:
+        active.reset()
+    return PlainTextResponse(body)
+
+
+@app.get("/api/admin/profile/stats")
+async def admin_profile_stats(x_admin_token: Optional[str] = Header(default=None)) -> dict:
+    return _require_profiler(x_admin_token).stats()
+
+
+@app.delete("/api/admin/profile")
+async def admin_profile_reset(x_admin_token: Optional[str] = Header(default=None)) -> dict:
+    active = _require_profiler(x_admin_token)
+    active.reset()
+    return active.stats()
+
+
+@app.get("/api/llm/cache")
+async def llm_cache() -> dict:
+    return {"caches": llm_cache_stats(), "prompt": prompt_stats(), "single_flight": single_flight_stats()}
+
+
+@app.get("/api/llm/client")
+async def llm_client_metrics() -> dict:
+    return get_llm_client().metrics()
+
+
 @app.post("/api/recommendations", response_model=RecommendationResponse)
-async def recommendations(payload: UserInput) -> RecommendationResponse:
+async def recommendations(payload: UserInput, response: Response) -> RecommendationResponse:
+    # 段階ごとの所要時間を Server-Timing ヘッダーで返す（負荷試験の集計に使う）
+    timings = StageTimings()
+    with timings.stage("rules"):
+        programs, base_results, meta = await _rule_recommendations(payload)
+    with timings.stage("llm"):
+        llm_result_map = await call_vertex_ai_batch_async(
+            user=payload,
+            programs=programs,
+            base_recommendations=base_results,
+            settings=settings,
+        )
+    if not llm_result_map:
+        raise HTTPException(
+            status_code=503,
+            detail="Failed to generate reasons/todo/evidence from Vertex AI. Please retry.",
+            headers={"Server-Timing": timings.header()},
+        )
+
+    with timings.stage("merge"):
+        results = _merge_llm_results(base_results, llm_result_map)
+    response.headers["Server-Timing"] = timings.header()
+    return RecommendationResponse(
+        municipality=TARGET_MUNICIPALITY,
+        results=results,
+        meta=meta,
+    )
+
+
+@app.post("/api/recommendations/stream")
+async def recommendations_stream(payload: UserInput) -> StreamingResponse:
+    # ルール判定の結果をすぐに送り、LLM の reasons/todo/evidence は制度ごとに届いた順に送る (Server-Sent Events)
+    programs, base_results, meta = await _rule_recommendations(payload)
+
+    async def events() -> AsyncIterator[str]:
+        yield _sse_event(
+            "rules",
+            RecommendationResponse(municipality=TARGET_MUNICIPALITY, results=base_results, meta=meta).model_dump(),
+        )
+        base_by_id = {item.program_id: item for item in base_results}
+        completed: set[str] = set()
+        try:
+            async for llm_item in stream_vertex_ai_batch(payload, programs, base_results, settings):
+                base = base_by_id.get(llm_item.program_id)
+                if base is None or llm_item.program_id in completed:
+                    continue
+                completed.add(llm_item.program_id)
+                merged = _merge_llm_results([base], {llm_item.program_id: llm_item})[0]
+                yield _sse_event("program", merged.model_dump())
+        except Exception:
+            yield _sse_event("error", {"detail": "Failed to generate reasons/todo/evidence from Vertex AI."})
+        yield _sse_event(
+            "done",
+            {
+                "completed": len(completed),
+                "missing": [item.program_id for item in base_results if item.program_id not in completed],
+            },
+        )
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _rule_recommendations(payload: UserInput) -> tuple[list[ProgramLike], list[ProgramRecommendation], dict]:
     if payload.municipality and payload.municipality != TARGET_MUNICIPALITY:
         raise HTTPException(status_code=400, detail=f"Supported municipality is only {TARGET_MUNICIPALITY}")
-    municipality = TARGET_MUNICIPALITY
-    programs = store.list_programs(TARGET_MUNICIPALITY)
+    with stage("store"):
+        programs = await current_store().list_programs(TARGET_MUNICIPALITY)
 
-    base_results = recommend_programs(payload, programs)
+    meta = {"model": "gcp-vertex-optional", "version": "mvp-0.1"}
+    with stage("recommend"):
+        base_results = recommend_programs(payload, programs)
     if not settings.use_vertex_ai:
         raise HTTPException(
             status_code=503,
             detail="USE_VERTEX_AI=true is required because reasons/todo/evidence must be generated by LLM.",
         )
-    llm_result_map = call_vertex_ai_batch(
-        user=payload,
-        programs=programs,
-        base_recommendations=base_results,
-        settings=settings,
-    )
-    if not llm_result_map:
+    return programs, base_results, meta
+
+
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/api/recommendations/batch", response_model=BatchRecommendationResponse)
+async def batch_recommendations(payload: BatchRecommendationRequest) -> BatchRecommendationResponse:
+    if len(payload.users) > MAX_BATCH_USERS:
+        raise HTTPException(status_code=400, detail=f"Up to {MAX_BATCH_USERS} users are supported per batch")
+    for user in payload.users:
+        if user.municipality and user.municipality != TARGET_MUNICIPALITY:
+            raise HTTPException(status_code=400, detail=f"Supported municipality is only {TARGET_MUNICIPALITY}")
+    if payload.enrich_top_n and len(payload.users) > MAX_BATCH_ENRICH_USERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Up to {MAX_BATCH_ENRICH_USERS} users are supported per batch when enrich_top_n is set",
+        )
+    if payload.enrich_top_n and not settings.use_vertex_ai:
         raise HTTPException(
             status_code=503,
-            detail="Failed to generate reasons/todo/evidence from Vertex AI. Please retry.",
+            detail="USE_VERTEX_AI=true is required to enrich batch results with LLM.",
+        )
+    programs = await current_store().list_programs(TARGET_MUNICIPALITY)
+
+    # ルール判定のみの結果を users × programs の行列計算で一括生成する。
+    # 大きなバッチでもイベントループを塞がないよう、チャンクごとにワーカースレッドで計算する
+    batch_results: list[list[ProgramRecommendation]] = []
+    for start in range(0, len(payload.users), BATCH_CHUNK_USERS):
+        chunk = payload.users[start : start + BATCH_CHUNK_USERS]
+        batch_results += await asyncio.to_thread(recommend_programs_batch, chunk, programs, limit=payload.limit)
+
+    async def enrich(user: UserInput, base_results: list[ProgramRecommendation]) -> list[ProgramRecommendation]:
+        top_results = base_results[: payload.enrich_top_n]
+        llm_result_map = await call_vertex_ai_batch_async(
+            user=user,
+            programs=programs,
+            base_recommendations=top_results,
+            settings=settings,
+        )
+        return _merge_llm_results(top_results, llm_result_map) + base_results[len(top_results) :]
+
+    if payload.enrich_top_n:
+        # ユーザーごとの LLM 呼び出しは並行に発行する（同時実行数は VERTEX_MAX_CONCURRENCY で制限）
+        batch_results = await asyncio.gather(
+            *(enrich(user, base_results) for user, base_results in zip(payload.users, batch_results))
         )
 
+    items = [
+        BatchRecommendationItem(user_id=user.user_id, results=base_results)
+        for user, base_results in zip(payload.users, batch_results)
+    ]
+    return BatchRecommendationResponse(
+        municipality=TARGET_MUNICIPALITY,
+        items=items,
+        meta={
+            "model": "gcp-vertex-optional" if payload.enrich_top_n else "rule-engine",
+            "version": "mvp-0.1",
+            "users": len(items),
+        },
+    )
+
+
+def _merge_llm_results(
+    base_results: list[ProgramRecommendation],
+    llm_result_map: dict[str, LLMBatchProgramFormat] | None,
+) -> list[ProgramRecommendation]:
     results: list[ProgramRecommendation] = []
     for item in base_results:
-        llm_item = llm_result_map.get(item.program_id)
-        
+        llm_item = (llm_result_map or {}).get(item.program_id)
+
         # AIが回答を生成できなかった場合のフォールバック（不整合を許容して表示を優先）
         if not llm_item:
-            from .models import Deadline # インポートが必要なら追加
             results.append(
                 ProgramRecommendation(
                     program_id=item.program_id,
@@ -104,7 +472,7 @@ async def recommendations(payload: UserInput) -> RecommendationResponse:
                 )
             )
             continue
-            
+
         results.append(
             ProgramRecommendation(
                 program_id=item.program_id,
@@ -117,11 +485,7 @@ async def recommendations(payload: UserInput) -> RecommendationResponse:
                 evidence=llm_item.evidence,
             )
         )
-    return RecommendationResponse(
-        municipality=municipality,
-        results=results,
-        meta={"model": "gcp-vertex-optional", "version": "mvp-0.1"},
-    )
+    return results
 
 
 @app.get("/api/programs")
@@ -129,26 +493,20 @@ async def list_programs(municipality: str | None = None) -> dict:
     selected = TARGET_MUNICIPALITY if municipality is None else municipality
     if selected != TARGET_MUNICIPALITY:
         raise HTTPException(status_code=400, detail=f"Supported municipality is only {TARGET_MUNICIPALITY}")
-    programs = store.list_programs(TARGET_MUNICIPALITY)
-    return {
-        "programs": [
-            {
-                "program_id": p.program_id,
-                "program_name": p.program_name,
-                "municipality": p.municipality,
-                "summary": p.summary,
-                "deadline": p.deadline,
-            }
-            for p in programs
-        ]
-    }
+    list_program_items = getattr(current_store(), "list_program_items", None)
+    if list_program_items is not None:
+        # ストア側で事前計算した一覧表示用の射影をそのまま返す
+        return {"programs": await list_program_items(TARGET_MUNICIPALITY)}
+    programs = await current_store().list_programs(TARGET_MUNICIPALITY)
+    return {"programs": [program_list_item(p) for p in programs]}
 
 
 @app.get("/api/programs/{program_id}")
 async def program_detail(program_id: str) -> dict:
-    program = store.get_program(program_id)
+    program = await current_store().get_program(program_id)
     if not program:
         raise HTTPException(status_code=404, detail="Program not found")
     if program.municipality != TARGET_MUNICIPALITY:
         raise HTTPException(status_code=404, detail="Program not found")
-    return program.model_dump()
+    # 内部表現（ProgramRecord）から API のモデルへはここで変換する
+    return to_program(program).model_dump()
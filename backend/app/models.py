@@ -57,6 +57,27 @@ class UserInput(BaseModel):
     user_id: Optional[str] = None
 
 
+# バッチで LLM に送る1ユーザーあたりの制度数の上限
+MAX_ENRICH_TOP_N = 20
+
+
+class BatchRecommendationRequest(BaseModel):
+    users: List[UserInput] = Field(min_length=1)
+    limit: Optional[int] = Field(default=None, ge=1)
+    enrich_top_n: int = Field(default=0, ge=0, le=MAX_ENRICH_TOP_N)
+
+
+class BatchRecommendationItem(BaseModel):
+    user_id: Optional[str]
+    results: List[ProgramRecommendation]
+
+
+class BatchRecommendationResponse(BaseModel):
+    municipality: str
+    items: List[BatchRecommendationItem]
+    meta: dict
+
+
 class Eligibility(BaseModel):
     age_min: Optional[int] = None
     age_max: Optional[int] = None
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Set
+
+from . import catalog_events
+from .catalog_index import program_list_item
+from .program_record import ProgramLike, ProgramRecord, to_records
+
+
+@dataclass
+class _CatalogEntry:
+    programs: List[ProgramRecord]
+    by_id: Dict[str, ProgramRecord]
+    version: Optional[str]
+    checked_at: float
+    list_items: Optional[List[dict]] = None
+
+
+class CachedProgramStore:
+    """Read-through catalog cache with stale-while-revalidate semantics.
+
+    Parsed programs are kept per municipality as `ProgramRecord` lists. Once an entry is older than
+    `ttl_seconds`, requests keep getting it while a background task compares the
+    store's cheap `catalog_version()` watermark and reloads only when it moved.
+    """
+
+    def __init__(self, store, ttl_seconds: float):
+        self.store = store
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[str, _CatalogEntry] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self._background: Set[asyncio.Task] = set()
+        self._counters: Dict[str, int] = {
+            "hits": 0,
+            "misses": 0,
+            "stale_hits": 0,
+            "version_checks": 0,
+            "reloads": 0,
+            "refresh_errors": 0,
+        }
+
+    async def list_programs(self, municipality: Optional[str] = None) -> List[ProgramRecord]:
+        key = municipality or ""
+        entry = self._entries.get(key)
+        if entry is None:
+            self._counters["misses"] += 1
+            entry = await self._load(key, municipality)
+            return entry.programs
+        if time.monotonic() - entry.checked_at >= self.ttl_seconds:
+            self._counters["stale_hits"] += 1
+            self._schedule_refresh(key, municipality)
+        else:
+            self._counters["hits"] += 1
+        return entry.programs
+
+    async def list_program_items(self, municipality: Optional[str] = None) -> List[dict]:
+        programs = await self.list_programs(municipality)
+        entry = self._entries.get(municipality or "")
+        if entry is None or entry.programs is not programs:
+            return [program_list_item(program) for program in programs]
+        if entry.list_items is None:
+            entry.list_items = [program_list_item(program) for program in programs]
+        return entry.list_items
+
+    async def get_program(self, program_id: str) -> Optional[ProgramLike]:
+        for entry in self._entries.values():
+            program = entry.by_id.get(program_id)
+            if program is not None:
+                return program
+        return await self.store.get_program(program_id)
+
+    async def get_programs(self, program_ids: Sequence[str]) -> List[ProgramLike]:
+        found: Dict[str, ProgramLike] = {}
+        for entry in self._entries.values():
+            for program_id in program_ids:
+                program = entry.by_id.get(program_id)
+                if program is not None:
+                    found[program_id] = program
+        missing = [program_id for program_id in program_ids if program_id not in found]
+        if missing:
+            for program in await self.store.get_programs(missing):
+                found[program.program_id] = program
+        return [found[program_id] for program_id in program_ids if program_id in found]
+
+    def invalidate(self, municipality: Optional[str] = None) -> None:
+        if municipality is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(municipality, None)
+
+    def cache_metrics(self) -> dict:
+        return {
+            "municipalities": len(self._entries),
+            "programs": sum(len(entry.programs) for entry in self._entries.values()),
+            **self._counters,
+        }
+
+    def pool_metrics(self) -> Optional[dict]:
+        pool_metrics = getattr(self.store, "pool_metrics", None)
+        return pool_metrics() if pool_metrics else None
+
+    async def close(self) -> None:
+        for task in list(self._background):
+            task.cancel()
+        close = getattr(self.store, "close", None)
+        if close:
+            await close()
+
+    async def _load(self, key: str, municipality: Optional[str]) -> _CatalogEntry:
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                return entry
+            # 先に版を取ってから読むことで、読み込み中の更新は次回の確認で検出される
+            version = await self._catalog_version(municipality)
+            programs = to_records(await self.store.list_programs(municipality))
+            entry = self._store_entry(key, programs, version)
+            return entry
+
+    def _schedule_refresh(self, key: str, municipality: Optional[str]) -> None:
+        if key in self._refreshing:
+            return
+        task = asyncio.create_task(self._refresh(key, municipality))
+        self._refreshing[key] = task
+        self._background.add(task)
+
+        def done(finished: asyncio.Task) -> None:
+            self._background.discard(finished)
+            if self._refreshing.get(key) is finished:
+                del self._refreshing[key]
+
+        task.add_done_callback(done)
+
+    async def _refresh(self, key: str, municipality: Optional[str]) -> None:
+        entry = self._entries.get(key)
+        try:
+            version = await self._catalog_version(municipality)
+            if entry is not None and version is not None and version == entry.version:
+                entry.checked_at = time.monotonic()
+                return
+            programs = to_records(await self.store.list_programs(municipality))
+        except Exception:
+            # 失敗しても古いカタログで応答を続け、次の TTL 経過後に再確認する
+            self._counters["refresh_errors"] += 1
+            if entry is not None:
+                entry.checked_at = time.monotonic()
+            return
+        if entry is not None and programs == entry.programs:
+            # 版を持たないストアでも、内容が同じなら既存のオブジェクトを使い続ける（コンパイル済みカタログを再利用できる）
+            entry.version = version
+            entry.checked_at = time.monotonic()
+            return
+        self._store_entry(key, programs, version)
+        catalog_events.notify_catalog_changed(municipality)
+
+    async def _catalog_version(self, municipality: Optional[str]) -> Optional[str]:
+        catalog_version = getattr(self.store, "catalog_version", None)
+        if catalog_version is None:
+            return None
+        self._counters["version_checks"] += 1
+        try:
+            return await catalog_version(municipality)
+        except Exception:
+            return None
+
+    def _store_entry(self, key: str, programs: List[ProgramRecord], version: Optional[str]) -> _CatalogEntry:
+        self._counters["reloads"] += 1
+        entry = _CatalogEntry(
+            programs=programs,
+            by_id={program.program_id: program for program in programs},
+            version=version,
+            checked_at=time.monotonic(),
+        )
+        self._entries[key] = entry
+        return entry
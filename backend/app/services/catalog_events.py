@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+from typing import Callable, List, Optional
+
+CatalogListener = Callable[[Optional[str]], None]
+
+_listeners: List[CatalogListener] = []
+
+
+def subscribe(listener: CatalogListener) -> None:
+    if listener not in _listeners:
+        _listeners.append(listener)
+
+
+def unsubscribe(listener: CatalogListener) -> None:
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+
+def notify_catalog_changed(municipality: Optional[str] = None) -> None:
+    # 制度カタログが変わったら、コンパイル済みカタログや索引などの派生データを作り直させる
+    for listener in list(_listeners):
+        listener(municipality)
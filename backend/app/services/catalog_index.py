@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Sequence
+
+from .program_record import ProgramLike, ProgramRecord
+
+
+def program_list_item(program: ProgramLike) -> dict:
+    # /api/programs の一覧表示用の射影
+    return {
+        "program_id": program.program_id,
+        "program_name": program.program_name,
+        "municipality": program.municipality,
+        "summary": program.summary,
+        "deadline": program.deadline,
+    }
+
+
+class CatalogIndex:
+    """In-memory lookup structures built once per loaded catalog.
+
+    Lookups by id are O(1), and the per-municipality partitions and list-view
+    projections are returned as-is (callers must not mutate them), so repeated
+    calls also hand back the same list objects.
+    """
+
+    def __init__(self, programs: Sequence[ProgramRecord]):
+        self.programs: List[ProgramRecord] = list(programs)
+        self.by_id: Dict[str, ProgramRecord] = {}
+        self.by_municipality: Dict[str, List[ProgramRecord]] = {}
+        for program in self.programs:
+            # id が重複した場合は従来の線形探索と同じく先頭を優先する
+            self.by_id.setdefault(program.program_id, program)
+            self.by_municipality.setdefault(program.municipality, []).append(program)
+
+        items = {id(program): program_list_item(program) for program in self.programs}
+        self.list_items: List[dict] = [items[id(program)] for program in self.programs]
+        self.list_items_by_municipality: Dict[str, List[dict]] = {
+            municipality: [items[id(program)] for program in programs]
+            for municipality, programs in self.by_municipality.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.programs)
+
+    def list_programs(self, municipality: Optional[str] = None) -> List[ProgramRecord]:
+        if municipality:
+            return self.by_municipality.get(municipality, [])
+        return self.programs
+
+    def list_program_items(self, municipality: Optional[str] = None) -> List[dict]:
+        if municipality:
+            return self.list_items_by_municipality.get(municipality, [])
+        return self.list_items
+
+    def get_program(self, program_id: str) -> Optional[ProgramRecord]:
+        return self.by_id.get(program_id)
+
+    def get_programs(self, program_ids: Sequence[str]) -> List[ProgramRecord]:
+        by_id = self.by_id
+        return [by_id[program_id] for program_id in program_ids if program_id in by_id]
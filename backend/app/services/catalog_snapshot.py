@@ -0,0 +1,312 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from ..models import Program
+from .catalog_index import program_list_item
+from .program_record import EligibilityRecord, ProgramRecord
+
+MAGIC = b"HJKCAT\x00\x01"
+FORMAT_VERSION = 1
+# magic, format_version, program_count, string_count, list_length, source_sha256,
+# string_offsets, string_data, records, lists, id_order のオフセット
+HEADER = struct.Struct("<8sIIII32sQQQQQ")
+
+NONE_ID = 0xFFFFFFFF
+NONE_INT = int(np.iinfo(np.int64).min)
+
+STRING_FIELDS = ("program_id", "program_name", "municipality", "summary", "deadline", "notes")
+INT_FIELDS = (
+    "age_min",
+    "age_max",
+    "income_min_yen",
+    "income_max_yen",
+    "household_min",
+    "household_max",
+    "dependents_min",
+    "dependents_max",
+)
+LIST_FIELDS = ("gender_keywords", "occupation_keywords", "gray_zone_guidance")
+
+RECORD_DTYPE = np.dtype(
+    [(name, "<u4") for name in STRING_FIELDS]
+    + [(name, "<i8") for name in INT_FIELDS]
+    # (開始位置, 件数)。件数 NONE_ID は None を表す
+    + [(name, "<u4", (2,)) for name in LIST_FIELDS],
+    align=True,
+)
+
+
+class SnapshotFormatError(ValueError):
+    pass
+
+
+def source_digest(path: Path) -> bytes:
+    return hashlib.sha256(path.read_bytes()).digest()
+
+
+def compile_snapshot(source_path: Path, output_path: Path) -> int:
+    """Compile seed_programs.json into a snapshot file and return the program count."""
+    raw = source_path.read_bytes()
+    programs = [Program.model_validate(item) for item in json.loads(raw.decode("utf-8"))]
+    payload = build_snapshot(programs, hashlib.sha256(raw).digest())
+    # 既存ファイルを mmap 中のワーカーがいても壊さないよう、別名で書いてから置き換える
+    tmp_path = output_path.with_name(output_path.name + ".tmp")
+    tmp_path.write_bytes(payload)
+    os.replace(tmp_path, output_path)
+    return len(programs)
+
+
+def build_snapshot(programs: Sequence[Program], digest: bytes) -> bytes:
+    strings: Dict[str, int] = {}
+
+    def intern(value: Optional[str]) -> int:
+        if value is None:
+            return NONE_ID
+        return strings.setdefault(value, len(strings))
+
+    records = np.zeros(len(programs), dtype=RECORD_DTYPE)
+    lists: List[int] = []
+    for idx, program in enumerate(programs):
+        eligibility = program.eligibility
+        record = records[idx]
+        for name in STRING_FIELDS:
+            source = eligibility if name == "notes" else program
+            record[name] = intern(getattr(source, name))
+        for name in INT_FIELDS:
+            value = getattr(eligibility, name)
+            record[name] = NONE_INT if value is None else value
+        for name in LIST_FIELDS:
+            source = program if name == "gray_zone_guidance" else eligibility
+            values = getattr(source, name)
+            if values is None:
+                record[name] = (0, NONE_ID)
+            else:
+                record[name] = (len(lists), len(values))
+                lists.extend(intern(value) for value in values)
+
+    encoded = [value.encode("utf-8") for value in strings]
+    string_offsets = np.zeros(len(encoded) + 1, dtype="<u8")
+    np.cumsum([len(value) for value in encoded], out=string_offsets[1:])
+    # id 順の並びを持っておき、読み込み時は二分探索で引く（同じ id は先頭を優先）
+    id_order = np.array(
+        sorted(range(len(programs)), key=lambda idx: (programs[idx].program_id, idx)),
+        dtype="<u4",
+    )
+
+    sections = [
+        string_offsets.tobytes(),
+        b"".join(encoded),
+        records.tobytes(),
+        np.asarray(lists, dtype="<u4").tobytes(),
+        id_order.tobytes(),
+    ]
+    offsets = []
+    body = bytearray()
+    for section in sections:
+        # numpy の view を揃えられるよう各セクションを 8 バイト境界に置く
+        body.extend(b"\0" * (-(HEADER.size + len(body)) % 8))
+        offsets.append(HEADER.size + len(body))
+        body.extend(section)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, len(programs), len(encoded), len(lists), digest, *offsets)
+    return header + bytes(body)
+
+
+class CatalogSnapshot:
+    """Read-only view over a memory-mapped catalog snapshot.
+
+    Columns are numpy views on the mapping, so the pages are shared by every
+    process that opens the same file. Strings and `ProgramRecord` objects are
+    only decoded when they are asked for.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        with path.open("rb") as handle:
+            self._mm = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mm) < HEADER.size:
+            raise SnapshotFormatError(f"{path} is too small to be a catalog snapshot")
+        (
+            magic,
+            version,
+            count,
+            string_count,
+            list_length,
+            self.source_digest,
+            string_offsets_at,
+            self._string_data_at,
+            records_at,
+            lists_at,
+            id_order_at,
+        ) = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise SnapshotFormatError(f"{path} is not a version {FORMAT_VERSION} catalog snapshot")
+        self._string_offsets = np.frombuffer(self._mm, dtype="<u8", count=string_count + 1, offset=string_offsets_at)
+        self.records = np.frombuffer(self._mm, dtype=RECORD_DTYPE, count=count, offset=records_at)
+        self._lists = np.frombuffer(self._mm, dtype="<u4", count=list_length, offset=lists_at)
+        self._id_order = np.frombuffer(self._mm, dtype="<u4", count=count, offset=id_order_at)
+        self._strings: Dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def string(self, string_id: int) -> Optional[str]:
+        if string_id == NONE_ID:
+            return None
+        value = self._strings.get(string_id)
+        if value is None:
+            start = self._string_data_at + int(self._string_offsets[string_id])
+            end = self._string_data_at + int(self._string_offsets[string_id + 1])
+            value = self._mm[start:end].decode("utf-8")
+            self._strings[string_id] = value
+        return value
+
+    def find(self, program_id: str) -> Optional[int]:
+        order = self._id_order
+        pos = bisect_left(range(len(order)), program_id, key=lambda i: self._field(int(order[i]), "program_id"))
+        if pos < len(order):
+            index = int(order[pos])
+            if self._field(index, "program_id") == program_id:
+                return index
+        return None
+
+    def municipality_indices(self, municipality: str) -> np.ndarray:
+        column = self.records["municipality"]
+        for string_id in np.unique(column):
+            if self.string(int(string_id)) == municipality:
+                return np.flatnonzero(column == string_id)
+        return np.zeros(0, dtype=np.int64)
+
+    def program(self, index: int) -> ProgramRecord:
+        return self.programs([index])[0]
+
+    def programs(self, indices: Sequence[int]) -> List[ProgramRecord]:
+        # 列ごとにまとめて Python 値へ変換してから組み立てる（レコード単位のアクセスは遅い）
+        records = self.records[np.asarray(indices, dtype=np.int64)]
+        string = self.string
+        strings = {name: [string(value) for value in records[name].tolist()] for name in STRING_FIELDS}
+        ints = {
+            name: [None if value == NONE_INT else value for value in records[name].tolist()]
+            for name in INT_FIELDS
+        }
+        lists = {name: [self._list(start, count) for start, count in records[name].tolist()] for name in LIST_FIELDS}
+        programs = []
+        for row in range(len(records)):
+            # 書き出し時に検証済みなので、検証を通さずに組み立てる
+            eligibility = EligibilityRecord(
+                **{name: ints[name][row] for name in INT_FIELDS},
+                gender_keywords=lists["gender_keywords"][row],
+                occupation_keywords=lists["occupation_keywords"][row],
+                notes=strings["notes"][row],
+            )
+            programs.append(
+                ProgramRecord(
+                    program_id=strings["program_id"][row],
+                    program_name=strings["program_name"][row],
+                    municipality=strings["municipality"][row],
+                    summary=strings["summary"][row],
+                    eligibility=eligibility,
+                    deadline=strings["deadline"][row],
+                    gray_zone_guidance=lists["gray_zone_guidance"][row],
+                )
+            )
+        return programs
+
+    def list_items(self, indices: Sequence[int]) -> List[dict]:
+        records = self.records[np.asarray(indices, dtype=np.int64)]
+        string = self.string
+        fields = ("program_id", "program_name", "municipality", "summary", "deadline")
+        columns = [[string(value) for value in records[name].tolist()] for name in fields]
+        return [dict(zip(fields, values)) for values in zip(*columns)]
+
+    def _field(self, index: int, name: str) -> Optional[str]:
+        return self.string(int(self.records[name][index]))
+
+    def _list(self, start: int, count: int) -> Optional[List[str]]:
+        if count == NONE_ID:
+            return None
+        string = self.string
+        return [string(string_id) for string_id in self._lists[start : start + count].tolist()]
+
+
+class SnapshotCatalogIndex:
+    """CatalogIndex counterpart backed by a CatalogSnapshot.
+
+    Programs are materialized on first access and then reused, so repeated
+    calls return the same objects (and the same partition lists).
+    """
+
+    def __init__(self, snapshot: CatalogSnapshot):
+        self.snapshot = snapshot
+        self._programs: Dict[int, ProgramRecord] = {}
+        self._partitions: Dict[str, List[ProgramRecord]] = {}
+        self._list_items: Dict[str, List[dict]] = {}
+
+    def __len__(self) -> int:
+        return len(self.snapshot)
+
+    def list_programs(self, municipality: Optional[str] = None) -> List[ProgramRecord]:
+        key = municipality or ""
+        programs = self._partitions.get(key)
+        if programs is None:
+            indices = self._indices(municipality).tolist()
+            missing = [index for index in indices if index not in self._programs]
+            if missing:
+                self._programs.update(zip(missing, self.snapshot.programs(missing)))
+            programs = [self._programs[index] for index in indices]
+            self._partitions[key] = programs
+        return programs
+
+    def list_program_items(self, municipality: Optional[str] = None) -> List[dict]:
+        key = municipality or ""
+        items = self._list_items.get(key)
+        if items is None:
+            programs = self._partitions.get(key)
+            if programs is not None:
+                items = [program_list_item(program) for program in programs]
+            else:
+                items = self.snapshot.list_items(self._indices(municipality))
+            self._list_items[key] = items
+        return items
+
+    def get_program(self, program_id: str) -> Optional[ProgramRecord]:
+        index = self.snapshot.find(program_id)
+        return None if index is None else self._program(index)
+
+    def get_programs(self, program_ids: Sequence[str]) -> List[ProgramRecord]:
+        programs = (self.get_program(program_id) for program_id in program_ids)
+        return [program for program in programs if program is not None]
+
+    def _indices(self, municipality: Optional[str]) -> np.ndarray:
+        if municipality:
+            return self.snapshot.municipality_indices(municipality)
+        return np.arange(len(self.snapshot))
+
+    def _program(self, index: int) -> ProgramRecord:
+        program = self._programs.get(index)
+        if program is None:
+            program = self.snapshot.program(index)
+            self._programs[index] = program
+        return program
+
+
+def open_snapshot(path: Path, source_path: Optional[Path] = None) -> Optional[CatalogSnapshot]:
+    # スナップショットが無い・壊れている・元の JSON と食い違う場合は None（JSON を読む）
+    if not path.exists():
+        return None
+    try:
+        snapshot = CatalogSnapshot(path)
+    except (OSError, ValueError):
+        return None
+    if source_path is not None and source_path.exists() and source_digest(source_path) != snapshot.source_digest:
+        return None
+    return snapshot
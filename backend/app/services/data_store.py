@@ -1,18 +1,69 @@
 ﻿from __future__ import annotations
 
-from typing import Union
+import asyncio
+from typing import TYPE_CHECKING, List, Optional, Protocol, Sequence, Union
 
 from ..config import Settings
-from .local_store import LocalStore
-from .firestore_store import FirestoreStore
-from .mysql_store import MySQLStore
+from .catalog_cache import CachedProgramStore
+from .local_store import AsyncLocalStore, LocalStore
+from .metrics import timed_query
+from .program_record import ProgramLike
 
+if TYPE_CHECKING:
+    from .firestore_store import FirestoreStore
+    from .mysql_store import MySQLStore
 
-ProgramStore = Union[LocalStore, FirestoreStore, MySQLStore]
+# 使わないバックエンド（MySQL / Firestore）のモジュールは選ばれたときだけ import する
+ProgramStore = Union[LocalStore, "FirestoreStore", "MySQLStore"]
+
+
+class AsyncProgramStore(Protocol):
+    async def list_programs(self, municipality: Optional[str] = None) -> List[ProgramLike]: ...
+
+    async def get_program(self, program_id: str) -> Optional[ProgramLike]: ...
+
+    async def get_programs(self, program_ids: Sequence[str]) -> List[ProgramLike]: ...
+
+
+class ThreadedStore:
+    """Runs a synchronous store in worker threads so callers never block the event loop."""
+
+    def __init__(self, store: ProgramStore):
+        self.store = store
+
+    @timed_query("list_programs")
+    async def list_programs(self, municipality: Optional[str] = None) -> List[ProgramLike]:
+        return await asyncio.to_thread(self.store.list_programs, municipality)
+
+    @timed_query("get_program")
+    async def get_program(self, program_id: str) -> Optional[ProgramLike]:
+        return await asyncio.to_thread(self.store.get_program, program_id)
+
+    @timed_query("get_programs")
+    async def get_programs(self, program_ids: Sequence[str]) -> List[ProgramLike]:
+        return await asyncio.to_thread(self.store.get_programs, program_ids)
+
+    @timed_query("catalog_version")
+    async def catalog_version(self, municipality: Optional[str] = None) -> Optional[str]:
+        catalog_version = getattr(self.store, "catalog_version", None)
+        if catalog_version is None:
+            return None
+        return await asyncio.to_thread(catalog_version, municipality)
+
+    def pool_metrics(self) -> Optional[dict]:
+        pool_metrics = getattr(self.store, "pool_metrics", None)
+        return pool_metrics() if pool_metrics else None
+
+    async def close(self) -> None:
+        close = getattr(self.store, "close", None)
+        if close:
+            await asyncio.to_thread(close)
 
 
 def get_store(settings: Settings) -> ProgramStore:
     if settings.use_mysql:
+        from .mysql_store import MySQLStore
+
         try:
             return MySQLStore(
                 host=settings.cloudsql_host,
@@ -22,19 +73,76 @@ def get_store(settings: Settings) -> ProgramStore:
                 password=settings.cloudsql_password,
                 database=settings.cloudsql_database,
                 connect_timeout=settings.cloudsql_connect_timeout,
+                pool_size=settings.cloudsql_pool_size,
+                pool_recycle_seconds=settings.cloudsql_pool_recycle_seconds,
+                pool_acquire_timeout=settings.cloudsql_pool_acquire_timeout,
+                pool_health_check_seconds=settings.cloudsql_pool_health_check_seconds,
             )
         except Exception as exc:
             if settings.app_env != "local":
                 raise RuntimeError("USE_MYSQL=true but MySQL connection is not available") from exc
             # Local-only fallback for development
-            return LocalStore(settings.data_dir)
+            return _local_store(settings)
 
     if settings.use_firestore:
         if not settings.gcp_project_id:
             raise RuntimeError("USE_FIRESTORE=true but GCP_PROJECT_ID is not set")
+        from .firestore_store import FirestoreStore
+
         try:
             return FirestoreStore(settings.gcp_project_id, settings.gcp_firestore_database)
         except Exception:
             # Fallback to local store if Firestore is misconfigured
-            return LocalStore(settings.data_dir)
-    return LocalStore(settings.data_dir)
+            return _local_store(settings)
+    return _local_store(settings)
+
+
+def get_async_store(settings: Settings) -> AsyncProgramStore:
+    store = _get_async_backend(settings)
+    if settings.catalog_cache_enabled and not isinstance(store, AsyncLocalStore):
+        # DB 系のストアは解析済みカタログをキャッシュし、版の確認と再読込はバックグラウンドで行う
+        return CachedProgramStore(store, ttl_seconds=settings.catalog_cache_ttl_seconds)
+    return store
+
+
+def _get_async_backend(settings: Settings) -> AsyncProgramStore:
+    if settings.use_mysql:
+        from .mysql_store import AsyncMySQLStore
+
+        try:
+            return AsyncMySQLStore(
+                host=settings.cloudsql_host,
+                port=settings.cloudsql_port,
+                unix_socket=settings.cloudsql_unix_socket,
+                user=settings.cloudsql_user,
+                password=settings.cloudsql_password,
+                database=settings.cloudsql_database,
+                connect_timeout=settings.cloudsql_connect_timeout,
+                pool_size=settings.cloudsql_pool_size,
+                pool_recycle_seconds=settings.cloudsql_pool_recycle_seconds,
+                pool_acquire_timeout=settings.cloudsql_pool_acquire_timeout,
+                pool_health_check_seconds=settings.cloudsql_pool_health_check_seconds,
+            )
+        except RuntimeError:
+            # aiomysql が無い環境では、プール付きの同期ストアをスレッドで動かす
+            pass
+
+    if settings.use_firestore and not settings.use_mysql:
+        if not settings.gcp_project_id:
+            raise RuntimeError("USE_FIRESTORE=true but GCP_PROJECT_ID is not set")
+        from .firestore_store import AsyncFirestoreStore
+
+        try:
+            return AsyncFirestoreStore(settings.gcp_project_id, settings.gcp_firestore_database)
+        except Exception:
+            # Fallback to local store if Firestore is misconfigured
+            return AsyncLocalStore(_local_store(settings))
+
+    store = get_store(settings)
+    if isinstance(store, LocalStore):
+        return AsyncLocalStore(store)
+    return ThreadedStore(store)
+
+
+def _local_store(settings: Settings) -> LocalStore:
+    return LocalStore(settings.data_dir, use_snapshot=settings.catalog_snapshot_enabled)
@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import hashlib
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from ..models import UserInput
+from .program_record import ProgramLike, to_program
+from .rule_predicates import Predicate, compile_predicate
+
+LEVEL_NAMES = ("high", "medium", "low")
+LEVEL_HIGH = 0
+LEVEL_MEDIUM = 1
+LEVEL_LOW = 2
+
+RANGE_FIELDS = (
+    ("age_min", "age_max"),
+    ("income_min_yen", "income_max_yen"),
+    ("household_min", "household_max"),
+    ("dependents_min", "dependents_max"),
+)
+
+
+@dataclass
+class MatrixEvaluation:
+    matched: np.ndarray
+    total: np.ndarray
+    score: np.ndarray
+    eligible: np.ndarray
+    level: np.ndarray
+
+    def order(self) -> np.ndarray:
+        # recommend_programs と同じ並び: eligible → level → score 降順（同点は入力順）
+        # 2次元の場合は行（ユーザー）ごとに並べ替える
+        return np.lexsort((-self.score, self.level, ~self.eligible), axis=-1)
+
+    def row(self, index: int) -> MatrixEvaluation:
+        return MatrixEvaluation(
+            matched=self.matched[index],
+            total=self.total[index],
+            score=self.score[index],
+            eligible=self.eligible[index],
+            level=self.level[index],
+        )
+
+
+class CompiledCatalog:
+    """Column-oriented snapshot of a program list for vectorized rule evaluation."""
+
+    def __init__(self, programs: Sequence[ProgramLike]):
+        self.programs: List[ProgramLike] = list(programs)
+        size = len(self.programs)
+
+        self.bounds: List[Tuple[np.ndarray, np.ndarray]] = []
+        for min_field, max_field in RANGE_FIELDS:
+            lower = np.full(size, np.nan)
+            upper = np.full(size, np.nan)
+            for idx, program in enumerate(self.programs):
+                eligibility = program.eligibility
+                value = getattr(eligibility, min_field)
+                if value is not None:
+                    lower[idx] = value
+                value = getattr(eligibility, max_field)
+                if value is not None:
+                    upper[idx] = value
+            self.bounds.append((lower, upper))
+        self.has_range = [~(np.isnan(lower) & np.isnan(upper)) for lower, upper in self.bounds]
+
+        self.gender_vocab, self.gender_mask = _keyword_mask(
+            [p.eligibility.gender_keywords for p in self.programs]
+        )
+        self.occupation_vocab, self.occupation_mask = _keyword_mask(
+            [p.eligibility.occupation_keywords for p in self.programs]
+        )
+        self.has_gender = self.gender_mask.any(axis=1)
+        self.has_occupation = self.occupation_mask.any(axis=1)
+        # 判定理由の組み立て用に、制度ごとの条件だけを見る判定関数を読み込み時に作っておく
+        self.predicates: List[Predicate] = [compile_predicate(p.eligibility) for p in self.programs]
+
+    def __len__(self) -> int:
+        return len(self.programs)
+
+    @cached_property
+    def program_versions(self) -> List[str]:
+        # 制度ごとの内容ハッシュ（キャッシュキーの「制度バージョン」として使う）
+        return [
+            hashlib.sha256(to_program(program).model_dump_json().encode("utf-8")).hexdigest()[:16]
+            for program in self.programs
+        ]
+
+    @cached_property
+    def version_by_id(self) -> Dict[str, str]:
+        return {program.program_id: version for program, version in zip(self.programs, self.program_versions)}
+
+    @cached_property
+    def fingerprint(self) -> str:
+        digest = hashlib.sha256()
+        for program, version in zip(self.programs, self.program_versions):
+            digest.update(program.program_id.encode("utf-8"))
+            digest.update(version.encode("ascii"))
+        return digest.hexdigest()
+
+    @cached_property
+    def breakpoints(self) -> List[Tuple[List[float], List[float]]]:
+        # 属性ごとの下限・上限のしきい値（昇順・重複なし）
+        return [
+            (sorted(set(lower[~np.isnan(lower)].tolist())), sorted(set(upper[~np.isnan(upper)].tolist())))
+            for lower, upper in self.bounds
+        ]
+
+    def region_key(self, user: UserInput) -> Tuple[object, ...]:
+        # しきい値で区切った区間とキーワードの一致で属性空間を分ける。同じキーのユーザーは全制度の判定と理由が同じになる
+        values = (user.age, user.income_yen, user.household, user.dependents or 0)
+        key: List[object] = []
+        for (lowers, uppers), value in zip(self.breakpoints, values):
+            # 下限 L は value < L、上限 U は value > U のときに外れる
+            key.append(bisect_right(lowers, value))
+            key.append(bisect_left(uppers, value))
+        gender = (user.gender or "").strip()
+        # 性別未入力はどのキーワードにも一致しない場合とも理由が異なるので区別する
+        key.append(_keyword_hits(self.gender_vocab, gender) if gender else None)
+        key.append(_keyword_hits(self.occupation_vocab, user.occupation or ""))
+        return tuple(key)
+
+    def evaluate(self, user: UserInput) -> MatrixEvaluation:
+        return self.evaluate_many([user]).row(0)
+
+    def evaluate_many(self, users: Sequence[UserInput]) -> MatrixEvaluation:
+        # users × programs の判定行列を一度に計算する
+        shape = (len(users), len(self.programs))
+        matched = np.zeros(shape, dtype=np.int64)
+        total = np.zeros(shape, dtype=np.int64)
+
+        columns = (
+            [user.age for user in users],
+            [user.income_yen for user in users],
+            [user.household for user in users],
+            [user.dependents or 0 for user in users],
+        )
+        for (lower, upper), present, column in zip(self.bounds, self.has_range, columns):
+            values = np.asarray(column, dtype=np.float64)[:, None]
+            failed = (values < lower).astype(np.int64) + (values > upper)
+            ok = present & (failed == 0)
+            matched += ok
+            total += failed + ok
+
+        genders = [(user.gender or "").strip() for user in users]
+        gender_hits = _hits_matrix(self.gender_vocab, genders)
+        # 性別未入力は常に不一致（キーワード判定より優先）
+        gender_hits[[idx for idx, gender in enumerate(genders) if not gender]] = 0
+        occupation_hits = _hits_matrix(self.occupation_vocab, [user.occupation or "" for user in users])
+        matched += self.has_gender & (gender_hits @ self.gender_mask.T > 0)
+        matched += self.has_occupation & (occupation_hits @ self.occupation_mask.T > 0)
+        total += self.has_gender
+        total += self.has_occupation
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            score = np.where(total > 0, matched / np.maximum(total, 1), 0.0)
+        eligible = (total > 0) & (matched == total)
+        level = np.where(eligible, LEVEL_HIGH, np.where(score >= 0.7, LEVEL_MEDIUM, LEVEL_LOW))
+        return MatrixEvaluation(matched=matched, total=total, score=score, eligible=eligible, level=level)
+
+
+def _keyword_mask(keyword_lists: Sequence[List[str] | None]) -> Tuple[List[str], np.ndarray]:
+    vocab: Dict[str, int] = {}
+    for keywords in keyword_lists:
+        for keyword in keywords or []:
+            vocab.setdefault(keyword, len(vocab))
+    mask = np.zeros((len(keyword_lists), len(vocab)), dtype=np.int64)
+    for idx, keywords in enumerate(keyword_lists):
+        for keyword in keywords or []:
+            mask[idx, vocab[keyword]] = 1
+    return list(vocab), mask
+
+
+def _keyword_hits(vocab: Sequence[str], text: str) -> Tuple[int, ...]:
+    return tuple(idx for idx, keyword in enumerate(vocab) if keyword in text)
+
+
+def _hits_matrix(vocab: Sequence[str], texts: Sequence[str]) -> np.ndarray:
+    hits = np.zeros((len(texts), len(vocab)), dtype=np.int64)
+    if not vocab:
+        return hits
+    rows: Dict[str, np.ndarray] = {}
+    for idx, text in enumerate(texts):
+        row = rows.get(text)
+        if row is None:
+            row = np.fromiter((keyword in text for keyword in vocab), dtype=np.int64, count=len(vocab))
+            rows[text] = row
+        hits[idx] = row
+    return hits
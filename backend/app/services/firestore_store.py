@@ -1,8 +1,10 @@
 ﻿from __future__ import annotations
 
-from typing import List, Optional
+from typing import List, Optional, Sequence
 
 from ..models import Program, Eligibility
+from .metrics import timed_query
+from .program_record import order_by_ids
 
 
 class FirestoreStore:
@@ -15,27 +17,94 @@ class FirestoreStore:
         self.client = firestore.Client(project=project_id, database=database)
 
     def list_programs(self, municipality: Optional[str] = None) -> List[Program]:
-        query = self.client.collection("programs")
-        if municipality:
-            query = query.where("municipality", "==", municipality)
-        docs = query.stream()
-        return [self._doc_to_program(doc) for doc in docs]
+        docs = _programs_query(self.client, municipality).stream()
+        return [_doc_to_program(doc) for doc in docs]
 
     def get_program(self, program_id: str) -> Optional[Program]:
         doc = self.client.collection("programs").document(program_id).get()
         if not doc.exists:
             return None
-        return self._doc_to_program(doc)
-
-    def _doc_to_program(self, doc) -> Program:
-        data = doc.to_dict() or {}
-        eligibility = Eligibility.model_validate(data.get("eligibility", {}))
-        return Program(
-            program_id=data.get("program_id", doc.id),
-            program_name=data.get("program_name", ""),
-            municipality=data.get("municipality", ""),
-            summary=data.get("summary", ""),
-            eligibility=eligibility,
-            deadline=data.get("deadline"),
-            gray_zone_guidance=data.get("gray_zone_guidance", []),
-        )
+        return _doc_to_program(doc)
+
+    def get_programs(self, program_ids: Sequence[str]) -> List[Program]:
+        collection = self.client.collection("programs")
+        docs = self.client.get_all([collection.document(program_id) for program_id in program_ids])
+        return order_by_ids([_doc_to_program(doc) for doc in docs if doc.exists], program_ids)
+
+    def catalog_version(self, municipality: Optional[str] = None) -> Optional[str]:
+        count = _count_query(self.client, municipality).get()
+        docs = list(_latest_update_query(self.client, municipality).stream())
+        return _format_version(count, docs)
+
+
+class AsyncFirestoreStore:
+    def __init__(self, project_id: str, database: str = "(default)"):
+        try:
+            from google.cloud import firestore  # type: ignore
+        except Exception as exc:  # pragma: no cover
+            raise RuntimeError("google-cloud-firestore is not available") from exc
+
+        self.client = firestore.AsyncClient(project=project_id, database=database)
+
+    @timed_query("list_programs")
+    async def list_programs(self, municipality: Optional[str] = None) -> List[Program]:
+        query = _programs_query(self.client, municipality)
+        return [_doc_to_program(doc) async for doc in query.stream()]
+
+    @timed_query("get_program")
+    async def get_program(self, program_id: str) -> Optional[Program]:
+        doc = await self.client.collection("programs").document(program_id).get()
+        if not doc.exists:
+            return None
+        return _doc_to_program(doc)
+
+    @timed_query("get_programs")
+    async def get_programs(self, program_ids: Sequence[str]) -> List[Program]:
+        collection = self.client.collection("programs")
+        refs = [collection.document(program_id) for program_id in program_ids]
+        programs = [_doc_to_program(doc) async for doc in self.client.get_all(refs) if doc.exists]
+        return order_by_ids(programs, program_ids)
+
+    @timed_query("catalog_version")
+    async def catalog_version(self, municipality: Optional[str] = None) -> Optional[str]:
+        count = await _count_query(self.client, municipality).get()
+        docs = [doc async for doc in _latest_update_query(self.client, municipality).stream()]
+        return _format_version(count, docs)
+
+
+def _programs_query(client, municipality: Optional[str]):
+    query = client.collection("programs")
+    if municipality:
+        query = query.where("municipality", "==", municipality)
+    return query
+
+
+def _count_query(client, municipality: Optional[str]):
+    # 件数は集計クエリで数える（削除や updated_at を持たない文書の追加・削除も版に反映させる）
+    return _programs_query(client, municipality).count(alias="program_count")
+
+
+def _latest_update_query(client, municipality: Optional[str]):
+    # updated_at の最大値（municipality で絞る場合は複合インデックスが必要）
+    return _programs_query(client, municipality).order_by("updated_at", direction="DESCENDING").limit(1)
+
+
+def _format_version(count_results, docs) -> str:
+    # MySQL ストアと同じく「件数:updated_at の最大値」をカタログの版とする
+    count = next((result.value for row in count_results for result in row), 0)
+    updated_at = (docs[0].to_dict() or {}).get("updated_at") if docs else None
+    return f"{count}:{updated_at}"
+
+
+def _doc_to_program(doc) -> Program:
+    data = doc.to_dict() or {}
+    eligibility = Eligibility.model_validate(data.get("eligibility", {}))
+    return Program(
+        program_id=data.get("program_id", doc.id),
+        program_name=data.get("program_name", ""),
+        municipality=data.get("municipality", ""),
+        summary=data.get("summary", ""),
+        eligibility=eligibility,
+        deadline=data.get("deadline"),
+        gray_zone_guidance=data.get("gray_zone_guidance", []),
+    )
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import threading
+from typing import Any, AsyncIterator, Optional
+
+import httpx
+
+STUB_TIMEOUT_SECONDS = 120.0
+
+
+class StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class HttpStubModel:
+    """GenerativeModel stand-in that calls a local fake LLM server.
+
+    Used for load tests (`VERTEX_STUB_URL`); implements the subset of the SDK
+    used by vertex_llm: `generate_content` and `generate_content_async`
+    (with `stream=True`). Non-2xx responses raise like SDK errors do.
+    """
+
+    def __init__(self, base_url: str, model_name: str):
+        self.base_url = base_url.rstrip("/")
+        self.model_name = model_name
+        self._client = httpx.Client(timeout=STUB_TIMEOUT_SECONDS)
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt: str, generation_config: Optional[dict] = None, stream: bool = False) -> Any:
+        response = self._client.post(self._url(), json=self._body(prompt, generation_config, False))
+        response.raise_for_status()
+        return StubResponse(response.json()["text"])
+
+    async def generate_content_async(
+        self, prompt: str, generation_config: Optional[dict] = None, stream: bool = False
+    ) -> Any:
+        client = self._get_async_client()
+        body = self._body(prompt, generation_config, stream)
+        if not stream:
+            response = await client.post(self._url(), json=body)
+            response.raise_for_status()
+            return StubResponse(response.json()["text"])
+        request = client.build_request("POST", self._url(), json=body)
+        response = await client.send(request, stream=True)
+        if response.is_error:
+            await response.aclose()
+            response.raise_for_status()
+        return self._chunks(response)
+
+    async def _chunks(self, response: httpx.Response) -> AsyncIterator[StubResponse]:
+        try:
+            async for text in response.aiter_text():
+                yield StubResponse(text)
+        finally:
+            await response.aclose()
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        if self._async_client is None:
+            with self._lock:
+                if self._async_client is None:
+                    # 負荷試験では同時接続数が多いため、接続数の上限は設けない
+                    limits = httpx.Limits(max_connections=None, max_keepalive_connections=256)
+                    self._async_client = httpx.AsyncClient(timeout=STUB_TIMEOUT_SECONDS, limits=limits)
+        return self._async_client
+
+    def _url(self) -> str:
+        return f"{self.base_url}/models/{self.model_name}:generateContent"
+
+    @staticmethod
+    def _body(prompt: str, generation_config: Optional[dict], stream: bool) -> dict:
+        return {"prompt": prompt, "generation_config": generation_config or {}, "stream": stream}
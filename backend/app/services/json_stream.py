@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import json
+from typing import List, Optional
+
+
+class ResultsStreamParser:
+    """Incremental scanner for the LLM's `{"results": [...]}` payload.
+
+    Text is fed chunk by chunk; each `results[i]` object is decoded and returned
+    as soon as its closing brace arrives. A truncated trailing object is simply
+    never emitted, so completed items survive a cut-off response. Text before
+    the root value (e.g. a ```json fence) and after it is ignored.
+    """
+
+    def __init__(self) -> None:
+        self._text = ""
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_key: Optional[str] = None
+        self._array_key: Optional[str] = None
+        self._item_start: Optional[int] = None
+        self._finished = False
+
+    @property
+    def finished(self) -> bool:
+        return self._finished
+
+    def feed(self, chunk: str) -> List[dict]:
+        if self._finished or not chunk:
+            return []
+        self._text += chunk
+        items: List[dict] = []
+        text = self._text
+        stack = self._stack
+        pos = self._pos
+        end = len(text)
+        while pos < end:
+            char = text[pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if len(stack) == 1 and stack[0] == "{":
+                        self._last_key = _decode_string(text[self._string_start : pos + 1])
+            elif not stack:
+                # ルート値が始まるまでの前置き（コードフェンス等）は読み飛ばす
+                if char == "{" or char == "[":
+                    stack.append(char)
+            elif char == '"':
+                self._in_string = True
+                self._string_start = pos
+            elif char == "{" or char == "[":
+                if len(stack) == 1 and stack[0] == "{" and char == "[":
+                    self._array_key = self._last_key
+                if char == "{" and self._in_results():
+                    self._item_start = pos
+                stack.append(char)
+            elif char == "}" or char == "]":
+                stack.pop()
+                if char == "}" and self._item_start is not None and self._in_results():
+                    item = _decode_object(text[self._item_start : pos + 1])
+                    if item is not None:
+                        items.append(item)
+                    self._item_start = None
+                if not stack:
+                    self._finished = True
+                    pos += 1
+                    break
+            pos += 1
+
+        # 確定済みの部分は捨てて、バッファが応答全体まで伸びないようにする
+        keep_from = self._item_start if self._item_start is not None else pos
+        if self._in_string and self._string_start < keep_from:
+            keep_from = self._string_start
+        self._text = text[keep_from:]
+        self._pos = pos - keep_from
+        if self._item_start is not None:
+            self._item_start -= keep_from
+        self._string_start -= keep_from
+        return items
+
+    def _in_results(self) -> bool:
+        stack = self._stack
+        if len(stack) == 1:
+            return stack[0] == "["
+        return len(stack) == 2 and stack[0] == "{" and stack[1] == "[" and self._array_key == "results"
+
+
+def parse_results_incrementally(text: str) -> List[dict]:
+    return ResultsStreamParser().feed(text)
+
+
+def _decode_string(raw: str) -> Optional[str]:
+    try:
+        value = json.loads(raw)
+    except ValueError:
+        return None
+    return value if isinstance(value, str) else None
+
+
+def _decode_object(raw: str) -> Optional[dict]:
+    try:
+        value = json.loads(raw)
+    except ValueError:
+        return None
+    return value if isinstance(value, dict) else None
@@ -0,0 +1,350 @@
+from __future__ import annotations
+
+import asyncio
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from ..config import Settings
+from . import catalog_events
+
+CREATE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    namespace TEXT NOT NULL,
+    cache_key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (namespace, cache_key)
+)
+"""
+UPSERT_SQL = """
+INSERT INTO llm_cache (namespace, cache_key, value, created_at, accessed_at)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (namespace, cache_key) DO UPDATE SET
+    value = excluded.value,
+    created_at = excluded.created_at,
+    accessed_at = excluded.accessed_at
+"""
+# 1トランザクションにまとめる書き込み操作の上限
+MAX_WRITE_BATCH = 1000
+
+
+class LLMResponseCache:
+    """Two-tier (in-process LRU + SQLite) cache for LLM responses.
+
+    The SQLite file is opened in WAL mode so every uvicorn worker on the host
+    shares the same entries, and they survive restarts. Disk writes never run
+    on the caller's thread: `set`/`set_many` update the memory tier and queue
+    the write for a writer thread, which commits everything queued in one
+    transaction and runs TTL/size eviction every `maintenance_interval`
+    seconds. From the event loop use `get_async`/`get_many_async`, which read
+    the disk in a worker thread.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        path: Optional[Path],
+        ttl_seconds: float,
+        max_memory_entries: int,
+        max_disk_entries: int,
+        maintenance_interval: float = 60.0,
+    ):
+        self.namespace = namespace
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.maintenance_interval = maintenance_interval
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # 読み取り用と書き込みスレッド用で接続を分ける（WAL なので読み取りは書き込みを待たない）
+        self._conn: Optional[sqlite3.Connection] = None
+        self._writer_conn: Optional[sqlite3.Connection] = None
+        self._reader_lock = threading.Lock()
+        self._writes: "queue.Queue[Tuple[str, object]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._counters: Dict[str, int] = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "disk_errors": 0,
+            "disk_batches": 0,
+        }
+        if path is not None:
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                writer_conn = _connect(path)
+                writer_conn.execute(CREATE_TABLE_SQL)
+                writer_conn.commit()
+                self._conn = _connect(path)
+                self._writer_conn = writer_conn
+            except sqlite3.Error:
+                # ディスク層が使えない環境ではメモリ層のみで動かす
+                self._counters["disk_errors"] += 1
+                self._conn = None
+                self._writer_conn = None
+
+    def get(self, key: str) -> Optional[str]:
+        # 同期版。ディスクを読むことがあるのでイベントループからは get_async を使う
+        value = self._memory_get(key)
+        if value is not None:
+            return value
+        return self._disk_get_many([key]).get(key)
+
+    async def get_async(self, key: str) -> Optional[str]:
+        return (await self.get_many_async([key])).get(key)
+
+    async def get_many_async(self, keys: Sequence[str]) -> Dict[str, str]:
+        found: Dict[str, str] = {}
+        missing: List[str] = []
+        for key in keys:
+            value = self._memory_get(key)
+            if value is None:
+                missing.append(key)
+            else:
+                found[key] = value
+        if missing:
+            if self._conn is None:
+                found.update(self._disk_get_many(missing))
+            else:
+                found.update(await asyncio.to_thread(self._disk_get_many, missing))
+        return found
+
+    def set(self, key: str, value: str) -> None:
+        self.set_many({key: value})
+
+    def set_many(self, items: Dict[str, str]) -> None:
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._counters["writes"] += len(items)
+            for key, value in items.items():
+                self._memory_put(key, value, now)
+        self._enqueue("put", [(self.namespace, key, value, now, now) for key, value in items.items()])
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        # キューに積まれた書き込みがディスクに反映されるまで待つ（テスト・終了処理用）
+        if self._writer_conn is None:
+            return True
+        done = threading.Event()
+        self._enqueue("flush", done)
+        return done.wait(timeout)
+
+    def clear_memory(self) -> None:
+        with self._lock:
+            self._memory.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        # 先に積まれた書き込みの後で消えるよう、削除も書き込みスレッドで行う
+        self._enqueue("clear", None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+            memory_entries = len(self._memory)
+        hits = counters["memory_hits"] + counters["disk_hits"]
+        lookups = hits + counters["misses"]
+        return {
+            "namespace": self.namespace,
+            "memory_entries": memory_entries,
+            "disk_enabled": self._conn is not None,
+            "pending_writes": self._writes.qsize(),
+            "hit_ratio": (hits / lookups) if lookups else 0.0,
+            **counters,
+        }
+
+    def _memory_get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at > now:
+                self._memory.move_to_end(key)
+                self._counters["memory_hits"] += 1
+                return value
+            del self._memory[key]
+            self._counters["expirations"] += 1
+            return None
+
+    def _memory_put(self, key: str, value: str, created_at: float) -> None:
+        # 期限は書き込まれた時刻から数える（ディスクから読み戻しても延びない）
+        self._memory[key] = (created_at + self.ttl_seconds, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def _disk_get_many(self, keys: Sequence[str]) -> Dict[str, str]:
+        now = time.time()
+        found: Dict[str, str] = {}
+        created: Dict[str, float] = {}
+        errors = 0
+        if self._conn is not None:
+            try:
+                with self._reader_lock:
+                    for key in keys:
+                        row = self._conn.execute(
+                            "SELECT value, created_at FROM llm_cache WHERE namespace = ? AND cache_key = ?",
+                            (self.namespace, key),
+                        ).fetchone()
+                        # 期限切れの行は読み飛ばすだけにし、削除は定期メンテナンスに任せる
+                        if row is not None and row[1] + self.ttl_seconds > now:
+                            found[key], created[key] = row
+            except sqlite3.Error:
+                errors = 1
+        with self._lock:
+            self._counters["disk_errors"] += errors
+            self._counters["disk_hits"] += len(found)
+            self._counters["misses"] += len(keys) - len(found)
+            for key, value in found.items():
+                self._memory_put(key, value, created[key])
+        if found:
+            self._enqueue("touch", [(now, self.namespace, key) for key in found])
+        return found
+
+    def _enqueue(self, kind: str, payload: object) -> None:
+        if self._writer_conn is None:
+            return
+        self._writes.put((kind, payload))
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(
+                        target=self._run_writer, name=f"llm-cache-{self.namespace}", daemon=True
+                    )
+                    self._writer.start()
+
+    def _run_writer(self) -> None:
+        next_maintenance = time.monotonic() + self.maintenance_interval
+        while True:
+            ops: List[Tuple[str, object]] = []
+            try:
+                ops.append(self._writes.get(timeout=max(0.0, next_maintenance - time.monotonic())))
+                while len(ops) < MAX_WRITE_BATCH:
+                    ops.append(self._writes.get_nowait())
+            except queue.Empty:
+                pass
+            if ops:
+                self._apply(ops)
+            if time.monotonic() >= next_maintenance:
+                self._maintain()
+                next_maintenance = time.monotonic() + self.maintenance_interval
+
+    def _apply(self, ops: List[Tuple[str, object]]) -> None:
+        conn = self._writer_conn
+        done: List[threading.Event] = []
+        try:
+            # キューにたまった書き込み（シャード1回分の制度の結果など）を1トランザクションでコミットする
+            with conn:
+                for kind, payload in ops:
+                    if kind == "put":
+                        conn.executemany(UPSERT_SQL, payload)
+                    elif kind == "touch":
+                        conn.executemany(
+                            "UPDATE llm_cache SET accessed_at = ? WHERE namespace = ? AND cache_key = ?",
+                            payload,
+                        )
+                    elif kind == "clear":
+                        conn.execute("DELETE FROM llm_cache WHERE namespace = ?", (self.namespace,))
+                    elif kind == "flush":
+                        done.append(payload)
+            with self._lock:
+                self._counters["disk_batches"] += 1
+        except sqlite3.Error:
+            with self._lock:
+                self._counters["disk_errors"] += 1
+        finally:
+            for event in done:
+                event.set()
+
+    def _maintain(self) -> None:
+        conn = self._writer_conn
+        now = time.time()
+        try:
+            with conn:
+                expired = conn.execute(
+                    "DELETE FROM llm_cache WHERE namespace = ? AND created_at <= ?",
+                    (self.namespace, now - self.ttl_seconds),
+                ).rowcount
+                (count,) = conn.execute(
+                    "SELECT COUNT(*) FROM llm_cache WHERE namespace = ?",
+                    (self.namespace,),
+                ).fetchone()
+                overflow = max(0, count - self.max_disk_entries)
+                if overflow:
+                    # 最終アクセスが古いものから削除する（LRU）
+                    conn.execute(
+                        """
+                        DELETE FROM llm_cache WHERE namespace = ? AND cache_key IN (
+                            SELECT cache_key FROM llm_cache WHERE namespace = ?
+                            ORDER BY accessed_at ASC LIMIT ?
+                        )
+                        """,
+                        (self.namespace, self.namespace, overflow),
+                    )
+            with self._lock:
+                self._counters["expirations"] += max(0, expired)
+                self._counters["evictions"] += overflow
+        except sqlite3.Error:
+            with self._lock:
+                self._counters["disk_errors"] += 1
+
+
+def _connect(path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(str(path), timeout=5, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+_caches: Dict[str, LLMResponseCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_llm_cache(settings: Settings, namespace: str) -> Optional[LLMResponseCache]:
+    if not settings.llm_cache_enabled:
+        return None
+    with _caches_lock:
+        cache = _caches.get(namespace)
+        if cache is None:
+            cache = LLMResponseCache(
+                namespace=namespace,
+                path=settings.llm_cache_path,
+                ttl_seconds=settings.llm_cache_ttl_seconds,
+                max_memory_entries=settings.llm_cache_memory_entries,
+                max_disk_entries=settings.llm_cache_disk_entries,
+                maintenance_interval=settings.llm_cache_maintenance_seconds,
+            )
+            _caches[namespace] = cache
+        return cache
+
+
+def llm_cache_stats() -> list[dict]:
+    with _caches_lock:
+        caches = list(_caches.values())
+    return [cache.stats() for cache in caches]
+
+
+def _on_catalog_changed(municipality: Optional[str]) -> None:
+    # キーにカタログのハッシュを含むため古いエントリは参照されないが、メモリ層は即座に解放する
+    with _caches_lock:
+        caches = list(_caches.values())
+    for cache in caches:
+        cache.clear_memory()
+
+
+catalog_events.subscribe(_on_catalog_changed)
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from ..config import Settings
+
+PROXY_ENV_KEYS = (
+    "HTTP_PROXY",
+    "HTTPS_PROXY",
+    "ALL_PROXY",
+    "http_proxy",
+    "https_proxy",
+    "all_proxy",
+)
+# 初期化に失敗した後、次に作り直しを試みるまでの秒数
+INIT_RETRY_SECONDS = 30.0
+
+
+class LLMClientManager:
+    """Process-wide Vertex AI client.
+
+    `vertexai.init` and `GenerativeModel` run once per (project, region, model)
+    and the model (with its underlying gRPC channel) is shared by every
+    request. A failed initialisation is retried at most every
+    `INIT_RETRY_SECONDS`.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._model: Any = None
+        self._key: Optional[Tuple[str, str, str, str]] = None
+        self._failed_at: Optional[float] = None
+        self._proxy_scrubbed = False
+        self._metrics: Dict[str, Any] = {
+            "init_count": 0,
+            "init_failures": 0,
+            "init_seconds": None,
+            "last_error": None,
+            "warmup_seconds": None,
+            "warmup_error": None,
+        }
+
+    def get_model(self, settings: Settings) -> Any:
+        model = self.peek(settings)
+        if model is not None:
+            return model
+        with self._lock:
+            key = _client_key(settings)
+            if self._model is not None and self._key == key:
+                return self._model
+            if self._key == key and self._failed_at is not None:
+                if time.monotonic() - self._failed_at < INIT_RETRY_SECONDS:
+                    return None
+            return self._create(settings, key)
+
+    def peek(self, settings: Settings) -> Any:
+        # 初期化済みならロックも取らずに返す（リクエストごとの経路）
+        model = self._model
+        if model is not None and self._key == _client_key(settings):
+            return model
+        return None
+
+    def warm_up(self, settings: Settings) -> bool:
+        model = self.get_model(settings)
+        if model is None:
+            return False
+        if not settings.vertex_warmup_request:
+            return True
+        # 最初の生成リクエストでかかる接続確立・認証トークン取得を先に済ませる
+        started = time.perf_counter()
+        try:
+            model.generate_content("ping", generation_config={"max_output_tokens": 1, "temperature": 0})
+        except Exception as exc:
+            self._metrics["warmup_error"] = f"{type(exc).__name__}: {exc}"
+            return False
+        finally:
+            self._metrics["warmup_seconds"] = time.perf_counter() - started
+        return True
+
+    def metrics(self) -> dict:
+        return {"initialized": self._model is not None, **self._metrics}
+
+    def use_model(self, settings: Settings, model: Any) -> None:
+        # ベンチマーク・負荷試験で SDK の代わりのモデルを差し込む
+        with self._lock:
+            self._key = _client_key(settings)
+            self._model = model
+            self._failed_at = None
+
+    def reset(self) -> None:
+        with self._lock:
+            self._model = None
+            self._key = None
+            self._failed_at = None
+
+    def _create(self, settings: Settings, key: Tuple[str, str, str, str]) -> Any:
+        self._scrub_proxy_env()
+        started = time.perf_counter()
+        self._key = key
+        self._model = None
+        try:
+            if settings.vertex_stub_url:
+                # 負荷試験用の疑似 LLM サーバー（完全にオフラインで動く）
+                from .http_stub_model import HttpStubModel
+
+                model = HttpStubModel(settings.vertex_stub_url, settings.vertex_model)
+            else:
+                model = _create_vertex_model(settings)
+        except Exception as exc:
+            self._failed_at = time.monotonic()
+            self._metrics["init_failures"] += 1
+            self._metrics["last_error"] = f"{type(exc).__name__}: {exc}"
+            return None
+        self._failed_at = None
+        self._metrics["init_count"] += 1
+        self._metrics["init_seconds"] = time.perf_counter() - started
+        self._model = model
+        return model
+
+    def _scrub_proxy_env(self) -> None:
+        # ダミーのプロキシ設定（127.0.0.1:9 等）が残っていると SDK の通信が失敗するため、初回だけ取り除く
+        if self._proxy_scrubbed:
+            return
+        for key in PROXY_ENV_KEYS:
+            value = os.getenv(key, "").strip().lower().rstrip("/")
+            if value in {"http://127.0.0.1:9", "http://localhost:9"}:
+                os.environ.pop(key, None)
+        self._proxy_scrubbed = True
+
+
+def _create_vertex_model(settings: Settings) -> Any:
+    if not settings.gcp_project_id:
+        raise RuntimeError("GCP_PROJECT_ID is not set")
+    from vertexai import init  # type: ignore
+    from vertexai.generative_models import GenerativeModel  # type: ignore
+
+    init(project=settings.gcp_project_id, location=settings.gcp_region)
+    return GenerativeModel(settings.vertex_model)
+
+
+def _client_key(settings: Settings) -> Tuple[str, str, str, str]:
+    return (settings.gcp_project_id or "", settings.gcp_region, settings.vertex_model, settings.vertex_stub_url or "")
+
+
+_manager = LLMClientManager()
+
+
+def get_llm_client() -> LLMClientManager:
+    return _manager
@@ -1,30 +1,110 @@
 ﻿from __future__ import annotations
 
-import json
+import asyncio
 from pathlib import Path
-from typing import List, Optional
+from typing import List, Optional, Sequence, Set, Union
+
+from pydantic import TypeAdapter
 
 from ..models import Program
+from . import catalog_events
+from .catalog_index import CatalogIndex
+from .catalog_snapshot import SnapshotCatalogIndex, open_snapshot
+from .program_record import ProgramRecord
+
+
+SEED_FILE = "seed_programs.json"
+_PROGRAM_LIST = TypeAdapter(List[Program])
+SNAPSHOT_FILE = "seed_programs.snapshot"
 
 
 class LocalStore:
-    def __init__(self, data_dir: Path):
+    def __init__(self, data_dir: Path, use_snapshot: bool = True):
         self.data_dir = data_dir
-        self._programs_cache: Optional[List[Program]] = None
+        self.use_snapshot = use_snapshot
+        self._index: Optional[Union[CatalogIndex, SnapshotCatalogIndex]] = None
+
+    def list_programs(self, municipality: Optional[str] = None) -> List[ProgramRecord]:
+        return self._load_index().list_programs(municipality)
+
+    def list_program_items(self, municipality: Optional[str] = None) -> List[dict]:
+        return self._load_index().list_program_items(municipality)
+
+    def get_program(self, program_id: str) -> Optional[ProgramRecord]:
+        return self._load_index().get_program(program_id)
+
+    def get_programs(self, program_ids: Sequence[str]) -> List[ProgramRecord]:
+        return self._load_index().get_programs(program_ids)
+
+    @property
+    def loaded(self) -> bool:
+        return self._index is not None
+
+    def load(self) -> None:
+        # 索引だけを開く。スナップショットではヘッダーとオフセットを読むだけで、制度のレコードは作らない
+        self._load_index()
 
-    def list_programs(self, municipality: Optional[str] = None) -> List[Program]:
-        programs = self._load_programs()
-        if municipality:
-            return [p for p in programs if p.municipality == municipality]
+    def reload(self) -> None:
+        self._index = None
+        catalog_events.notify_catalog_changed()
+
+    @property
+    def source(self) -> Optional[str]:
+        if self._index is None:
+            return None
+        return "snapshot" if isinstance(self._index, SnapshotCatalogIndex) else "json"
+
+    def _load_index(self) -> Union[CatalogIndex, SnapshotCatalogIndex]:
+        if self._index is not None:
+            return self._index
+        programs_path = self.data_dir / SEED_FILE
+        if self.use_snapshot:
+            # scripts/compile_catalog_snapshot.py で作ったスナップショットがあれば mmap で読む
+            snapshot = open_snapshot(self.data_dir / SNAPSHOT_FILE, programs_path)
+            if snapshot is not None:
+                self._index = SnapshotCatalogIndex(snapshot)
+                return self._index
+        # 検証は Pydantic で一括して行い、保持するのは軽量な ProgramRecord だけにする
+        programs = _PROGRAM_LIST.validate_json(programs_path.read_bytes())
+        self._index = CatalogIndex([ProgramRecord.from_program(program) for program in programs])
+        return self._index
+
+
+class AsyncLocalStore:
+    """Async facade over LocalStore.
+
+    Opening the index and the first listing of each municipality (which
+    builds its records from a snapshot) run in a worker thread; later calls
+    are answered from memory.
+    """
+
+    def __init__(self, store: LocalStore):
+        self.store = store
+        self._listed: Set[str] = set()
+
+    async def list_programs(self, municipality: Optional[str] = None) -> List[ProgramRecord]:
+        await self._ensure_loaded()
+        key = municipality or ""
+        if key in self._listed:
+            return self.store.list_programs(municipality)
+        programs = await asyncio.to_thread(self.store.list_programs, municipality)
+        self._listed.add(key)
         return programs
 
-    def get_program(self, program_id: str) -> Optional[Program]:
-        return next((p for p in self._load_programs() if p.program_id == program_id), None)
+    async def list_program_items(self, municipality: Optional[str] = None) -> List[dict]:
+        await self._ensure_loaded()
+        return self.store.list_program_items(municipality)
+
+    async def get_program(self, program_id: str) -> Optional[ProgramRecord]:
+        await self._ensure_loaded()
+        return self.store.get_program(program_id)
+
+    async def get_programs(self, program_ids: Sequence[str]) -> List[ProgramRecord]:
+        await self._ensure_loaded()
+        return self.store.get_programs(program_ids)
 
-    def _load_programs(self) -> List[Program]:
-        if self._programs_cache is not None:
-            return self._programs_cache
-        programs_path = self.data_dir / "seed_programs.json"
-        raw = json.loads(programs_path.read_text(encoding="utf-8"))
-        self._programs_cache = [Program.model_validate(item) for item in raw]
-        return self._programs_cache
+    async def _ensure_loaded(self) -> None:
+        if not self.store.loaded:
+            # 再読み込み後は自治体ごとのレコードも作り直しになる
+            self._listed.clear()
+            await asyncio.to_thread(self.store.load)
@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelValues = Tuple[str, ...]
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        # ラベルなしのカウンタは 0 から出力する（rate() が最初の増加を取りこぼさないように）
+        self._values: Dict[LabelValues, float] = {} if self.labelnames else {(): 0.0}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        if not registry.enabled:
+            return
+        key = _label_values(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        lines.extend(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values)
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # ラベルの組 → [バケットごとの件数..., +Inf の件数, 合計値]
+        self._series: Dict[LabelValues, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        if not registry.enabled:
+            return
+        key = _label_values(self.labelnames, labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            snapshot = sorted((key, list(series)) for key, series in self._series.items())
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, series in snapshot:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                labels = _format_labels(self.labelnames + ("le",), key + (le,))
+                lines.append(f"{self.name}_bucket{labels} {_format_value(cumulative)}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{labels} {_format_value(cumulative)}")
+        return lines
+
+
+class MetricsRegistry:
+    """Minimal Prometheus text-format registry.
+
+    Counters and histograms are updated in place under a per-metric lock;
+    values that already live elsewhere (cache counters, pool sizes) are read
+    by collectors only when `/api/metrics` is scraped.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = True
+        self._metrics: List[object] = []
+        self._collectors: List[Callable[[], List[str]]] = []
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], List[str]]) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            try:
+                lines.extend(collector())
+            except Exception:
+                # 集計元の一時的な失敗でスクレイプ全体を落とさない
+                continue
+        return "\n".join(lines) + "\n"
+
+
+def gauge_lines(name: str, help_text: str, samples: Sequence[Tuple[Dict[str, str], float]]) -> List[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    for labels, value in samples:
+        names = tuple(labels)
+        lines.append(f"{name}{_format_labels(names, tuple(str(labels[key]) for key in names))} {_format_value(value)}")
+    return lines
+
+
+def field_samples(values: Optional[dict], **labels: str) -> List[Tuple[Dict[str, str], float]]:
+    # 既存の統計 dict（キャッシュやプールの counters）を field ラベル付きの値に展開する
+    if not values:
+        return []
+    return [
+        ({**labels, "field": key}, float(value))
+        for key, value in values.items()
+        if isinstance(value, (int, float)) and not isinstance(value, bool)
+    ]
+
+
+def hit_ratio(hits: float, misses: float) -> float:
+    lookups = hits + misses
+    return hits / lookups if lookups else 0.0
+
+
+def _label_values(labelnames: Tuple[str, ...], labels: Dict[str, str]) -> LabelValues:
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    "hojokin_stage_seconds",
+    "Time spent per recommendation pipeline stage.",
+    ("stage",),
+)
+REQUEST_SPAN_SECONDS = registry.histogram(
+    "hojokin_request_span_seconds",
+    "Time per coarse /api/recommendations span; each span contains several pipeline stages.",
+    ("span",),
+)
+REQUEST_SECONDS = registry.histogram(
+    "hojokin_http_request_seconds",
+    "HTTP request duration by route and status.",
+    ("method", "route", "status"),
+)
+STORE_QUERY_SECONDS = registry.histogram(
+    "hojokin_store_query_seconds",
+    "Program store query duration by backend and operation.",
+    ("store", "operation"),
+)
+LLM_CALLS = registry.counter(
+    "hojokin_llm_calls_total",
+    "Vertex AI generate calls by attempt kind and outcome.",
+    ("attempt", "outcome"),
+)
+LLM_RETRIES = registry.counter("hojokin_llm_retries_total", "Vertex AI calls that were retries of a failed attempt.")
+LLM_INVALID_ITEMS = registry.counter(
+    "hojokin_llm_invalid_items_total",
+    "LLM result items dropped because they failed schema validation.",
+)
+PROMPT_CHARS = registry.histogram(
+    "hojokin_llm_prompt_chars",
+    "Prompt size in characters.",
+    buckets=SIZE_BUCKETS,
+)
+RESPONSE_CHARS = registry.histogram(
+    "hojokin_llm_response_chars",
+    "LLM response size in characters.",
+    buckets=SIZE_BUCKETS,
+)
+
+
+def stage(name: str):
+    return STAGE_SECONDS.time(stage=name)
+
+
+def timed_query(operation: str):
+    # ストアの非同期メソッドに付け、バックエンド名（クラス名）と操作ごとに所要時間を記録する
+    def decorate(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(self, *args, **kwargs)
+            finally:
+                STORE_QUERY_SECONDS.observe(
+                    time.perf_counter() - started, store=type(self).__name__, operation=operation
+                )
+
+        return wrapper
+
+    return decorate
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware recording request duration by route template and status."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not registry.enabled:
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # パスそのものではなくルートのテンプレート（/api/programs/{program_id} 等）で集計する
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - started, method=scope["method"], route=route, status=str(status)
+            )
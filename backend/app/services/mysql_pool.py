@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, Iterator
+
+
+class PoolTimeoutError(RuntimeError):
+    pass
+
+
+@dataclass
+class PooledConnection:
+    conn: Any
+    created_at: float
+    last_used_at: float
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool for DB-API connections.
+
+    Idle connections older than `recycle_seconds` are replaced, and ones idle
+    longer than `health_check_seconds` are pinged before being handed out.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        size: int,
+        recycle_seconds: float,
+        acquire_timeout: float,
+        health_check_seconds: float,
+    ):
+        self._connect = connect
+        self.size = size
+        self.recycle_seconds = recycle_seconds
+        self.acquire_timeout = acquire_timeout
+        self.health_check_seconds = health_check_seconds
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle: Deque[PooledConnection] = deque()
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._counters: Dict[str, float] = {
+            "created": 0,
+            "closed": 0,
+            "acquired": 0,
+            "timeouts": 0,
+            "recycled": 0,
+            "health_check_failures": 0,
+            "wait_seconds_total": 0.0,
+        }
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        pooled = self.acquire()
+        try:
+            yield pooled.conn
+        except Exception:
+            # 実行中に失敗した接続は状態が不明なので再利用しない
+            self.release(pooled, discard=True)
+            raise
+        self.release(pooled)
+
+    def acquire(self) -> PooledConnection:
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            with self._lock:
+                self._counters["timeouts"] += 1
+            raise PoolTimeoutError(f"Timed out after {self.acquire_timeout}s waiting for a MySQL connection")
+        try:
+            pooled = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._in_use += 1
+            self._counters["acquired"] += 1
+            self._counters["wait_seconds_total"] += time.monotonic() - started
+        return pooled
+
+    def release(self, pooled: PooledConnection, discard: bool = False) -> None:
+        pooled.last_used_at = time.monotonic()
+        with self._lock:
+            self._in_use -= 1
+            if not discard:
+                self._idle.append(pooled)
+        if discard:
+            self._close(pooled)
+        self._slots.release()
+
+    def close(self) -> None:
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+        for pooled in idle:
+            self._close(pooled)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "size": self.size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                **self._counters,
+            }
+
+    def _checkout(self) -> PooledConnection:
+        now = time.monotonic()
+        while True:
+            with self._lock:
+                pooled = self._idle.pop() if self._idle else None
+            if pooled is None:
+                break
+            if now - pooled.created_at >= self.recycle_seconds:
+                with self._lock:
+                    self._counters["recycled"] += 1
+                self._close(pooled)
+                continue
+            if now - pooled.last_used_at >= self.health_check_seconds and not self._is_healthy(pooled):
+                with self._lock:
+                    self._counters["health_check_failures"] += 1
+                self._close(pooled)
+                continue
+            return pooled
+
+        conn = self._connect()
+        with self._lock:
+            self._counters["created"] += 1
+        return PooledConnection(conn=conn, created_at=now, last_used_at=now)
+
+    def _is_healthy(self, pooled: PooledConnection) -> bool:
+        try:
+            pooled.conn.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def _close(self, pooled: PooledConnection) -> None:
+        with self._lock:
+            self._counters["closed"] += 1
+        try:
+            pooled.conn.close()
+        except Exception:
+            pass
@@ -1,10 +1,35 @@
 from __future__ import annotations
 
+import asyncio
 import json
+import time
+from dataclasses import dataclass
 from datetime import date, datetime
-from typing import Any, List, Optional
+from functools import partial
+from typing import Any, Dict, List, Optional, Sequence
+from weakref import WeakKeyDictionary
 
 from ..models import Program
+from .metrics import timed_query
+from .mysql_pool import ConnectionPool
+from .program_record import order_by_ids
+
+PROGRAM_SELECT_SQL = """
+SELECT
+    program_id,
+    program_name,
+    municipality,
+    summary,
+    eligibility,
+    deadline,
+    gray_zone_guidance
+FROM programs
+"""
+
+CATALOG_VERSION_SQL = """
+SELECT COUNT(*) AS program_count, MAX(updated_at) AS watermark
+FROM programs
+"""
 
 
 class MySQLStore:
@@ -17,6 +42,10 @@ class MySQLStore:
         password: str,
         database: str,
         connect_timeout: int = 5,
+        pool_size: int = 5,
+        pool_recycle_seconds: float = 1800,
+        pool_acquire_timeout: float = 10,
+        pool_health_check_seconds: float = 30,
     ):
         try:
             import mysql.connector  # type: ignore
@@ -31,93 +60,312 @@ class MySQLStore:
             "connection_timeout": connect_timeout,
             "charset": "utf8mb4",
             "use_unicode": True,
+            # プールした接続で古いスナップショットを読み続けないよう、読み取りごとに確定させる
+            "autocommit": True,
         }
         if unix_socket:
             self._conn_cfg["unix_socket"] = unix_socket
         else:
             self._conn_cfg["host"] = host
             self._conn_cfg["port"] = port
+        self._pool = ConnectionPool(
+            connect=lambda: self._mysql.connect(**self._conn_cfg),
+            size=pool_size,
+            recycle_seconds=pool_recycle_seconds,
+            acquire_timeout=pool_acquire_timeout,
+            health_check_seconds=pool_health_check_seconds,
+        )
 
     def list_programs(self, municipality: Optional[str] = None) -> List[Program]:
-        sql = """
-        SELECT
-            program_id,
-            program_name,
-            municipality,
-            summary,
-            eligibility,
-            deadline,
-            gray_zone_guidance
-        FROM programs
-        """
+        sql = PROGRAM_SELECT_SQL
         params: List[Any] = []
         if municipality:
             sql += " WHERE municipality = %s"
             params.append(municipality)
 
         rows = self._fetch_all(sql, params)
-        return [self._row_to_program(row) for row in rows]
+        return [_row_to_program(row) for row in rows]
 
     def get_program(self, program_id: str) -> Optional[Program]:
-        sql = """
-        SELECT
-            program_id,
-            program_name,
-            municipality,
-            summary,
-            eligibility,
-            deadline,
-            gray_zone_guidance
-        FROM programs
-        WHERE program_id = %s
-        LIMIT 1
-        """
+        sql = PROGRAM_SELECT_SQL + " WHERE program_id = %s LIMIT 1"
         row = self._fetch_one(sql, [program_id])
         if not row:
             return None
-        return self._row_to_program(row)
+        return _row_to_program(row)
+
+    def get_programs(self, program_ids: Sequence[str]) -> List[Program]:
+        if not program_ids:
+            return []
+        sql, params = _select_by_ids_sql(program_ids)
+        return order_by_ids([_row_to_program(row) for row in self._fetch_all(sql, params)], program_ids)
+
+    def catalog_version(self, municipality: Optional[str] = None) -> Optional[str]:
+        sql, params = _catalog_version_sql(municipality)
+        return _format_version(self._fetch_one(sql, params))
+
+    def pool_metrics(self) -> dict:
+        return self._pool.metrics()
+
+    def close(self) -> None:
+        self._pool.close()
 
     def _fetch_all(self, sql: str, params: List[Any]) -> List[dict]:
-        conn = self._mysql.connect(**self._conn_cfg)
-        try:
+        with self._pool.connection() as conn:
             cursor = conn.cursor(dictionary=True)
             try:
                 cursor.execute(sql, params)
                 return cursor.fetchall() or []
             finally:
                 cursor.close()
-        finally:
-            conn.close()
 
     def _fetch_one(self, sql: str, params: List[Any]) -> Optional[dict]:
-        conn = self._mysql.connect(**self._conn_cfg)
-        try:
+        with self._pool.connection() as conn:
             cursor = conn.cursor(dictionary=True)
             try:
                 cursor.execute(sql, params)
-                return cursor.fetchone()
+                row = cursor.fetchone()
+                # 未読の行が残った接続はプールに戻せないため読み切る
+                cursor.fetchall()
+                return row
             finally:
                 cursor.close()
-        finally:
-            conn.close()
 
-    def _row_to_program(self, row: dict) -> Program:
-        deadline = row.get("deadline")
-        if isinstance(deadline, (date, datetime)):
-            deadline_value = deadline.isoformat()
+
+@dataclass
+class _ConnectionTimes:
+    created_at: float
+    last_used_at: float
+
+
+class AsyncMySQLStore:
+    """aiomysql-backed store; queries never block the event loop.
+
+    Connections are recycled and health-checked on acquire with the same
+    rules and counters as the sync ConnectionPool.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        unix_socket: Optional[str],
+        user: str,
+        password: str,
+        database: str,
+        connect_timeout: int = 5,
+        pool_size: int = 5,
+        pool_recycle_seconds: float = 1800,
+        pool_acquire_timeout: float = 10,
+        pool_health_check_seconds: float = 30,
+    ):
+        try:
+            import aiomysql  # type: ignore
+        except Exception as exc:
+            raise RuntimeError("aiomysql is not available") from exc
+
+        self._aiomysql = aiomysql
+        self._pool_cfg = {
+            "user": user,
+            "password": password,
+            "db": database,
+            "connect_timeout": connect_timeout,
+            "charset": "utf8mb4",
+            "autocommit": True,
+            "minsize": 0,
+            "maxsize": pool_size,
+        }
+        if unix_socket:
+            self._pool_cfg["unix_socket"] = unix_socket
         else:
-            deadline_value = deadline
-
-        payload = {
-            "program_id": row.get("program_id", ""),
-            "program_name": row.get("program_name", ""),
-            "municipality": row.get("municipality", ""),
-            "summary": row.get("summary", ""),
-            "eligibility": _parse_json_value(row.get("eligibility"), {}),
-            "deadline": deadline_value,
-            "gray_zone_guidance": _parse_json_value(row.get("gray_zone_guidance"), []),
+            self._pool_cfg["host"] = host
+            self._pool_cfg["port"] = port
+        # 作り直しは aiomysql の pool_recycle（最終利用からの秒数）ではなく、同期版と同じく作成からの秒数で判断する
+        self._pool_recycle_seconds = pool_recycle_seconds
+        self._pool_acquire_timeout = pool_acquire_timeout
+        self._pool_health_check_seconds = pool_health_check_seconds
+        self._pool = None
+        self._pool_lock = asyncio.Lock()
+        self._times: "WeakKeyDictionary[Any, _ConnectionTimes]" = WeakKeyDictionary()
+        self._counters: Dict[str, float] = {
+            "created": 0,
+            "closed": 0,
+            "acquired": 0,
+            "timeouts": 0,
+            "recycled": 0,
+            "health_check_failures": 0,
+            "wait_seconds_total": 0.0,
         }
-        return Program.model_validate(payload)
+
+    @timed_query("list_programs")
+    async def list_programs(self, municipality: Optional[str] = None) -> List[Program]:
+        sql = PROGRAM_SELECT_SQL
+        params: List[Any] = []
+        if municipality:
+            sql += " WHERE municipality = %s"
+            params.append(municipality)
+        rows = await self._fetch_all(sql, params)
+        return [_row_to_program(row) for row in rows]
+
+    @timed_query("get_program")
+    async def get_program(self, program_id: str) -> Optional[Program]:
+        rows = await self._fetch_all(PROGRAM_SELECT_SQL + " WHERE program_id = %s LIMIT 1", [program_id])
+        if not rows:
+            return None
+        return _row_to_program(rows[0])
+
+    @timed_query("get_programs")
+    async def get_programs(self, program_ids: Sequence[str]) -> List[Program]:
+        if not program_ids:
+            return []
+        sql, params = _select_by_ids_sql(program_ids)
+        rows = await self._fetch_all(sql, params)
+        return order_by_ids([_row_to_program(row) for row in rows], program_ids)
+
+    @timed_query("catalog_version")
+    async def catalog_version(self, municipality: Optional[str] = None) -> Optional[str]:
+        sql, params = _catalog_version_sql(municipality)
+        rows = await self._fetch_all(sql, params)
+        return _format_version(rows[0] if rows else None)
+
+    def pool_metrics(self) -> Optional[dict]:
+        if self._pool is None:
+            return None
+        return {
+            "size": self._pool.maxsize,
+            "open": self._pool.size,
+            "idle": self._pool.freesize,
+            "in_use": self._pool.size - self._pool.freesize,
+            **self._counters,
+        }
+
+    async def close(self) -> None:
+        if self._pool is None:
+            return
+        self._pool.close()
+        await self._pool.wait_closed()
+        self._pool = None
+
+    async def _get_pool(self):
+        if self._pool is None:
+            async with self._pool_lock:
+                if self._pool is None:
+                    self._pool = await self._aiomysql.create_pool(**self._pool_cfg)
+        return self._pool
+
+    async def _acquire(self, pool):
+        # aiomysql の acquire() にはタイムアウトが無い。wait_for で直接取り消すと、タイムアウトと同時に
+        # 取得が完了した接続が返されずに漏れるため、取得は別タスクで行い、諦めたときは完了を待って返却する
+        started = time.monotonic()
+        acquire = asyncio.ensure_future(self._checkout(pool))
+        try:
+            conn = await asyncio.wait_for(asyncio.shield(acquire), timeout=self._pool_acquire_timeout)
+        except BaseException as exc:
+            if isinstance(exc, asyncio.TimeoutError):
+                self._counters["timeouts"] += 1
+            acquire.cancel()
+            acquire.add_done_callback(partial(_release_acquired, pool))
+            raise
+        self._counters["acquired"] += 1
+        self._counters["wait_seconds_total"] += time.monotonic() - started
+        return conn
+
+    async def _checkout(self, pool):
+        # 作成から pool_recycle_seconds 以上経った接続は作り直し、health_check_seconds 以上使われていない接続は ping で確かめる
+        while True:
+            conn = await pool.acquire()
+            try:
+                now = time.monotonic()
+                times = self._times.get(conn)
+                if times is None:
+                    self._times[conn] = _ConnectionTimes(created_at=now, last_used_at=now)
+                    self._counters["created"] += 1
+                    return conn
+                if now - times.created_at >= self._pool_recycle_seconds:
+                    self._counters["recycled"] += 1
+                elif now - times.last_used_at < self._pool_health_check_seconds or await _is_healthy(conn):
+                    return conn
+                else:
+                    self._counters["health_check_failures"] += 1
+            except BaseException:
+                # ping の途中で取り消された接続は状態が不明なので捨てる
+                self._discard(pool, conn)
+                raise
+            self._discard(pool, conn)
+
+    def _discard(self, pool, conn) -> None:
+        # 閉じた接続は aiomysql のプールに返しても空きに戻らず、枠だけが解放される
+        conn.close()
+        pool.release(conn)
+        self._counters["closed"] += 1
+
+    def _release(self, pool, conn) -> None:
+        times = self._times.get(conn)
+        if times is not None:
+            times.last_used_at = time.monotonic()
+        pool.release(conn)
+
+    async def _fetch_all(self, sql: str, params: List[Any]) -> List[dict]:
+        pool = await self._get_pool()
+        conn = await self._acquire(pool)
+        try:
+            async with conn.cursor(self._aiomysql.DictCursor) as cursor:
+                await cursor.execute(sql, params)
+                return list(await cursor.fetchall() or [])
+        finally:
+            self._release(pool, conn)
+
+
+async def _is_healthy(conn) -> bool:
+    try:
+        await conn.ping(reconnect=False)
+        return True
+    except Exception:
+        return False
+
+
+def _release_acquired(pool, acquire: "asyncio.Future") -> None:
+    if not acquire.cancelled() and acquire.exception() is None:
+        pool.release(acquire.result())
+
+
+def _catalog_version_sql(municipality: Optional[str]) -> tuple[str, List[Any]]:
+    # 件数と updated_at の最大値（ウォーターマーク）だけを見る軽いクエリ。削除も件数で検出する
+    if municipality:
+        return CATALOG_VERSION_SQL + " WHERE municipality = %s", [municipality]
+    return CATALOG_VERSION_SQL, []
+
+
+def _format_version(row: Optional[dict]) -> Optional[str]:
+    if not row:
+        return None
+    watermark = row.get("watermark")
+    if isinstance(watermark, (date, datetime)):
+        watermark = watermark.isoformat()
+    return f"{row.get('program_count', 0)}:{watermark}"
+
+
+def _select_by_ids_sql(program_ids: Sequence[str]) -> tuple[str, List[Any]]:
+    placeholders = ", ".join(["%s"] * len(program_ids))
+    return PROGRAM_SELECT_SQL + f" WHERE program_id IN ({placeholders})", list(program_ids)
+
+
+def _row_to_program(row: dict) -> Program:
+    deadline = row.get("deadline")
+    if isinstance(deadline, (date, datetime)):
+        deadline_value = deadline.isoformat()
+    else:
+        deadline_value = deadline
+
+    payload = {
+        "program_id": row.get("program_id", ""),
+        "program_name": row.get("program_name", ""),
+        "municipality": row.get("municipality", ""),
+        "summary": row.get("summary", ""),
+        "eligibility": _parse_json_value(row.get("eligibility"), {}),
+        "deadline": deadline_value,
+        "gray_zone_guidance": _parse_json_value(row.get("gray_zone_guidance"), []),
+    }
+    return Program.model_validate(payload)
 
 
 def _parse_json_value(value: Any, default: Any) -> Any:
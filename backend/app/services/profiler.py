@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+PROFILE_HEADER = b"x-profile"
+ADMIN_TOKEN_HEADER = b"x-admin-token"
+MAX_STACKS = 20000
+MAX_DEPTH = 128
+TRUNCATED_STACK = "[truncated]"
+# 待機中のスレッド（イベントループの select、スレッドプールの待ち受け等）は CPU を使っていないので数えない
+IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("thread.py", "_worker"),
+    ("queue.py", "get"),
+}
+
+
+class SamplingProfiler:
+    """Samples Python stacks of all threads while profiled requests are in flight.
+
+    A daemon thread wakes every `interval` seconds only while at least one
+    profiled request is running; stacks are aggregated into flamegraph
+    "collapsed" lines (`thread;outer;...;leaf count`). Concurrent requests
+    share the event loop thread, so samples are attributed to the process,
+    not to a single request.
+    """
+
+    def __init__(self, interval: float = 0.005, max_stacks: int = MAX_STACKS):
+        self.interval = interval
+        self.max_stacks = max_stacks
+        self._stacks: Counter = Counter()
+        self._labels: Dict[object, str] = {}
+        self._lock = threading.Lock()
+        self._active = 0
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._counters = {"profiled_requests": 0, "samples": 0, "truncated": 0}
+        self._sampling_seconds = 0.0
+
+    def begin(self) -> None:
+        with self._lock:
+            self._active += 1
+            self._counters["profiled_requests"] += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def end(self) -> None:
+        with self._lock:
+            self._active = max(0, self._active - 1)
+            if not self._active:
+                self._wake.clear()
+
+    def collapsed(self) -> str:
+        with self._lock:
+            stacks = self._stacks.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._counters,
+                "stacks": len(self._stacks),
+                "active": self._active,
+                "interval_seconds": self.interval,
+                "sampling_seconds": self._sampling_seconds,
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stacks.clear()
+            self._labels.clear()
+            for key in self._counters:
+                self._counters[key] = 0
+            self._sampling_seconds = 0.0
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while True:
+            self._wake.wait()
+            started = time.perf_counter()
+            self._sample(own_id)
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._sampling_seconds += elapsed
+            time.sleep(max(0.0, self.interval - elapsed))
+
+    def _sample(self, own_id: int) -> None:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        stacks: List[str] = []
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            code = frame.f_code
+            if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                continue
+            labels = [names.get(thread_id, str(thread_id))]
+            frames = []
+            while frame is not None and len(frames) < MAX_DEPTH:
+                frames.append(self._label(frame.f_code))
+                frame = frame.f_back
+            labels.extend(reversed(frames))
+            stacks.append(";".join(labels))
+        with self._lock:
+            for stack in stacks:
+                if stack not in self._stacks and len(self._stacks) >= self.max_stacks:
+                    self._counters["truncated"] += 1
+                    stack = TRUNCATED_STACK
+                self._stacks[stack] += 1
+            self._counters["samples"] += 1
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            name = getattr(code, "co_qualname", code.co_name)
+            # py-spy と同じ "関数名 (ファイル:行)" 形式。collapsed 形式の区切り文字 ; は使えない
+            label = f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+            self._labels[code] = label
+        return label
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that profiles a random fraction of requests.
+
+    Requests with `X-Profile: 1` and a valid `X-Admin-Token` are always
+    profiled. With a zero sample rate and no header the cost is a header scan.
+    """
+
+    def __init__(self, app, profiler: SamplingProfiler, sample_rate: float, admin_token: Optional[str]):
+        self.app = app
+        self.profiler = profiler
+        self.sample_rate = sample_rate
+        self.admin_token = admin_token
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+        self.profiler.begin()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.profiler.end()
+
+    def _should_profile(self, scope) -> bool:
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return True
+        if not self.admin_token:
+            return False
+        headers = _headers(scope, (PROFILE_HEADER, ADMIN_TOKEN_HEADER))
+        return headers.get(PROFILE_HEADER) == b"1" and is_admin_token(
+            self.admin_token, headers.get(ADMIN_TOKEN_HEADER, b"").decode("latin-1")
+        )
+
+
+def is_admin_token(expected: Optional[str], supplied: Optional[str]) -> bool:
+    if not expected or not supplied:
+        return False
+    return hmac.compare_digest(expected.encode("utf-8"), supplied.encode("utf-8"))
+
+
+def _headers(scope, names: Tuple[bytes, ...]) -> Dict[bytes, bytes]:
+    return {name: value for name, value in scope.get("headers", ()) if name in names}
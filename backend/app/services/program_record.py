@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+from typing import List, Optional, Sequence, Union
+
+from ..models import Eligibility, Program
+
+ELIGIBILITY_FIELDS = tuple(Eligibility.model_fields)
+PROGRAM_FIELDS = tuple(Program.model_fields)
+
+
+class EligibilityRecord:
+    """Plain-object counterpart of `Eligibility` used on the evaluation hot path."""
+
+    __slots__ = ELIGIBILITY_FIELDS
+
+    def __init__(
+        self,
+        age_min: Optional[int] = None,
+        age_max: Optional[int] = None,
+        income_min_yen: Optional[int] = None,
+        income_max_yen: Optional[int] = None,
+        household_min: Optional[int] = None,
+        household_max: Optional[int] = None,
+        dependents_min: Optional[int] = None,
+        dependents_max: Optional[int] = None,
+        gender_keywords: Optional[List[str]] = None,
+        occupation_keywords: Optional[List[str]] = None,
+        notes: Optional[str] = None,
+    ):
+        self.age_min = age_min
+        self.age_max = age_max
+        self.income_min_yen = income_min_yen
+        self.income_max_yen = income_max_yen
+        self.household_min = household_min
+        self.household_max = household_max
+        self.dependents_min = dependents_min
+        self.dependents_max = dependents_max
+        self.gender_keywords = gender_keywords
+        self.occupation_keywords = occupation_keywords
+        self.notes = notes
+
+    @classmethod
+    def from_model(cls, eligibility: Eligibility) -> EligibilityRecord:
+        return cls(**{name: getattr(eligibility, name) for name in ELIGIBILITY_FIELDS})
+
+    def to_model(self) -> Eligibility:
+        return Eligibility.model_construct(**{name: getattr(self, name) for name in ELIGIBILITY_FIELDS})
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, EligibilityRecord):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in ELIGIBILITY_FIELDS)
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in ELIGIBILITY_FIELDS)
+        return f"EligibilityRecord({fields})"
+
+
+class ProgramRecord:
+    """Plain-object counterpart of `Program` used on the evaluation hot path.
+
+    Records are built from already-validated data and expose the same
+    attributes as `Program`, so the rule engine and prompt builder accept
+    either. Convert with `to_program()` only at the API boundary; the
+    conversion shares lists and strings instead of copying them.
+    """
+
+    __slots__ = PROGRAM_FIELDS
+
+    def __init__(
+        self,
+        program_id: str,
+        program_name: str,
+        municipality: str,
+        summary: str,
+        eligibility: EligibilityRecord,
+        deadline: Optional[str] = None,
+        gray_zone_guidance: Optional[List[str]] = None,
+    ):
+        self.program_id = program_id
+        self.program_name = program_name
+        self.municipality = municipality
+        self.summary = summary
+        self.eligibility = eligibility
+        self.deadline = deadline
+        self.gray_zone_guidance = gray_zone_guidance if gray_zone_guidance is not None else []
+
+    @classmethod
+    def from_program(cls, program: Program) -> ProgramRecord:
+        return cls(
+            program_id=program.program_id,
+            program_name=program.program_name,
+            municipality=program.municipality,
+            summary=program.summary,
+            eligibility=EligibilityRecord.from_model(program.eligibility),
+            deadline=program.deadline,
+            gray_zone_guidance=program.gray_zone_guidance,
+        )
+
+    def to_program(self) -> Program:
+        return Program.model_construct(
+            program_id=self.program_id,
+            program_name=self.program_name,
+            municipality=self.municipality,
+            summary=self.summary,
+            eligibility=self.eligibility.to_model(),
+            deadline=self.deadline,
+            gray_zone_guidance=self.gray_zone_guidance,
+        )
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, ProgramRecord):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in PROGRAM_FIELDS)
+
+    def __repr__(self) -> str:
+        return f"ProgramRecord(program_id={self.program_id!r}, program_name={self.program_name!r})"
+
+
+ProgramLike = Union[Program, ProgramRecord]
+
+
+def to_record(program: ProgramLike) -> ProgramRecord:
+    return program if isinstance(program, ProgramRecord) else ProgramRecord.from_program(program)
+
+
+def to_records(programs: Sequence[ProgramLike]) -> List[ProgramRecord]:
+    return [to_record(program) for program in programs]
+
+
+def to_program(program: ProgramLike) -> Program:
+    return program.to_program() if isinstance(program, ProgramRecord) else program
+
+
+def order_by_ids(programs: Sequence[ProgramLike], program_ids: Sequence[str]) -> List[ProgramLike]:
+    # ID 指定の取得結果を指定順に並べ直す（見つからなかった ID は飛ばす）
+    by_id = {program.program_id: program for program in programs}
+    return [by_id[program_id] for program_id in program_ids if program_id in by_id]
@@ -1,16 +1,38 @@
 from __future__ import annotations
 
+import threading
+import weakref
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import List
+from typing import Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
 
 from ..models import (
     Deadline,
-    Program,
     ProgramRecommendation,
     Reason,
     TodoItem,
     UserInput,
 )
+from . import catalog_events
+from .eligibility_matrix import LEVEL_NAMES, CompiledCatalog, MatrixEvaluation
+from .program_record import ProgramLike
+from .rule_predicates import predicate_for
+
+COMPILED_CATALOG_CACHE_SIZE = 4
+# カタログごとに区間メモが保持する制度の行数の上限（1行 6 バイト。既定で 1 カタログ約 6MB）
+REGION_MEMO_MAX_ROWS = 1_000_000
+
+_compiled_catalogs: "OrderedDict[Tuple[int, ...], CompiledCatalog]" = OrderedDict()
+# 渡された一覧オブジェクトそのもの（id）からの引き当て。一覧の参照も保持するので id は再利用されない
+_compiled_sources: "OrderedDict[int, Tuple[Sequence[ProgramLike], CompiledCatalog]]" = OrderedDict()
+# バッチのルール判定はワーカースレッドでも走るため、上の2つの LRU はロックして更新する
+_compiled_lock = threading.Lock()
+# カタログが LRU から外れて解放されれば、その判定結果も一緒に消える
+_region_memos: "weakref.WeakKeyDictionary[CompiledCatalog, _RegionMemo]" = weakref.WeakKeyDictionary()
+_region_memo_lock = threading.Lock()
+_region_memo_counters = {"hits": 0, "misses": 0, "evictions": 0}
 
 
 @dataclass
@@ -26,178 +48,194 @@ class Evaluation:
     todo: List[TodoItem]
 
 
+@dataclass
+class RankedPrograms:
+    """Sorted (and limited) rule verdicts of one user, without reason texts.
+
+    This is what the region memo keeps: 6 bytes per program instead of a
+    `ProgramRecommendation`. Reasons are rebuilt from the catalog's
+    predicates, which give the same result for every user in the region.
+    """
+
+    positions: np.ndarray
+    eligible: np.ndarray
+    level: np.ndarray
+
+    @property
+    def nbytes(self) -> int:
+        return self.positions.nbytes + self.eligible.nbytes + self.level.nbytes
+
+
+class _RegionMemo:
+    def __init__(self) -> None:
+        self.entries: "OrderedDict[Hashable, RankedPrograms]" = OrderedDict()
+        self.rows = 0
+
+
+def compile_catalog(programs: Sequence[ProgramLike]) -> CompiledCatalog:
+    # カタログキャッシュは同じ一覧オブジェクトを返し続けるので、まず一覧自体の同一性で O(1) で引く
+    # （制度一覧は読み取り専用として扱い、その場で書き換えない前提）
+    with _compiled_lock:
+        source = _compiled_sources.get(id(programs))
+        if source is not None and source[0] is programs and len(programs) == len(source[1]):
+            _compiled_sources.move_to_end(id(programs))
+            return source[1]
+        # 初めて見る一覧は制度の id() の組で引く（制度数に比例する）。CompiledCatalog が制度を保持するため、
+        # id() の組は生存中に再利用されない
+        key = tuple(map(id, programs))
+        catalog = _compiled_catalogs.get(key)
+        if catalog is not None:
+            _compiled_catalogs.move_to_end(key)
+    if catalog is None:
+        # コンパイルはロックの外で行う（バッチのワーカースレッドと同時に走っても、後から登録した方が残るだけ）
+        catalog = remember_compiled_catalog(CompiledCatalog(programs))
+    with _compiled_lock:
+        _compiled_sources[id(programs)] = (programs, catalog)
+        while len(_compiled_sources) > COMPILED_CATALOG_CACHE_SIZE:
+            _compiled_sources.popitem(last=False)
+    return catalog
+
+
+def remember_compiled_catalog(catalog: CompiledCatalog) -> CompiledCatalog:
+    # ワーカースレッドで事前にコンパイルしたカタログを、イベントループ側でキャッシュに登録する
+    key = tuple(map(id, catalog.programs))
+    with _compiled_lock:
+        _compiled_catalogs[key] = catalog
+        _compiled_catalogs.move_to_end(key)
+        while len(_compiled_catalogs) > COMPILED_CATALOG_CACHE_SIZE:
+            _compiled_catalogs.popitem(last=False)
+    return catalog
+
+
+def invalidate_compiled_catalogs(municipality: Optional[str] = None) -> None:
+    with _compiled_lock:
+        _compiled_catalogs.clear()
+        _compiled_sources.clear()
+    with _region_memo_lock:
+        _region_memos.clear()
+
+
+def region_memo_stats() -> dict:
+    with _region_memo_lock:
+        memos = list(_region_memos.values())
+        return {
+            **_region_memo_counters,
+            "entries": sum(len(memo.entries) for memo in memos),
+            "rows": sum(memo.rows for memo in memos),
+            "bytes": sum(ranked.nbytes for memo in memos for ranked in memo.entries.values()),
+            "catalogs": len(memos),
+        }
+
+
+catalog_events.subscribe(invalidate_compiled_catalogs)
+
+
 def recommend_programs(
     user: UserInput,
-    programs: List[Program],
+    programs: Sequence[ProgramLike],
+    limit: Optional[int] = None,
 ) -> List[ProgramRecommendation]:
-    scored_recommendations: List[tuple[ProgramRecommendation, float]] = []
-
-    for program in programs:
-        evaluation = _evaluate_program(user, program)
-        deadline = Deadline(date=program.deadline, evidence_ref=None)
-        recommendation = ProgramRecommendation(
-            program_id=program.program_id,
-            program_name=program.program_name,
-            eligible=evaluation.eligible,
-            level=evaluation.level,
-            reasons=evaluation.reasons,
-            deadline=deadline,
-            todo=evaluation.todo,
-            evidence=[],
-        )
-        scored_recommendations.append((recommendation, evaluation.score))
+    catalog = compile_catalog(programs)
+    # 判定はしきい値の区間だけで決まるので、同じ区間のユーザーには並べ替え済みの判定を使い回す
+    key = ("programs", limit, catalog.region_key(user))
+    ranked = _memo_get(catalog, key)
+    if ranked is None:
+        ranked = _memo_put(catalog, key, _rank(catalog.evaluate(user), limit))
+    return _materialize(user, catalog, ranked)
+
+
+def recommend_programs_batch(
+    users: Sequence[UserInput],
+    programs: Sequence[ProgramLike],
+    limit: Optional[int] = None,
+) -> List[List[ProgramRecommendation]]:
+    catalog = compile_catalog(programs)
+    if not users:
+        return []
+    keys = [("programs", limit, catalog.region_key(user)) for user in users]
+    ranked = {key: _memo_get(catalog, key) for key in set(keys)}
+    # 未計算の区間ごとに代表のユーザーを1人だけ行列で判定する
+    missing = {}
+    for key, user in zip(keys, users):
+        if ranked[key] is None:
+            missing.setdefault(key, user)
+    if missing:
+        matrix = catalog.evaluate_many(list(missing.values()))
+        for row, key in enumerate(missing):
+            ranked[key] = _memo_put(catalog, key, _rank(matrix.row(row), limit))
+    return [_materialize(user, catalog, ranked[key]) for key, user in zip(keys, users)]
+
+
+def _memo_get(catalog: CompiledCatalog, key: Hashable) -> Optional[RankedPrograms]:
+    with _region_memo_lock:
+        memo = _region_memos.get(catalog)
+        ranked = memo.entries.get(key) if memo is not None else None
+        if ranked is None:
+            _region_memo_counters["misses"] += 1
+            return None
+        memo.entries.move_to_end(key)
+        _region_memo_counters["hits"] += 1
+        return ranked
+
 
-    order = {"high": 0, "medium": 1, "low": 2}
-    sorted_with_score = sorted(
-        scored_recommendations,
-        key=lambda item: (0 if item[0].eligible else 1, order.get(item[0].level, 9), -item[1]),
+def _memo_put(catalog: CompiledCatalog, key: Hashable, ranked: RankedPrograms) -> RankedPrograms:
+    # 上限はキーの数ではなく保持する制度の行数で決める（大きなカタログほど保持できる区間が少なくなる）
+    rows = len(ranked.positions)
+    if rows > REGION_MEMO_MAX_ROWS:
+        return ranked
+    with _region_memo_lock:
+        memo = _region_memos.get(catalog)
+        if memo is None:
+            memo = _region_memos[catalog] = _RegionMemo()
+        previous = memo.entries.pop(key, None)
+        if previous is not None:
+            memo.rows -= len(previous.positions)
+        memo.entries[key] = ranked
+        memo.rows += rows
+        while memo.rows > REGION_MEMO_MAX_ROWS:
+            _, evicted = memo.entries.popitem(last=False)
+            memo.rows -= len(evicted.positions)
+            _region_memo_counters["evictions"] += 1
+    return ranked
+
+
+def _rank(evaluation: MatrixEvaluation, limit: Optional[int]) -> RankedPrograms:
+    order = evaluation.order()
+    if limit is not None:
+        order = order[:limit]
+    return RankedPrograms(
+        positions=order.astype(np.int32),
+        eligible=evaluation.eligible[order].astype(bool),
+        level=evaluation.level[order].astype(np.int8),
     )
-    return [item[0] for item in sorted_with_score]
-
-
-def _evaluate_program(user: UserInput, program: Program) -> Evaluation:
-    eligibility = program.eligibility
-    reasons: List[Reason] = []
-    todo: List[TodoItem] = []
-    match_messages: List[str] = []
-    gap_messages: List[str] = []
-
-    total_checks = 0
-    matched = 0
-    evidence_ref = 0
-
-    def add_check(is_match: bool, ok_text: str, ng_text: str) -> None:
-        nonlocal total_checks, matched
-        total_checks += 1
-        if is_match:
-            matched += 1
-            if ok_text:
-                match_messages.append(ok_text)
-                reasons.append(Reason(text=ok_text, evidence_ref=evidence_ref))
-            return
-        if ng_text:
-            gap_messages.append(ng_text)
-            reasons.append(Reason(text=ng_text, evidence_ref=evidence_ref))
-
-    # Age
-    if eligibility.age_min is not None or eligibility.age_max is not None:
-        ok = True
-        if eligibility.age_min is not None and user.age < eligibility.age_min:
-            ok = False
-            add_check(
-                False,
-                "",
-                f"年齢が{eligibility.age_min}歳以上に満たないため対象外の可能性。{eligibility.age_min}歳以上で対象になります。",
-            )
-        if eligibility.age_max is not None and user.age > eligibility.age_max:
-            ok = False
-            add_check(
-                False,
-                "",
-                f"年齢が{eligibility.age_max}歳以下に収まらないため対象外の可能性。{eligibility.age_max}歳以下で対象になります。",
-            )
-        if ok:
-            add_check(True, "対象年齢に該当する", "")
-
-    # Income
-    if eligibility.income_min_yen is not None or eligibility.income_max_yen is not None:
-        ok = True
-        if eligibility.income_min_yen is not None and user.income_yen < eligibility.income_min_yen:
-            ok = False
-            add_check(
-                False,
-                "",
-                f"所得が下限（{eligibility.income_min_yen:,}円）に達していないため対象外の可能性。",
-            )
-        if eligibility.income_max_yen is not None and user.income_yen > eligibility.income_max_yen:
-            ok = False
-            add_check(
-                False,
-                "",
-                f"所得が上限（{eligibility.income_max_yen:,}円）を超えているため対象外の可能性。控除後所得で再確認してください。",
-            )
-        if ok:
-            if eligibility.income_min_yen is not None and eligibility.income_max_yen is not None:
-                add_check(True, "所得レンジの条件に該当する", "")
-            elif eligibility.income_min_yen is not None:
-                add_check(True, "所得下限の条件に該当する", "")
-            else:
-                add_check(True, "所得上限に該当する", "")
-
-    # Household
-    if eligibility.household_min is not None or eligibility.household_max is not None:
-        ok = True
-        if eligibility.household_min is not None and user.household < eligibility.household_min:
-            ok = False
-            add_check(
-                False,
-                "",
-                f"世帯人数が{eligibility.household_min}人以上に満たないため対象外の可能性。条件を満たす世帯構成で確認してください。",
-            )
-        if eligibility.household_max is not None and user.household > eligibility.household_max:
-            ok = False
-            add_check(
-                False,
-                "",
-                f"世帯人数が{eligibility.household_max}人以下に収まらないため対象外の可能性。住民票の分離条件を確認してください。",
-            )
-        if ok:
-            add_check(True, "世帯条件に該当する", "")
-
-    # Dependents
-    if eligibility.dependents_min is not None or eligibility.dependents_max is not None:
-        dependents = user.dependents or 0
-        ok = True
-        if eligibility.dependents_min is not None and dependents < eligibility.dependents_min:
-            ok = False
-            add_check(
-                False,
-                "",
-                f"扶養人数が{eligibility.dependents_min}人以上に満たないため対象外の可能性。妊娠中の届出など例外条件を確認してください。",
-            )
-        if eligibility.dependents_max is not None and dependents > eligibility.dependents_max:
-            ok = False
-            add_check(
-                False,
-                "",
-                f"扶養人数が{eligibility.dependents_max}人以下に収まらないため対象外の可能性。世帯構成の条件を確認してください。",
-            )
-        if ok:
-            add_check(True, "扶養人数の条件に該当する", "")
-
-    # Gender
-    if eligibility.gender_keywords:
-        user_gender = (user.gender or "").strip()
-        if not user_gender:
-            add_check(
-                False,
-                "",
-                f"性別条件（{', '.join(eligibility.gender_keywords)}）の判定に必要な情報が未入力です。",
-            )
-        elif any(keyword in user_gender for keyword in eligibility.gender_keywords):
-            add_check(True, "性別条件に該当する", "")
-        else:
-            add_check(
-                False,
-                "",
-                f"性別条件（{', '.join(eligibility.gender_keywords)}）に合致しないため対象外の可能性。",
-            )
 
-    # Occupation
-    if eligibility.occupation_keywords:
-        keywords = eligibility.occupation_keywords
-        occupation = user.occupation or ""
-        if any(key in occupation for key in keywords):
-            add_check(True, "職業条件に合致する", "")
-        else:
-            add_check(
-                False,
-                "",
-                "職業条件に合致しない可能性。経営者や求職者など対象となる区分で申請できるか確認してください。",
+
+def _materialize(user: UserInput, catalog: CompiledCatalog, ranked: RankedPrograms) -> List[ProgramRecommendation]:
+    # 判定理由の文章は返却する制度についてのみ組み立てる
+    recommendations: List[ProgramRecommendation] = []
+    for position, eligible, level in zip(ranked.positions.tolist(), ranked.eligible.tolist(), ranked.level.tolist()):
+        program = catalog.programs[position]
+        recommendations.append(
+            ProgramRecommendation(
+                program_id=program.program_id,
+                program_name=program.program_name,
+                eligible=eligible,
+                level=LEVEL_NAMES[level],
+                reasons=catalog.predicates[position](user).reasons,
+                deadline=Deadline(date=program.deadline, evidence_ref=None),
+                todo=[],
+                evidence=[],
             )
+        )
+    return recommendations
+
 
+def _evaluate_program(user: UserInput, program: ProgramLike) -> Evaluation:
+    # カタログ外の単発判定用。カタログ経由では CompiledCatalog.predicates を使う
+    verdict = predicate_for(program.eligibility)(user)
+    matched, total_checks = verdict.matched, verdict.total
     score = (matched / total_checks) if total_checks else 0.0
-    eligible = total_checks > 0 and matched == total_checks
+    eligible = verdict.eligible
 
     if eligible:
         level = "high"
@@ -216,8 +254,8 @@ def _evaluate_program(user: UserInput, program: Program) -> Evaluation:
         score=score,
         matched_checks=matched,
         total_checks=total_checks,
-        match_messages=match_messages,
-        gap_messages=gap_messages,
-        reasons=reasons,
-        todo=todo,
+        match_messages=verdict.messages(True),
+        gap_messages=verdict.messages(False),
+        reasons=verdict.reasons,
+        todo=[],
     )
@@ -0,0 +1,252 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from operator import attrgetter
+from typing import Callable, Dict, List, Tuple
+
+from ..models import Reason, UserInput
+
+# 判定項目ごとの結果コード。理由の文章はコードと制度の条件から、参照されたときにだけ組み立てる
+AGE_MIN_NG = 1
+AGE_MAX_NG = 2
+AGE_OK = 3
+INCOME_MIN_NG = 4
+INCOME_MAX_NG = 5
+INCOME_RANGE_OK = 6
+INCOME_MIN_OK = 7
+INCOME_MAX_OK = 8
+HOUSEHOLD_MIN_NG = 9
+HOUSEHOLD_MAX_NG = 10
+HOUSEHOLD_OK = 11
+DEPENDENTS_MIN_NG = 12
+DEPENDENTS_MAX_NG = 13
+DEPENDENTS_OK = 14
+GENDER_MISSING = 15
+GENDER_NG = 16
+GENDER_OK = 17
+OCCUPATION_NG = 18
+OCCUPATION_OK = 19
+
+MESSAGES: Dict[int, Callable[[object], str]] = {
+    AGE_MIN_NG: lambda e: f"年齢が{e.age_min}歳以上に満たないため対象外の可能性。{e.age_min}歳以上で対象になります。",
+    AGE_MAX_NG: lambda e: f"年齢が{e.age_max}歳以下に収まらないため対象外の可能性。{e.age_max}歳以下で対象になります。",
+    AGE_OK: lambda e: "対象年齢に該当する",
+    INCOME_MIN_NG: lambda e: f"所得が下限（{e.income_min_yen:,}円）に達していないため対象外の可能性。",
+    INCOME_MAX_NG: lambda e: (
+        f"所得が上限（{e.income_max_yen:,}円）を超えているため対象外の可能性。控除後所得で再確認してください。"
+    ),
+    INCOME_RANGE_OK: lambda e: "所得レンジの条件に該当する",
+    INCOME_MIN_OK: lambda e: "所得下限の条件に該当する",
+    INCOME_MAX_OK: lambda e: "所得上限に該当する",
+    HOUSEHOLD_MIN_NG: lambda e: (
+        f"世帯人数が{e.household_min}人以上に満たないため対象外の可能性。条件を満たす世帯構成で確認してください。"
+    ),
+    HOUSEHOLD_MAX_NG: lambda e: (
+        f"世帯人数が{e.household_max}人以下に収まらないため対象外の可能性。住民票の分離条件を確認してください。"
+    ),
+    HOUSEHOLD_OK: lambda e: "世帯条件に該当する",
+    DEPENDENTS_MIN_NG: lambda e: (
+        f"扶養人数が{e.dependents_min}人以上に満たないため対象外の可能性。妊娠中の届出など例外条件を確認してください。"
+    ),
+    DEPENDENTS_MAX_NG: lambda e: (
+        f"扶養人数が{e.dependents_max}人以下に収まらないため対象外の可能性。世帯構成の条件を確認してください。"
+    ),
+    DEPENDENTS_OK: lambda e: "扶養人数の条件に該当する",
+    GENDER_MISSING: lambda e: f"性別条件（{', '.join(e.gender_keywords)}）の判定に必要な情報が未入力です。",
+    GENDER_NG: lambda e: f"性別条件（{', '.join(e.gender_keywords)}）に合致しないため対象外の可能性。",
+    GENDER_OK: lambda e: "性別条件に該当する",
+    OCCUPATION_NG: lambda e: "職業条件に合致しない可能性。経営者や求職者など対象となる区分で申請できるか確認してください。",
+    OCCUPATION_OK: lambda e: "職業条件に合致する",
+}
+MATCH_CODES = frozenset(
+    {AGE_OK, INCOME_RANGE_OK, INCOME_MIN_OK, INCOME_MAX_OK, HOUSEHOLD_OK, DEPENDENTS_OK, GENDER_OK, OCCUPATION_OK}
+)
+
+# (属性名, ユーザー側の値の式, 下限/上限/該当のコード)。判定の順番は理由の並び順になる
+# 所得の「該当」の文言は制度が持つ下限・上限の組み合わせで変わるため None にしておく
+RANGE_CHECKS = (
+    ("age", "user.age", AGE_MIN_NG, AGE_MAX_NG, AGE_OK),
+    ("income", "user.income_yen", INCOME_MIN_NG, INCOME_MAX_NG, None),
+    ("household", "user.household", HOUSEHOLD_MIN_NG, HOUSEHOLD_MAX_NG, HOUSEHOLD_OK),
+    ("dependents", "(user.dependents or 0)", DEPENDENTS_MIN_NG, DEPENDENTS_MAX_NG, DEPENDENTS_OK),
+)
+RANGE_FIELDS = (
+    ("age_min", "age_max"),
+    ("income_min_yen", "income_max_yen"),
+    ("household_min", "household_max"),
+    ("dependents_min", "dependents_max"),
+)
+_read_conditions = attrgetter(*(name for pair in RANGE_FIELDS for name in pair), "gender_keywords", "occupation_keywords")
+# これ以下のキーワード数なら `in` の連続に展開し、超えたら any() で回す
+UNROLL_KEYWORDS = 4
+# カタログを経由しない判定で使い回す判定関数の件数上限
+STANDALONE_CACHE_SIZE = 4096
+
+Shape = Tuple[object, ...]
+Predicate = Callable[[UserInput], "Verdict"]
+
+
+class ReasonTable:
+    """Reason texts of one program, formatted on first use and kept per result code.
+
+    The `Reason` objects are shared by every verdict of the program and are
+    treated as read-only.
+    """
+
+    __slots__ = ("eligibility", "_reasons")
+
+    def __init__(self, eligibility):
+        self.eligibility = eligibility
+        self._reasons: Dict[int, Reason] = {}
+
+    def reason(self, code: int) -> Reason:
+        reason = self._reasons.get(code)
+        if reason is None:
+            reason = self._reasons[code] = Reason(text=MESSAGES[code](self.eligibility), evidence_ref=0)
+        return reason
+
+    def text(self, code: int) -> str:
+        return self.reason(code).text
+
+
+class Verdict:
+    """Compact result of one program's rule checks.
+
+    `codes` holds one result code per check in evaluation order; reason
+    texts are looked up from the program's `ReasonTable` only when accessed.
+    """
+
+    __slots__ = ("table", "codes", "matched")
+
+    def __init__(self, table: ReasonTable, codes: List[int], matched: int):
+        self.table = table
+        self.codes = codes
+        self.matched = matched
+
+    @property
+    def total(self) -> int:
+        return len(self.codes)
+
+    @property
+    def eligible(self) -> bool:
+        return bool(self.codes) and self.matched == len(self.codes)
+
+    @property
+    def reasons(self) -> List[Reason]:
+        reason = self.table.reason
+        return [reason(code) for code in self.codes]
+
+    def messages(self, matched: bool) -> List[str]:
+        return [self.table.text(code) for code in self.codes if (code in MATCH_CODES) == matched]
+
+
+_factories: Dict[Shape, Callable[..., Predicate]] = {}
+_standalone: "OrderedDict[int, Tuple[object, Predicate]]" = OrderedDict()
+
+
+def compile_predicate(eligibility) -> Predicate:
+    # 制度が実際に持つ条件だけを判定する関数を返す。条件の組み合わせ（形）ごとに1度だけコード生成する
+    values = _read_conditions(eligibility)
+    bounds = values[:8]
+    keyword_lists = [keywords or [] for keywords in values[8:]]
+    # キーワードは UNROLL_KEYWORDS 件までなら1つずつ、超えたらタプルで渡す
+    shape = tuple(value is not None for value in bounds) + tuple(
+        len(keywords) if len(keywords) <= UNROLL_KEYWORDS else -1 for keywords in keyword_lists
+    )
+    factory = _factories.get(shape)
+    if factory is None:
+        factory = _factories[shape] = _generate_factory(shape)
+    args = [value for value in bounds if value is not None]
+    for keywords in keyword_lists:
+        if len(keywords) <= UNROLL_KEYWORDS:
+            args.extend(keywords)
+        else:
+            args.append(tuple(keywords))
+    return factory(ReasonTable(eligibility), *args)
+
+
+def predicate_for(eligibility) -> Predicate:
+    # カタログを経由しない単発の判定用。id の再利用に備えて条件オブジェクト自体も保持し、同一のときだけ使い回す
+    key = id(eligibility)
+    entry = _standalone.get(key)
+    if entry is not None and entry[0] is eligibility:
+        _standalone.move_to_end(key)
+        return entry[1]
+    predicate = compile_predicate(eligibility)
+    _standalone[key] = (eligibility, predicate)
+    while len(_standalone) > STANDALONE_CACHE_SIZE:
+        _standalone.popitem(last=False)
+    return predicate
+
+
+def _keyword_test(prefix: str, count: int, text: str) -> Tuple[List[str], str]:
+    if count == -1:
+        return [f"{prefix}s"], f"any(keyword in {text} for keyword in {prefix}s)"
+    names = [f"{prefix}{index}" for index in range(count)]
+    return names, " or ".join(f"{name} in {text}" for name in names)
+
+
+def _generate_factory(shape: Shape) -> Callable[..., Predicate]:
+    params: List[str] = []
+    body: List[str] = ["codes = []", "matched = 0"]
+    for index, (name, expr, min_ng, max_ng, ok_code) in enumerate(RANGE_CHECKS):
+        has_min, has_max = shape[index * 2], shape[index * 2 + 1]
+        if not (has_min or has_max):
+            continue
+        if ok_code is None:
+            ok_code = INCOME_RANGE_OK if has_min and has_max else INCOME_MIN_OK if has_min else INCOME_MAX_OK
+        lo, hi = f"{name}_min", f"{name}_max"
+        body.append(f"value = {expr}")
+        if has_min and has_max:
+            params += [lo, hi]
+            body += [
+                f"if value < {lo}:",
+                f"    codes.append({min_ng})",
+                f"    if value > {hi}:",
+                f"        codes.append({max_ng})",
+                f"elif value > {hi}:",
+                f"    codes.append({max_ng})",
+            ]
+        elif has_min:
+            params.append(lo)
+            body += [f"if value < {lo}:", f"    codes.append({min_ng})"]
+        else:
+            params.append(hi)
+            body += [f"if value > {hi}:", f"    codes.append({max_ng})"]
+        body += ["else:", f"    codes.append({ok_code})", "    matched += 1"]
+
+    gender_count, occupation_count = shape[8], shape[9]
+    if gender_count:
+        names, test = _keyword_test("gender_keyword", gender_count, "gender")
+        params += names
+        body += [
+            'gender = (user.gender or "").strip()',
+            "if not gender:",
+            f"    codes.append({GENDER_MISSING})",
+            f"elif {test}:",
+            f"    codes.append({GENDER_OK})",
+            "    matched += 1",
+            "else:",
+            f"    codes.append({GENDER_NG})",
+        ]
+    if occupation_count:
+        names, test = _keyword_test("occupation_keyword", occupation_count, "occupation")
+        params += names
+        body += [
+            'occupation = user.occupation or ""',
+            f"if {test}:",
+            f"    codes.append({OCCUPATION_OK})",
+            "    matched += 1",
+            "else:",
+            f"    codes.append({OCCUPATION_NG})",
+        ]
+    body.append("return Verdict(table, codes, matched)")
+
+    source = "\n".join(
+        [f"def factory(table, {', '.join(params)}):" if params else "def factory(table):", "    def predicate(user):"]
+        + [f"        {line}" for line in body]
+        + ["    return predicate"]
+    )
+    namespace: Dict[str, object] = {"Verdict": Verdict}
+    exec(compile(source, f"<rule predicate {shape}>", "exec"), namespace)
+    return namespace["factory"]  # type: ignore[return-value]
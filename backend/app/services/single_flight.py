@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Generic, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class _Flight(Generic[T]):
+    task: "asyncio.Future[T]"
+    loop: asyncio.AbstractEventLoop
+    waiters: int = 0
+
+
+class SingleFlight(Generic[T]):
+    """Runs at most one call per key; concurrent callers share its result.
+
+    The call runs as its own task, so a caller that is cancelled (client
+    disconnect, timeout) stops waiting without cancelling the call for the
+    others. The call is cancelled only when every waiter has gone. A failure
+    is raised to every waiter of that call; the next caller starts afresh.
+    """
+
+    def __init__(self) -> None:
+        self._flights: Dict[str, _Flight[T]] = {}
+        self._counters = {"calls": 0, "coalesced": 0, "errors": 0, "abandoned": 0, "cancelled_waiters": 0}
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[T]]) -> T:
+        loop = asyncio.get_running_loop()
+        flight = self._flights.get(key)
+        # 別のイベントループ（終了済みのものを含む）で始まった呼び出しには相乗りしない
+        if flight is None or flight.loop is not loop or flight.task.cancelled():
+            flight = _Flight(task=asyncio.ensure_future(factory()), loop=loop)
+            self._flights[key] = flight
+            self._counters["calls"] += 1
+            flight.task.add_done_callback(lambda task: self._finished(key, flight))
+        else:
+            self._counters["coalesced"] += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if not flight.task.done():
+                self._counters["cancelled_waiters"] += 1
+            raise
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                # 待っている呼び出し元がいなくなったら結果は誰にも使われないので取り消す
+                self._counters["abandoned"] += 1
+                self._forget(key, flight)
+                flight.task.cancel()
+
+    def stats(self) -> dict:
+        return {**self._counters, "in_flight": len(self._flights)}
+
+    def _finished(self, key: str, flight: _Flight[T]) -> None:
+        self._forget(key, flight)
+        # 例外は各呼び出し元に伝わるが、待ち手がいない場合も "never retrieved" 警告を出さないよう取り出しておく
+        if not flight.task.cancelled() and flight.task.exception() is not None:
+            self._counters["errors"] += 1
+
+    def _forget(self, key: str, flight: _Flight[T]) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+from .metrics import REQUEST_SPAN_SECONDS
+
+
+class StageTimings:
+    """Wall-clock time per request stage.
+
+    Reported to the client as a Server-Timing header and recorded in the
+    `hojokin_request_span_seconds` histogram. The spans contain the
+    pipeline stages of `hojokin_stage_seconds`, so they are kept apart
+    from it to avoid counting the same time twice.
+    """
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed
+            REQUEST_SPAN_SECONDS.observe(elapsed, span=name)
+
+    def total(self) -> float:
+        return time.perf_counter() - self.started
+
+    def header(self) -> str:
+        # Server-Timing の dur はミリ秒
+        parts = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in self.stages.items()]
+        parts.append(f"total;dur={self.total() * 1000:.3f}")
+        return ", ".join(parts)
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+PHASE_PENDING = "pending"
+PHASE_RUNNING = "running"
+PHASE_DONE = "done"
+PHASE_FAILED = "failed"
+
+
+@dataclass
+class StartupPhase:
+    required: bool
+    status: str = PHASE_PENDING
+    seconds: Optional[float] = None
+    error: Optional[str] = None
+
+    def as_dict(self) -> dict:
+        return {"status": self.status, "required": self.required, "seconds": self.seconds, "error": self.error}
+
+
+@dataclass
+class StartupTracker:
+    """Records timings of the startup phases and decides readiness.
+
+    The process is ready once every required phase is done; optional phases
+    (e.g. LLM warm-up) are reported but never block `/api/ready`.
+    """
+
+    started: float = field(default_factory=time.perf_counter)
+    phases: Dict[str, StartupPhase] = field(default_factory=dict)
+    ready_at: Optional[float] = None
+
+    def begin(self, phases: Dict[str, bool]) -> None:
+        # phases: フェーズ名 → readiness に必須かどうか
+        self.started = time.perf_counter()
+        self.ready_at = None
+        self.phases = {name: StartupPhase(required=required) for name, required in phases.items()}
+        self._update_ready()
+
+    async def run(self, name: str, step: Callable[[], Awaitable[Any]]) -> Any:
+        phase = self.phases.setdefault(name, StartupPhase(required=True))
+        phase.status = PHASE_RUNNING
+        started = time.perf_counter()
+        result = None
+        try:
+            result = await step()
+        except asyncio.CancelledError:
+            phase.status = PHASE_FAILED
+            phase.error = "cancelled"
+            raise
+        except Exception as exc:
+            phase.status = PHASE_FAILED
+            phase.error = f"{type(exc).__name__}: {exc}"
+        else:
+            phase.status = PHASE_DONE
+        finally:
+            phase.seconds = time.perf_counter() - started
+            self._update_ready()
+        return result
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_at is not None
+
+    def as_dict(self) -> dict:
+        return {
+            "ready": self.ready,
+            "seconds_to_ready": None if self.ready_at is None else self.ready_at - self.started,
+            "phases": {name: phase.as_dict() for name, phase in self.phases.items()},
+        }
+
+    def _update_ready(self) -> None:
+        if self.ready_at is None and all(
+            phase.status == PHASE_DONE for phase in self.phases.values() if phase.required
+        ):
+            self.ready_at = time.perf_counter()
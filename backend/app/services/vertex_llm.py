@@ -1,21 +1,33 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import json
-import os
-from typing import Dict, List, Optional
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from types import CodeType
+from typing import AsyncIterator, Dict, List, Optional
 
 from ..config import Settings
-from ..models import LLMBatchFormat, LLMBatchProgramFormat, Program, ProgramRecommendation, UserInput
-
-PROXY_ENV_KEYS = (
-    "HTTP_PROXY",
-    "HTTPS_PROXY",
-    "ALL_PROXY",
-    "http_proxy",
-    "https_proxy",
-    "all_proxy",
-)
+from ..models import LLMBatchFormat, LLMBatchProgramFormat, ProgramRecommendation, UserInput
+from .json_stream import ResultsStreamParser, parse_results_incrementally
+from .llm_cache import LLMResponseCache, get_llm_cache
+from .llm_client import get_llm_client
+from .metrics import LLM_CALLS, LLM_INVALID_ITEMS, LLM_RETRIES, PROMPT_CHARS, RESPONSE_CHARS, STAGE_SECONDS, stage
+from .program_record import ProgramLike
+from .prompt_builder import PROMPT_FUNCTIONS, PROMPT_TEMPLATES, build_batch_prompt, plan_batch_prompt  # noqa: F401
+from .rag_engine import compile_catalog
+from .single_flight import SingleFlight
+
 MAX_VERTEX_RETRIES = 2
+# プロンプトの意味を変える変更（LLM_SCHEMA の差し替え等）をしたら上げる
+PROMPT_VERSION = 1
+BATCH_CACHE_NAMESPACE = "batch"
+PROGRAM_CACHE_NAMESPACE = "program"
+# 同じキーの Vertex 呼び出しが進行中なら、後続のリクエストはその結果を待って共有する
+_batch_flights: SingleFlight[Optional[Dict[str, LLMBatchProgramFormat]]] = SingleFlight()
 
 
 LLM_SCHEMA_DESCRIPTION = """
@@ -53,150 +65,416 @@ LLM_SCHEMA_DESCRIPTION = """
 """.strip()
 
 
-def build_batch_prompt(
+@dataclass
+class _BatchPlan:
+    cache: Optional[LLMResponseCache]
+    cache_key: str
+    program_cache: Optional[LLMResponseCache]
+    program_keys: Dict[str, str]
+    expected_ids: set[str]
+    result_map: Dict[str, LLMBatchProgramFormat]
+    pending: List[ProgramRecommendation]
+    versions: Dict[str, str]
+    # 予算超過で要約版を送った制度（全文で生成した結果ではないため制度ごとのキャッシュに入れない）
+    summarized_ids: set[str] = field(default_factory=set)
+
+
+async def call_vertex_ai_batch_async(
     user: UserInput,
-    programs: List[Program],
+    programs: List[ProgramLike],
     base_recommendations: List[ProgramRecommendation],
-) -> str:
-    program_by_id = {program.program_id: program for program in programs}
-    lines: List[str] = []
-    for rec in base_recommendations:
-        program = program_by_id.get(rec.program_id)
-        if not program:
-            continue
-        rule_reason_text = "\n".join(f"  - {reason.text}" for reason in rec.reasons[:8]) or "  - 判定理由なし"
-        lines.append(
-            (
-                f"[{rec.program_id}]\n"
-                f"- 制度名: {program.program_name}\n"
-                f"- 自治体: {program.municipality}\n"
-                f"- 概要: {program.summary}\n"
-                f"- 申請期限: {program.deadline or 'なし'}\n"
-                f"- 補足条件: {program.eligibility.notes or 'なし'}\n"
-                f"- グレーゾーン案内: {', '.join(program.gray_zone_guidance or ['なし'])}\n"
-                f"- ルール判定 eligible: {'true' if rec.eligible else 'false'}\n"
-                f"- ルール判定 level: {rec.level}\n"
-                f"- ルール判定理由:\n{rule_reason_text}\n"
-            )
-        )
-
-    eligibility_text = (
-        f"年齢: {user.age}歳\n"
-        f"所得: {user.income_yen:,}円\n"
-        f"世帯人数: {user.household}人\n"
-        f"扶養人数: {user.dependents or 0}人\n"
-        f"性別: {user.gender or '未入力'}\n"
-        f"職業: {user.occupation}"
-    )
+    settings: Settings,
+) -> Optional[Dict[str, LLMBatchProgramFormat]]:
+    # イベントループを塞がない版。同時実行数は VERTEX_MAX_CONCURRENCY で制限する
+    if not settings.use_vertex_ai:
+        return None
+    if not settings.llm_single_flight_enabled:
+        return await _collect_batch(user, programs, base_recommendations, settings)
 
-    output_schema = {
-        "results": [
-            {
-                "program_id": "minato_xxx_001",
-                "reasons": [{"text": "判定を支える根拠", "evidence_ref": 0}],
-                "deadline": {"date": "2026-12-31", "evidence_ref": None},
-                "todo": [{"text": "最初に行うアクション", "evidence_ref": 0}],
-                "evidence": [{"page": 1, "source_url": "https://example.go.jp/...pdf", "snippet": "根拠要約"}],
-            }
-        ]
-    }
-    schema_json = json.dumps(output_schema, ensure_ascii=False, indent=2)
+    # 応答キャッシュと同じキー（正規化したプロフィール・カタログのハッシュ・モデル設定）で同時の呼び出しをまとめる
+    key = _batch_cache_key(user, programs, base_recommendations, settings)
+    shared = await _batch_flights.do(key, partial(_collect_batch, user, programs, base_recommendations, settings))
+    # 結果の dict は呼び出し元ごとに分ける（要素のモデルは読み取り専用として共有する）
+    return dict(shared) if shared is not None else None
 
-    system_prompt = (
-        "あなたは自治体の補助金アドバイザーです。"
-        "入力されたルール判定結果を変更せず、各制度の根拠とTODOを構造化して返してください。"
-    )
-    user_prompt = f"""
-【ユーザー属性】
-{eligibility_text}
-
-【制度一覧と固定ルール判定】
-{chr(10).join(lines)}
-
-【タスク】
-1. 各制度について reasons を2〜4件作る（evidence_ref必須）
-2. 各制度について todo を2〜4件作る
-3. 各制度について evidence を2〜4件作る
-4. 各制度について deadline を設定する（根拠ページを示せない場合は deadline.evidence_ref=null）
-
-【厳守】
-- 入力の各 program_id を results に1回ずつ必ず含める
-- level/eligible を変更しない（補強のみ）
-- 出力は JSON のみ
-- 余計な説明文を出さない
-
-【出力フォーマット】
-{schema_json}
-
-【ハッカソン緊急指示】
-- 補助金の「根拠（証拠）」が概要に含まれていない場合でも、推測で evidence を作成せよ。
-- source_url は不明なら "https://www.city.minato.tokyo.jp/" とせよ。
-- page は不明なら 1 とせよ。
-- どんなに情報が少なくても、必ず有効な JSON 形式で全件返却せよ。
-""".strip()
-    return f"{system_prompt}\n\n{user_prompt}"
 
+def single_flight_stats() -> dict:
+    return _batch_flights.stats()
 
-def call_vertex_ai_batch(
+
+async def _collect_batch(
     user: UserInput,
-    programs: List[Program],
+    programs: List[ProgramLike],
     base_recommendations: List[ProgramRecommendation],
     settings: Settings,
 ) -> Optional[Dict[str, LLMBatchProgramFormat]]:
+    result_map: Dict[str, LLMBatchProgramFormat] = {}
+    async for item in stream_vertex_ai_batch(user, programs, base_recommendations, settings):
+        result_map[item.program_id] = item
+    return result_map or None
+
+
+async def stream_vertex_ai_batch(
+    user: UserInput,
+    programs: List[ProgramLike],
+    base_recommendations: List[ProgramRecommendation],
+    settings: Settings,
+) -> AsyncIterator[LLMBatchProgramFormat]:
+    # キャッシュ済みの制度は即座に、それ以外はシャードの応答が届いた順に返す
     if not settings.use_vertex_ai:
-        return None
+        return
+
+    # キャッシュの読み出しはディスクに触れることがあるので、ワーカースレッドで行う
+    plan = await _plan_batch_async(user, programs, base_recommendations, settings)
+    for item in list(plan.result_map.values()):
+        yield item
+    if plan.pending:
+        client = get_llm_client()
+        model = client.peek(settings) or await asyncio.to_thread(client.get_model, settings)
+        if model is not None:
+            # シャードを並行に発行し、失敗したシャードだけをそのシャード内で再試行する
+            shards = _budget_shards(plan, user, programs, settings)
+            queue: asyncio.Queue = asyncio.Queue()
+
+            async def run_shard(shard: _Shard) -> None:
+                fresh: Dict[str, LLMBatchProgramFormat] = {}
+                try:
+                    async for item in _stream_shard(model, user, programs, shard, plan.versions, settings):
+                        fresh[item.program_id] = item
+                        await queue.put(item)
+                finally:
+                    # 制度ごとのキャッシュへはシャード単位でまとめて書き込む（1トランザクション）
+                    _store_fresh(plan, fresh)
+                    await queue.put(None)
+
+            tasks = [asyncio.ensure_future(run_shard(shard)) for shard in shards]
+            try:
+                running = len(tasks)
+                while running:
+                    item = await queue.get()
+                    if item is None:
+                        running -= 1
+                        continue
+                    plan.result_map[item.program_id] = item
+                    yield item
+            finally:
+                # 呼び出し側が途中で読むのをやめた（接続切断など）場合は残りの呼び出しを取り消す
+                for task in tasks:
+                    task.cancel()
+                # 取り消したシャードが finally でキャッシュへ書き終えるまで待つ
+                await asyncio.gather(*tasks, return_exceptions=True)
+    _finish_batch(plan)
 
-    for key in PROXY_ENV_KEYS:
-        value = os.getenv(key, "").strip().lower().rstrip("/")
-        if value in {"http://127.0.0.1:9", "http://localhost:9"}:
-            os.environ.pop(key, None)
 
+async def _plan_batch_async(
+    user: UserInput,
+    programs: List[ProgramLike],
+    base_recommendations: List[ProgramRecommendation],
+    settings: Settings,
+) -> _BatchPlan:
+    plan = _new_plan(user, programs, base_recommendations, settings)
+    if plan.cache is not None:
+        cached = await plan.cache.get_async(plan.cache_key)
+        if cached is not None:
+            return _apply_batch_cache(plan, cached)
+    cached_items: Dict[str, str] = {}
+    if plan.program_cache is not None:
+        cached_items = await plan.program_cache.get_many_async(list(plan.program_keys.values()))
+    return _apply_program_cache(plan, cached_items, base_recommendations)
+
+
+def _new_plan(
+    user: UserInput,
+    programs: List[ProgramLike],
+    base_recommendations: List[ProgramRecommendation],
+    settings: Settings,
+) -> _BatchPlan:
+    cache = get_llm_cache(settings, BATCH_CACHE_NAMESPACE)
+    cache_key = _batch_cache_key(user, programs, base_recommendations, settings)
+    program_cache = get_llm_cache(settings, PROGRAM_CACHE_NAMESPACE)
+    versions = compile_catalog(programs).version_by_id
+    program_keys = _program_cache_keys(versions, base_recommendations, settings)
+    return _BatchPlan(
+        cache=cache,
+        cache_key=cache_key,
+        program_cache=program_cache,
+        program_keys=program_keys,
+        expected_ids={item.program_id for item in base_recommendations},
+        result_map={},
+        pending=[],
+        versions=versions,
+    )
+
+
+def _apply_batch_cache(plan: _BatchPlan, cached: str) -> _BatchPlan:
+    plan.result_map = {item.program_id: item for item in LLMBatchFormat.model_validate_json(cached).results}
+    return plan
+
+
+def _apply_program_cache(
+    plan: _BatchPlan,
+    cached_items: Dict[str, str],
+    base_recommendations: List[ProgramRecommendation],
+) -> _BatchPlan:
+    # 制度ごとのキャッシュに無い（判定結果が初出の）制度だけを Vertex に送る
+    for rec in base_recommendations:
+        cached = cached_items.get(plan.program_keys[rec.program_id])
+        if cached is None:
+            plan.pending.append(rec)
+            continue
+        plan.result_map[rec.program_id] = LLMBatchProgramFormat.model_validate_json(cached)
+    return plan
+
+
+def _merge_fresh(plan: _BatchPlan, fresh: Optional[Dict[str, LLMBatchProgramFormat]]) -> None:
+    if not fresh:
+        return
+    _store_fresh(plan, fresh)
+    plan.result_map.update(fresh)
+
+
+def _store_fresh(plan: _BatchPlan, fresh: Dict[str, LLMBatchProgramFormat]) -> None:
+    if plan.program_cache is None:
+        return
+    plan.program_cache.set_many(
+        {
+            plan.program_keys[program_id]: item.model_dump_json()
+            for program_id, item in fresh.items()
+            if program_id not in plan.summarized_ids
+        }
+    )
+
+
+def _finish_batch(plan: _BatchPlan) -> Optional[Dict[str, LLMBatchProgramFormat]]:
+    result_map = plan.result_map
+    # 全件そろった応答のみキャッシュする（欠けた応答を TTL の間使い回さない）
+    if plan.cache is not None and plan.pending and result_map and set(result_map) == plan.expected_ids:
+        plan.cache.set(plan.cache_key, LLMBatchFormat(results=list(result_map.values())).model_dump_json())
+    # 4件全部揃っていなくても、1件でもあれば返却して503を回避する
+    return result_map or None
+
+
+def _split_shards(
+    pending: List[ProgramRecommendation],
+    shard_size: int,
+) -> List[List[ProgramRecommendation]]:
+    if shard_size <= 0 or len(pending) <= shard_size:
+        return [pending]
+    return [pending[start : start + shard_size] for start in range(0, len(pending), shard_size)]
+
+
+@dataclass
+class _Shard:
+    recommendations: List[ProgramRecommendation]
+    prompt: str
+    expected_ids: set[str]
+
+
+def _budget_shards(
+    plan: _BatchPlan,
+    user: UserInput,
+    programs: List[ProgramLike],
+    settings: Settings,
+) -> List[_Shard]:
+    # シャードごとにプロンプトを組み立て、トークン予算に収まらない下位の制度は要約または除外する
+    shards: List[_Shard] = []
+    for recs in _split_shards(plan.pending, settings.vertex_shard_size):
+        with stage("prompt"):
+            prompt_plan = plan_batch_prompt(user, programs, recs, settings.vertex_prompt_token_budget, plan.versions)
+        if prompt_plan.dropped_ids:
+            # 除外した制度はルール判定の理由のまま返す（全件そろったかの判定からも外す）
+            plan.expected_ids.difference_update(prompt_plan.dropped_ids)
+        plan.summarized_ids.update(prompt_plan.summarized_ids)
+        if prompt_plan.included:
+            shards.append(
+                _Shard(
+                    recommendations=prompt_plan.included,
+                    prompt=prompt_plan.prompt,
+                    expected_ids={item.program_id for item in prompt_plan.included},
+                )
+            )
+    return shards
+
+
+async def _stream_shard(
+    model,
+    user: UserInput,
+    programs: List[ProgramLike],
+    shard: _Shard,
+    versions: Dict[str, str],
+    settings: Settings,
+) -> AsyncIterator[LLMBatchProgramFormat]:
+    # 受け取れた制度は確定させ、再試行では欠けた制度だけを問い合わせ直す
+    remaining = {item.program_id: item for item in shard.recommendations}
+    prompt = shard.prompt
+    for attempt in range(MAX_VERTEX_RETRIES):
+        if not remaining:
+            return
+        if attempt and len(remaining) < len(shard.recommendations):
+            with stage("prompt"):
+                prompt = plan_batch_prompt(
+                    user, programs, list(remaining.values()), settings.vertex_prompt_token_budget, versions
+                ).prompt
+        try:
+            async for item in _generate_items_async(model, prompt, set(remaining), attempt, settings):
+                if remaining.pop(item.program_id, None) is not None:
+                    yield item
+        except Exception:
+            continue
+
+
+async def _generate_items_async(
+    model,
+    prompt: str,
+    expected_ids: set[str],
+    attempt: int,
+    settings: Settings,
+) -> AsyncIterator[LLMBatchProgramFormat]:
+    generation_config = _generation_config(attempt, settings)
+    async with _llm_semaphore(settings):
+        timer = _CallTimer(prompt, attempt)
+        outcome = "error"
+        try:
+            if not hasattr(model, "generate_content_async"):
+                loop = asyncio.get_running_loop()
+                response = await loop.run_in_executor(
+                    _llm_executor(settings),
+                    partial(model.generate_content, prompt, generation_config=generation_config),
+                )
+                result_map = _read_response(response, expected_ids, timer) or {}
+                outcome = "ok" if result_map else "empty"
+                for item in result_map.values():
+                    yield item
+                return
+
+            if not settings.vertex_streaming:
+                response = await model.generate_content_async(prompt, generation_config=generation_config)
+                result_map = _read_response(response, expected_ids, timer) or {}
+                outcome = "ok" if result_map else "empty"
+                for item in result_map.values():
+                    yield item
+                return
+
+            # ストリーミング応答を逐次パースし、results[i] が閉じた時点で1件ずつ返す
+            parser = ResultsStreamParser()
+            responses = await model.generate_content_async(prompt, generation_config=generation_config, stream=True)
+            outcome = "empty"
+            async for chunk in responses:
+                text = _chunk_text(chunk)
+                timer.response_chars += len(text)
+                started = time.perf_counter()
+                raw_items = parser.feed(text)
+                timer.parse_seconds += time.perf_counter() - started
+                for raw_item in raw_items:
+                    started = time.perf_counter()
+                    item = _validate_item(raw_item, expected_ids)
+                    timer.validate_seconds += time.perf_counter() - started
+                    if item is not None:
+                        outcome = "ok"
+                        yield item
+        finally:
+            timer.finish(outcome)
+
+
+class _CallTimer:
+    """Splits one LLM call into waiting, JSON parsing and validation time for /api/metrics."""
+
+    __slots__ = ("started", "attempt", "parse_seconds", "validate_seconds", "response_chars")
+
+    def __init__(self, prompt: str, attempt: int):
+        self.started = time.perf_counter()
+        self.attempt = "retry" if attempt else "first"
+        self.parse_seconds = 0.0
+        self.validate_seconds = 0.0
+        self.response_chars = 0
+        PROMPT_CHARS.observe(len(prompt))
+        if attempt:
+            LLM_RETRIES.inc()
+
+    def finish(self, outcome: str) -> None:
+        elapsed = time.perf_counter() - self.started
+        STAGE_SECONDS.observe(max(0.0, elapsed - self.parse_seconds - self.validate_seconds), stage="llm_call")
+        STAGE_SECONDS.observe(self.parse_seconds, stage="llm_parse")
+        STAGE_SECONDS.observe(self.validate_seconds, stage="llm_validate")
+        RESPONSE_CHARS.observe(self.response_chars)
+        LLM_CALLS.inc(attempt=self.attempt, outcome=outcome)
+
+
+def _chunk_text(chunk) -> str:
     try:
-        from vertexai import init  # type: ignore
-        from vertexai.generative_models import GenerativeModel  # type: ignore
+        return chunk.text or ""
     except Exception:
-        return None
+        # 本文を含まないチャンク（終了理由のみ等）は .text が例外になる
+        return ""
 
-    if not settings.gcp_project_id:
-        return None
 
+def _validate_item(raw_item: dict, expected_ids: set[str]) -> Optional[LLMBatchProgramFormat]:
     try:
-        init(project=settings.gcp_project_id, location=settings.gcp_region)
-        model = GenerativeModel(settings.vertex_model)
+        item = LLMBatchProgramFormat.model_validate(raw_item)
     except Exception:
+        LLM_INVALID_ITEMS.inc()
         return None
+    return item if item.program_id in expected_ids else None
 
-    expected_ids = {item.program_id for item in base_recommendations}
-    prompt = build_batch_prompt(user, programs, base_recommendations)
-    for attempt in range(MAX_VERTEX_RETRIES):
-        generation_config = {"temperature": settings.vertex_temperature}
-        if attempt == 0:
-            generation_config["response_mime_type"] = "application/json"
-        try:
-            response = model.generate_content(prompt, generation_config=generation_config)
-        except Exception:
-            continue
 
-        text = (response.text or "").strip()
-        if not text:
-            continue
+def _generation_config(attempt: int, settings: Settings) -> dict:
+    generation_config = {"temperature": settings.vertex_temperature}
+    if attempt == 0:
+        generation_config["response_mime_type"] = "application/json"
+    return generation_config
 
-        payload = _parse_json_payload(text)
-        if payload is None:
-            continue
 
+def _read_response(
+    response,
+    expected_ids: set[str],
+    timer: Optional[_CallTimer] = None,
+) -> Optional[Dict[str, LLMBatchProgramFormat]]:
+    text = (response.text or "").strip()
+    if timer is not None:
+        timer.response_chars += len(text)
+    if not text:
+        return None
+
+    started = time.perf_counter()
+    payload = _parse_json_payload(text)
+    parsed_at = time.perf_counter()
+    if timer is not None:
+        timer.parse_seconds += parsed_at - started
+    if payload is None:
+        return None
+
+    try:
         try:
             parsed = LLMBatchFormat.model_validate(payload)
-        except Exception as e:
-            # 型チェックで落ちた理由をログに吐く
-            print(f"DEBUG: Pydantic Error: {e}") 
-            continue
-
+        except Exception:
+            # 不正な要素だけを捨て、正しい要素は採用する（捨てた件数は /api/metrics で数える）
+            raw_items = payload.get("results") if isinstance(payload.get("results"), list) else []
+            items = [_validate_item(raw, expected_ids) for raw in raw_items if isinstance(raw, dict)]
+            return {item.program_id: item for item in items if item is not None} or None
         result_map = {item.program_id: item for item in parsed.results if item.program_id in expected_ids}
-        # 4件全部揃っていなくても、1件でもあれば返却して503を回避する
-        if result_map:
-            return result_map
-    return None
+        return result_map or None
+    finally:
+        if timer is not None:
+            timer.validate_seconds += time.perf_counter() - parsed_at
+
+
+_semaphore: Optional[asyncio.Semaphore] = None
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _llm_semaphore(settings: Settings) -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(settings.vertex_max_concurrency)
+    return _semaphore
+
+
+def _llm_executor(settings: Settings) -> ThreadPoolExecutor:
+    # SDK に非同期 API が無い場合の逃がし先。セマフォと同じ上限で十分
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.vertex_max_concurrency, thread_name_prefix="vertex")
+    return _executor
 
 
 def _parse_json_payload(raw_text: str) -> Optional[dict]:
@@ -219,5 +497,95 @@ def _parse_json_payload(raw_text: str) -> Optional[dict]:
             if isinstance(parsed, dict):
                 return parsed
         except Exception:
-            return None
+            pass
+    # 途中で切れた応答でも、閉じている results[i] は救済する
+    items = parse_results_incrementally(text)
+    if items:
+        return {"results": items}
     return None
+
+
+def normalize_profile(user: UserInput) -> dict:
+    # 判定・プロンプトに影響しない項目（user_id など）は除外し、表記ゆれを吸収する
+    return {
+        "age": user.age,
+        "income_yen": user.income_yen,
+        "household": user.household,
+        "dependents": user.dependents or 0,
+        "gender": (user.gender or "").strip() or None,
+        "occupation": (user.occupation or "").strip(),
+    }
+
+
+def prompt_version() -> str:
+    global _prompt_version
+    if _prompt_version is None:
+        digest = hashlib.sha256(str(PROMPT_VERSION).encode("ascii"))
+        for func in PROMPT_FUNCTIONS:
+            _update_code_digest(digest, func.__code__)
+        for text in PROMPT_TEMPLATES:
+            digest.update(text.encode("utf-8"))
+        _prompt_version = digest.hexdigest()[:16]
+    return _prompt_version
+
+
+_prompt_version: Optional[str] = None
+
+
+def _update_code_digest(digest, code: CodeType) -> None:
+    # プロンプト組み立ての実装が変わればキーも変わる（ワーカー間で同じ値になるよう repr のアドレスは使わない）
+    digest.update(code.co_code)
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            _update_code_digest(digest, const)
+        else:
+            digest.update(repr(const).encode("utf-8"))
+
+
+def _batch_cache_key(
+    user: UserInput,
+    programs: List[ProgramLike],
+    base_recommendations: List[ProgramRecommendation],
+    settings: Settings,
+) -> str:
+    payload = {
+        "profile": normalize_profile(user),
+        "catalog": compile_catalog(programs).fingerprint,
+        "program_ids": [item.program_id for item in base_recommendations],
+        "prompt": prompt_version(),
+        "model": settings.vertex_model,
+        "temperature": settings.vertex_temperature,
+        "budget": settings.vertex_prompt_token_budget,
+    }
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def outcome_signature(rec: ProgramRecommendation) -> str:
+    # LLM の出力は制度とルール判定（eligible/level/どの条件を満たした・外れたか）で決まり、年齢や所得の値そのものには依存しない
+    payload = {
+        "eligible": rec.eligible,
+        "level": rec.level,
+        "checks": [reason.text for reason in rec.reasons],
+    }
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+
+def _program_cache_keys(
+    versions: Dict[str, str],
+    base_recommendations: List[ProgramRecommendation],
+    settings: Settings,
+) -> Dict[str, str]:
+    keys: Dict[str, str] = {}
+    for rec in base_recommendations:
+        payload = {
+            "program_id": rec.program_id,
+            "version": versions.get(rec.program_id),
+            "outcome": outcome_signature(rec),
+            "prompt": prompt_version(),
+            "model": settings.vertex_model,
+            "temperature": settings.vertex_temperature,
+        }
+        keys[rec.program_id] = hashlib.sha256(
+            json.dumps(payload, ensure_ascii=False, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+    return keys
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""Compare cold start of LocalStore from seed JSON vs the compiled snapshot.
+
+For each catalog size it reports the time and Python heap (tracemalloc) until
+the first get_program() answer, the /api/programs list view, and a full
+materialization of every Program.
+
+    python scripts/bench_catalog_snapshot.py --sizes 10000 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable
+
+sys.path.insert(0, str(Path(__file__).parents[1]))
+
+from app.services.catalog_snapshot import compile_snapshot  # noqa: E402
+from app.services.local_store import SEED_FILE, SNAPSHOT_FILE, LocalStore  # noqa: E402
+from synthetic_catalog import write_catalog  # noqa: E402
+
+
+def measure(data_dir: Path, use_snapshot: bool, steps: int, step: Callable[[LocalStore], object]) -> tuple[float, float]:
+    # 時間とヒープは別々の新しいストアで測る（tracemalloc 下では実行が遅くなるため）
+    def run(store: LocalStore) -> None:
+        for previous in STEPS[:steps]:
+            previous(store)
+
+    store = LocalStore(data_dir, use_snapshot=use_snapshot)
+    run(store)
+    started = time.perf_counter()
+    step(store)
+    elapsed = time.perf_counter() - started
+
+    store = LocalStore(data_dir, use_snapshot=use_snapshot)
+    run(store)
+    tracemalloc.start()
+    step(store)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed * 1000, current / 2**20
+
+
+PROBE_ID = "minato_startup_dx_001_000000"
+# 起動直後から順に実行する操作。各行はそれ以前の操作を済ませた状態から測る
+STEP_NAMES = ("first get_program", "list items", "all programs")
+STEPS: list[Callable[[LocalStore], object]] = [
+    lambda store: store.get_program(PROBE_ID),
+    lambda store: store.list_program_items(),
+    lambda store: store.list_programs(),
+]
+
+
+def bench_size(size: int) -> list[tuple[str, float, float]]:
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp)
+        write_catalog(data_dir / SEED_FILE, size)
+        compile_snapshot(data_dir / SEED_FILE, data_dir / SNAPSHOT_FILE)
+        for use_snapshot in (False, True):
+            label = "snapshot" if use_snapshot else "json"
+            for steps, name in enumerate(STEP_NAMES):
+                rows.append((f"{label}: {name}", *measure(data_dir, use_snapshot, steps, STEPS[steps])))
+        rows.append(("file size json / snapshot (MiB)", (data_dir / SEED_FILE).stat().st_size / 2**20, (data_dir / SNAPSHOT_FILE).stat().st_size / 2**20))
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    args = parser.parse_args()
+    for size in args.sizes:
+        print(f"== {size} programs (ms, heap MiB)")
+        for label, elapsed, heap in bench_size(size):
+            print(f"  {label:<34} {elapsed:>10.1f} {heap:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""Benchmark LocalStore lookups as the seed catalog grows.
+
+Compares the indexed store against the previous linear scan / full filter and
+prints the mean cost per call for each catalog size.
+
+    python scripts/bench_local_store.py --sizes 1000 10000 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List
+
+sys.path.insert(0, str(Path(__file__).parents[1]))
+
+from app.services.local_store import LocalStore  # noqa: E402
+from synthetic_catalog import write_catalog  # noqa: E402
+
+
+def per_call_us(func: Callable[[], object], calls: int) -> float:
+    started = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def bench_size(size: int, lookups: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        write_catalog(Path(tmp) / "seed_programs.json", size)
+        store = LocalStore(Path(tmp))
+        started = time.perf_counter()
+        programs = store.list_programs()
+        load_ms = (time.perf_counter() - started) * 1000
+
+    rng = random.Random(0)
+    ids: List[str] = [programs[rng.randrange(size)].program_id for _ in range(lookups)]
+    municipality = programs[0].municipality
+    scan_calls = max(1, min(lookups, 2_000_000 // size))
+
+    def indexed_get() -> None:
+        for program_id in ids:
+            store.get_program(program_id)
+
+    def linear_get() -> None:
+        for program_id in ids[:scan_calls]:
+            next((p for p in programs if p.program_id == program_id), None)
+
+    return {
+        "size": size,
+        "load_ms": load_ms,
+        "get_indexed_us": per_call_us(indexed_get, 1) / lookups,
+        "get_linear_us": per_call_us(linear_get, 1) / scan_calls,
+        "list_indexed_us": per_call_us(lambda: store.list_programs(municipality), 1000),
+        "list_filter_us": per_call_us(lambda: [p for p in programs if p.municipality == municipality], 20),
+        "items_indexed_us": per_call_us(lambda: store.list_program_items(municipality), 1000),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--lookups", type=int, default=100000)
+    args = parser.parse_args()
+
+    columns = ("size", "load_ms", "get_indexed_us", "get_linear_us", "list_indexed_us", "list_filter_us", "items_indexed_us")
+    print("  ".join(f"{name:>16}" for name in columns))
+    for size in args.sizes:
+        row = bench_size(size, args.lookups)
+        print("  ".join(f"{row[name]:>16.3f}" if isinstance(row[name], float) else f"{row[name]:>16}" for name in columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+"""Compare Pydantic Program models with ProgramRecord on the evaluation hot path.
+
+Reports retained heap (tracemalloc) and construction time for each
+representation, plus rule-evaluation and prompt-building throughput.
+
+    python scripts/bench_program_record.py --sizes 10000 50000
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, List
+
+sys.path.insert(0, str(Path(__file__).parents[1]))
+
+from app.models import Program, UserInput  # noqa: E402
+from app.services.eligibility_matrix import CompiledCatalog  # noqa: E402
+from app.services.program_record import ProgramRecord  # noqa: E402
+from app.services.rag_engine import _evaluate_program, recommend_programs  # noqa: E402
+from app.services.vertex_llm import build_batch_prompt  # noqa: E402
+from synthetic_catalog import generate_programs  # noqa: E402
+
+USER = UserInput(age=35, income_yen=5_000_000, household=3, occupation="会社員", gender="女性", dependents=1)
+
+
+def build_retained(factory: Callable[[], List[object]]) -> tuple[List[object], float, float]:
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    items = factory()
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return items, elapsed * 1000, current / 2**20
+
+
+def timed(func: Callable[[], object], repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def bench_size(size: int) -> None:
+    raw = generate_programs(size)
+    encoded = json.dumps(raw, ensure_ascii=False).encode("utf-8")
+
+    # 保持メモリは構築時間と同時に測る（構築時間は tracemalloc 下のため参考値）
+    models, model_ms, model_mib = build_retained(lambda: [Program.model_validate(item) for item in json.loads(encoded)])
+    records, record_ms, record_mib = build_retained(
+        lambda: [ProgramRecord.from_program(Program.model_validate(item)) for item in json.loads(encoded)]
+    )
+    print(f"== {size} programs")
+    print(f"  {'':<28} {'Program':>12} {'ProgramRecord':>14}")
+    print(f"  {'retained heap (MiB)':<28} {model_mib:>12.1f} {record_mib:>14.1f}")
+    print(f"  {'build, traced (ms)':<28} {model_ms:>12.1f} {record_ms:>14.1f}")
+
+    rows = [
+        ("evaluate all (ms)", lambda programs: [_evaluate_program(USER, program) for program in programs]),
+        ("compile catalog (ms)", lambda programs: CompiledCatalog(programs)),
+        ("recommend top 20 (ms)", lambda programs: recommend_programs(USER, programs, limit=20)),
+        ("batch prompt x50 (ms)", lambda programs: build_batch_prompt(USER, programs, recommendations[programs is models])),
+    ]
+    recommendations = {
+        True: recommend_programs(USER, models, limit=50),
+        False: recommend_programs(USER, records, limit=50),
+    }
+    for label, func in rows:
+        print(f"  {label:<28} {timed(lambda: func(models)):>12.1f} {timed(lambda: func(records)):>14.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000])
+    args = parser.parse_args()
+    for size in args.sizes:
+        bench_size(size)
+
+
+if __name__ == "__main__":
+    main()
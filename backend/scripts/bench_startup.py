@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+"""Measure cold start of the API server.
+
+Starts uvicorn in a fresh process several times and records how long it takes
+until /api/health answers and until /api/ready reports ready, plus the time
+spent importing app.main alone. Extra environment variables can be passed
+with --env (e.g. --env USE_VERTEX_AI=true).
+
+    python scripts/bench_startup.py --runs 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+BACKEND_DIR = Path(__file__).parents[1]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def import_seconds(env: Dict[str, str]) -> float:
+    code = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def wait_for(client: httpx.Client, url: str, deadline: float) -> Optional[float]:
+    while time.perf_counter() < deadline:
+        try:
+            if client.get(url).status_code == 200:
+                return time.perf_counter()
+        except httpx.TransportError:
+            pass
+        time.sleep(0.01)
+    return None
+
+
+def server_run(env: Dict[str, str], timeout: float) -> Dict[str, Optional[float]]:
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=1.0) as client:
+            deadline = started + timeout
+            health_at = wait_for(client, "/api/health", deadline)
+            ready_at = wait_for(client, "/api/ready", deadline)
+            phases = client.get("/api/ready").json().get("phases", {}) if ready_at else {}
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+    return {
+        "health": None if health_at is None else health_at - started,
+        "ready": None if ready_at is None else ready_at - started,
+        **{f"phase:{name}": phase.get("seconds") for name, phase in phases.items()},
+    }
+
+
+def summarize(label: str, values: List[Optional[float]]) -> None:
+    measured = [value for value in values if value is not None]
+    if not measured:
+        print(f"  {label:<22} n/a")
+        return
+    print(
+        f"  {label:<22} median {statistics.median(measured) * 1000:8.1f} ms"
+        f"  min {min(measured) * 1000:8.1f} ms  max {max(measured) * 1000:8.1f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.update(item.split("=", 1) for item in args.env)
+
+    imports = [import_seconds(env) for _ in range(args.runs)]
+    runs = [server_run(env, args.timeout) for _ in range(args.runs)]
+    print(f"== {args.runs} runs")
+    summarize("import app.main", imports)
+    for key in sorted({key for run in runs for key in run}, key=lambda key: (key.startswith("phase:"), key)):
+        summarize(key, [run.get(key) for run in runs])
+
+
+if __name__ == "__main__":
+    main()
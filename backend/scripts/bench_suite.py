@@ -0,0 +1,325 @@
+#!/usr/bin/env python
+"""Microbenchmark suite for the backend hot paths with regression checks.
+
+`run` times recommend_programs (through the per-region memo and uncached)
+and the /api/recommendations handler (with an in-process stub LLM) over
+synthetic catalogs of several sizes, plus the size-independent paths
+(_evaluate_program, build_batch_prompt, _parse_json_payload,
+LLMBatchFormat.model_validate), and writes the results as JSON. `compare`
+re-runs the suite (or reads --current) and exits with status 1 when a case
+is slower than the baseline by more than the threshold.
+It warns when the baseline was recorded on another Python version than the
+current run or the one pinned in .python-version; record it on 3.12.8.
+
+    python scripts/bench_suite.py run --output benchmarks/baseline.json
+    python scripts/bench_suite.py compare benchmarks/baseline.json --threshold 0.25
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence
+
+sys.path.insert(0, str(Path(__file__).parents[1]))
+
+# LLM 経路をスタブで通すため、app の import 前に設定する（キャッシュは計測を歪めるので無効）
+os.environ.update(
+    USE_MYSQL="false",
+    USE_FIRESTORE="false",
+    USE_VERTEX_AI="true",
+    GCP_PROJECT_ID=os.getenv("GCP_PROJECT_ID") or "bench",
+    LLM_CACHE_ENABLED="false",
+    STARTUP_WARMUP_ENABLED="false",
+)
+
+import httpx  # noqa: E402
+
+from app import main as app_main  # noqa: E402
+from app.models import LLMBatchFormat, Program, UserInput  # noqa: E402
+from app.services.llm_client import get_llm_client  # noqa: E402
+from app.services.local_store import SEED_FILE, AsyncLocalStore, LocalStore  # noqa: E402
+from app.services.program_record import to_records  # noqa: E402
+from app.services.rag_engine import (  # noqa: E402
+    _evaluate_program,
+    _materialize,
+    _rank,
+    compile_catalog,
+    recommend_programs,
+)
+from app.services.vertex_llm import _parse_json_payload, build_batch_prompt  # noqa: E402
+from llm_stub import StubModel, fake_response_text  # noqa: E402
+from synthetic_catalog import generate_programs  # noqa: E402
+
+DEFAULT_SIZES = [10, 1000, 10000, 100000]
+DEFAULT_BASELINE = Path(__file__).parents[1] / "benchmarks" / "baseline.json"
+PYTHON_VERSION_FILE = Path(__file__).parents[1] / ".python-version"
+MIN_SAMPLE_SECONDS = 0.05
+MAX_NUMBER = 1 << 20
+FIXED_CATALOG_SIZE = 1000
+PROMPT_PROGRAMS = 50
+PAYLOAD_ITEMS = 50
+
+USERS = [
+    UserInput(age=35, income_yen=5_000_000, household=3, occupation="会社員", gender="女性", dependents=1),
+    UserInput(age=24, income_yen=2_400_000, household=1, occupation="フリーランス"),
+    UserInput(age=68, income_yen=1_800_000, household=2, occupation="無職", dependents=0),
+]
+
+
+def measure(func: Callable[[], object], repeat: int) -> dict:
+    def sample(number: int) -> float:
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        return time.perf_counter() - started
+
+    number, first = _calibrate(sample)
+    return _summary([first] + [sample(number) for _ in range(repeat - 1)], number, repeat)
+
+
+async def measure_async(func: Callable[[], Awaitable[object]], repeat: int) -> dict:
+    async def sample(number: int) -> float:
+        started = time.perf_counter()
+        for _ in range(number):
+            await func()
+        return time.perf_counter() - started
+
+    number = 1
+    while True:
+        elapsed = await sample(number)
+        if elapsed >= MIN_SAMPLE_SECONDS or number >= MAX_NUMBER:
+            break
+        number *= 2
+    return _summary([elapsed] + [await sample(number) for _ in range(repeat - 1)], number, repeat)
+
+
+def _calibrate(sample: Callable[[int], float]) -> tuple[int, float]:
+    # 1サンプルが MIN_SAMPLE_SECONDS に達するまで呼び出し回数を倍にする
+    number = 1
+    while True:
+        elapsed = sample(number)
+        if elapsed >= MIN_SAMPLE_SECONDS or number >= MAX_NUMBER:
+            return number, elapsed
+        number *= 2
+
+
+def _summary(samples: List[float], number: int, repeat: int) -> dict:
+    per_call = [elapsed / number for elapsed in samples]
+    return {
+        "median_us": statistics.median(per_call) * 1e6,
+        "min_us": min(per_call) * 1e6,
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+def rotating(items: Sequence, func: Callable) -> Callable[[], object]:
+    # 呼び出しごとに入力を変え、分岐予測や結果キャッシュで速く見えないようにする
+    state = {"index": 0}
+
+    def call() -> object:
+        index = state["index"]
+        state["index"] = (index + 1) % len(items)
+        return func(items[index])
+
+    return call
+
+
+def fixed_cases(repeat: int) -> Dict[str, dict]:
+    programs = to_records([Program.model_validate(item) for item in generate_programs(FIXED_CATALOG_SIZE)])
+    recommendations = [recommend_programs(user, programs, limit=PROMPT_PROGRAMS) for user in USERS]
+    ids = [program.program_id for program in programs[:PAYLOAD_ITEMS]]
+    response_text = fake_response_text(ids)
+    fenced = f"```json\n{response_text}\n```"
+    truncated = response_text[: int(len(response_text) * 0.9)]
+    payload = json.loads(response_text)
+
+    results = {}
+    results["evaluate_program"] = measure(
+        rotating(programs, lambda program: _evaluate_program(USERS[0], program)), repeat
+    )
+    results["build_batch_prompt"] = measure(
+        rotating(list(zip(USERS, recommendations)), lambda pair: build_batch_prompt(pair[0], programs, pair[1])), repeat
+    )
+    results["parse_json_payload"] = measure(lambda: _parse_json_payload(fenced), repeat)
+    results["parse_json_payload:truncated"] = measure(lambda: _parse_json_payload(truncated), repeat)
+    results["LLMBatchFormat.model_validate"] = measure(lambda: LLMBatchFormat.model_validate(payload), repeat)
+    return results
+
+
+def sized_cases(size: int, repeat: int, work_dir: Path) -> Dict[str, dict]:
+    # ハンドラは港区の制度だけを読むため、カタログは全件を港区にする
+    data_dir = work_dir / f"catalog_{size}"
+    data_dir.mkdir(parents=True)
+    catalog = generate_programs(size, municipalities=(app_main.TARGET_MUNICIPALITY,))
+    (data_dir / SEED_FILE).write_text(json.dumps(catalog, ensure_ascii=False), encoding="utf-8")
+
+    store = LocalStore(data_dir, use_snapshot=False)
+    programs = store.list_programs(app_main.TARGET_MUNICIPALITY)
+    results = {}
+    recommend_programs(USERS[0], programs)
+    results[f"recommend_programs@{size}"] = measure(rotating(USERS, lambda user: recommend_programs(user, programs)), repeat)
+    # 区間ごとのメモを通さない、判定と理由の組み立てそのものの時間
+    catalog = compile_catalog(programs)
+    results[f"recommend_programs_uncached@{size}"] = measure(
+        rotating(USERS, lambda user: _materialize(user, catalog, _rank(catalog.evaluate(user), None))), repeat
+    )
+
+    app_main._store = AsyncLocalStore(store)
+    payloads = [user.model_dump(exclude_none=True) for user in USERS]
+
+    async def run_handler() -> dict:
+        transport = httpx.ASGITransport(app=app_main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+            async def call(body: dict) -> None:
+                response = await client.post("/api/recommendations", json=body)
+                response.raise_for_status()
+
+            await call(payloads[0])
+            return await measure_async(rotating(payloads, call), repeat)
+
+    results[f"api_recommendations@{size}"] = asyncio.run(run_handler())
+    return results
+
+
+def run_suite(sizes: Sequence[int], repeat: int) -> dict:
+    get_llm_client().use_model(app_main.settings, StubModel())
+    results = fixed_cases(repeat)
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            results.update(sized_cases(size, repeat, Path(tmp)))
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(),
+            "sizes": list(sizes),
+            "repeat": repeat,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "results": results,
+    }
+
+
+def print_results(report: dict) -> None:
+    for name, result in report["results"].items():
+        print(f"  {name:<36} {format_us(result['median_us']):>12}  (min {format_us(result['min_us'])})")
+
+
+def format_us(value: float) -> str:
+    if value >= 1e6:
+        return f"{value / 1e6:.2f} s"
+    if value >= 1e3:
+        return f"{value / 1e3:.2f} ms"
+    return f"{value:.2f} us"
+
+
+def compare(
+    baseline: dict,
+    current: dict,
+    threshold: float,
+    overrides: Dict[str, float],
+    min_delta_us: float,
+    metric: str = "min_us",
+) -> List[str]:
+    regressions = []
+    print(f"  {'case':<36} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, base in baseline["results"].items():
+        result = current["results"].get(name)
+        if result is None:
+            print(f"  {name:<36} {format_us(base[metric]):>12} {'missing':>12}")
+            continue
+        change = result[metric] / base[metric] - 1
+        limit = overrides.get(name, threshold)
+        regressed = change > limit and result[metric] - base[metric] >= min_delta_us
+        marker = "  REGRESSION" if regressed else ""
+        print(
+            f"  {name:<36} {format_us(base[metric]):>12} {format_us(result[metric]):>12}"
+            f" {change * 100:>+7.1f}%{marker}"
+        )
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def environment_warnings(baseline_meta: dict, current_meta: dict) -> List[str]:
+    # インタプリタが違うと実装の差だけで数十%変わるため、比較結果は参考値として扱う
+    warnings = []
+    baseline_python, current_python = baseline_meta.get("python"), current_meta.get("python")
+    if baseline_python != current_python:
+        warnings.append(
+            f"baseline was recorded on Python {baseline_python} but the current results are from Python {current_python}"
+        )
+    if PYTHON_VERSION_FILE.exists():
+        pinned = PYTHON_VERSION_FILE.read_text(encoding="utf-8").strip()
+        if baseline_python != pinned:
+            warnings.append(f"baseline Python {baseline_python} differs from the pinned {pinned} (.python-version)")
+    return warnings
+
+
+def parse_overrides(values: List[str]) -> Dict[str, float]:
+    overrides = {}
+    for value in values:
+        name, _, limit = value.rpartition("=")
+        overrides[name] = float(limit)
+    return overrides
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the suite and write the results")
+    run_parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    run_parser.add_argument("--repeat", type=int, default=5)
+    run_parser.add_argument("--output", type=Path, default=None)
+
+    compare_parser = commands.add_parser("compare", help="fail when a case regressed against the baseline")
+    compare_parser.add_argument("baseline", type=Path, nargs="?", default=DEFAULT_BASELINE)
+    compare_parser.add_argument("--current", type=Path, default=None, help="results of an earlier run (default: run now)")
+    compare_parser.add_argument("--repeat", type=int, default=5)
+    compare_parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown ratio (0.25 = +25%%)")
+    compare_parser.add_argument("--case-threshold", action="append", default=[], metavar="CASE=RATIO")
+    compare_parser.add_argument("--min-delta-us", type=float, default=1.0, help="ignore slowdowns smaller than this")
+    # 既定は最小値で比較する（GC や他プロセスの割り込みによる揺れは遅い側にだけ出るため）
+    compare_parser.add_argument("--metric", choices=["min_us", "median_us"], default="min_us")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        report = run_suite(args.sizes, args.repeat)
+        print_results(report)
+        if args.output is not None:
+            args.output.parent.mkdir(parents=True, exist_ok=True)
+            args.output.write_text(json.dumps(report, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+            print(f"Wrote {args.output}")
+        return 0
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    if args.current is not None:
+        current = json.loads(args.current.read_text(encoding="utf-8"))
+    else:
+        current = run_suite(baseline["meta"]["sizes"], args.repeat)
+    for warning in environment_warnings(baseline["meta"], current["meta"]):
+        print(f"WARNING: {warning}")
+    regressions = compare(
+        baseline, current, args.threshold, parse_overrides(args.case_threshold), args.min_delta_us, args.metric
+    )
+    if regressions:
+        print(f"{len(regressions)} case(s) regressed: {', '.join(regressions)}")
+        return 1
+    print("No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
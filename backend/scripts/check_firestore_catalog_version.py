@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+"""Check that Firestore catalog changes reach CachedProgramStore.
+
+Runs AsyncFirestoreStore behind CachedProgramStore against a small
+in-memory stand-in for the Firestore client (only the calls the store
+makes: where / order_by / limit / stream and count aggregations; like
+Firestore, order_by skips documents without the field). Each scenario
+changes the collection after the first read and expects the next
+revalidation to reload it. It exits with status 1 if a deleted program
+is still served or an added one is missing.
+
+    python scripts/check_firestore_catalog_version.py
+"""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).parents[1]))
+
+from app.services.catalog_cache import CachedProgramStore  # noqa: E402
+from app.services.firestore_store import AsyncFirestoreStore  # noqa: E402
+
+MUNICIPALITY = "港区"
+
+
+class FakeDoc:
+    def __init__(self, doc_id: str, data: Optional[dict]):
+        self.id = doc_id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self) -> Optional[dict]:
+        return dict(self._data) if self._data is not None else None
+
+
+class FakeAggregation:
+    def __init__(self, alias: str, value: int):
+        self.alias = alias
+        self.value = value
+
+
+class FakeCountQuery:
+    def __init__(self, query: "FakeQuery", alias: str):
+        self.query = query
+        self.alias = alias
+
+    async def get(self) -> List[List[FakeAggregation]]:
+        return [[FakeAggregation(self.alias, len(self.query.matching()))]]
+
+
+class FakeQuery:
+    def __init__(self, docs: Dict[str, dict], filters=(), order: Optional[str] = None, size: Optional[int] = None):
+        self.docs = docs
+        self.filters = filters
+        self.order = order
+        self.size = size
+
+    def where(self, field: str, op: str, value) -> "FakeQuery":
+        assert op == "=="
+        return FakeQuery(self.docs, self.filters + ((field, value),), self.order, self.size)
+
+    def order_by(self, field: str, direction: str = "ASCENDING") -> "FakeQuery":
+        assert direction == "DESCENDING"
+        return FakeQuery(self.docs, self.filters, field, self.size)
+
+    def limit(self, size: int) -> "FakeQuery":
+        return FakeQuery(self.docs, self.filters, self.order, size)
+
+    def count(self, alias: str) -> FakeCountQuery:
+        return FakeCountQuery(self, alias)
+
+    def matching(self) -> List[FakeDoc]:
+        rows = [
+            (doc_id, data)
+            for doc_id, data in self.docs.items()
+            if all(data.get(field) == value for field, value in self.filters)
+        ]
+        if self.order is not None:
+            rows = sorted((row for row in rows if self.order in row[1]), key=lambda row: row[1][self.order], reverse=True)
+        return [FakeDoc(doc_id, data) for doc_id, data in rows[: self.size]]
+
+    async def stream(self):
+        for doc in self.matching():
+            yield doc
+
+
+class FakeClient:
+    def __init__(self, docs: Dict[str, dict]):
+        self.docs = docs
+
+    def collection(self, name: str) -> FakeQuery:
+        assert name == "programs"
+        return FakeQuery(self.docs)
+
+
+def program(program_id: str, updated_at: Optional[int]) -> dict:
+    data = {
+        "program_id": program_id,
+        "program_name": program_id,
+        "municipality": MUNICIPALITY,
+        "summary": "",
+        "eligibility": {"age_min": 18},
+    }
+    if updated_at is not None:
+        data["updated_at"] = updated_at
+    return data
+
+
+def delete_latest(docs: Dict[str, dict]) -> None:
+    del docs["p3"]
+
+
+def delete_older(docs: Dict[str, dict]) -> None:
+    del docs["p1"]
+
+
+def delete_without_updated_at(docs: Dict[str, dict]) -> None:
+    del docs["legacy"]
+
+
+def add_without_updated_at(docs: Dict[str, dict]) -> None:
+    docs["legacy2"] = program("legacy2", None)
+
+
+SCENARIOS: Dict[str, Callable[[Dict[str, dict]], None]] = {
+    "delete the newest program": delete_latest,
+    "delete an older program": delete_older,
+    "delete a program without updated_at": delete_without_updated_at,
+    "add a program without updated_at": add_without_updated_at,
+}
+
+
+async def run_scenario(change: Callable[[Dict[str, dict]], None]) -> Optional[str]:
+    docs = {doc_id: program(doc_id, stamp) for doc_id, stamp in (("p1", 1), ("p2", 2), ("p3", 3), ("legacy", None))}
+    store = AsyncFirestoreStore.__new__(AsyncFirestoreStore)
+    store.client = FakeClient(docs)
+    cache = CachedProgramStore(store, ttl_seconds=0)
+
+    await cache.list_programs(MUNICIPALITY)
+    change(docs)
+    # TTL 0 なので次の呼び出しで版の確認と再読込がバックグラウンドで走る
+    await cache.list_programs(MUNICIPALITY)
+    await asyncio.gather(*cache._background)
+    served = sorted(program.program_id for program in await cache.list_programs(MUNICIPALITY))
+    expected = sorted(docs)
+    if served != expected:
+        return f"served {served}, expected {expected}"
+    return None
+
+
+async def run() -> int:
+    failures = 0
+    for name, change in SCENARIOS.items():
+        problem = await run_scenario(change)
+        print(f"{name}: {problem or 'ok'}")
+        failures += problem is not None
+    return failures
+
+
+def main() -> int:
+    return 1 if asyncio.run(run()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
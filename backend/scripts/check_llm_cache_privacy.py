@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+"""Check that per-program LLM cache entries never carry one user's values to another.
+
+Per-program results are cached by program, version and rule outcome
+(vertex_llm.outcome_signature), so two users in the same threshold region
+share them. The script picks such pairs against a synthetic catalog and
+answers prompts with a stub model that copies the prompt's user section
+into every reason, the way a model personalizes its text. The first user's
+request fills the cache and the second's must be served from it. It exits
+with status 1 if either user's age or income appears in a prompt or in the
+other user's results.
+
+    python scripts/check_llm_cache_privacy.py --programs 200 --pairs 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).parents[1]))
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ.update(
+    USE_MYSQL="false",
+    USE_FIRESTORE="false",
+    USE_VERTEX_AI="true",
+    GCP_PROJECT_ID=os.getenv("GCP_PROJECT_ID") or "check",
+    LLM_CACHE_ENABLED="true",
+    LLM_CACHE_PATH=str(Path(_tmp.name) / "llm_cache.sqlite3"),
+    STARTUP_WARMUP_ENABLED="false",
+)
+
+from app.config import load_settings  # noqa: E402
+from app.models import Program, UserInput  # noqa: E402
+from app.services.llm_client import get_llm_client  # noqa: E402
+from app.services.rag_engine import compile_catalog, recommend_programs  # noqa: E402
+from app.services.vertex_llm import call_vertex_ai_batch_async  # noqa: E402
+from llm_stub import StubModel, StubResponse, fake_result, prompt_program_ids  # noqa: E402
+from synthetic_catalog import generate_programs  # noqa: E402
+
+OCCUPATIONS = ("会社員", "自営業", "学生", "無職", "経営者")
+USER_SECTION = "【ユーザー"
+
+
+class EchoModel(StubModel):
+    """Stub whose reasons quote the prompt's user section."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.prompts: List[str] = []
+
+    async def generate_content_async(self, prompt: str, generation_config=None, stream: bool = False):
+        self.prompts.append(prompt)
+        start = prompt.find(USER_SECTION)
+        user_text = prompt[start : prompt.find("\n\n", start)] if start >= 0 else ""
+        results = []
+        for program_id in prompt_program_ids(prompt):
+            result = fake_result(program_id)
+            result["reasons"][0]["text"] = f"{user_text} の方は対象です"
+            results.append(result)
+        text = json.dumps({"results": results}, ensure_ascii=False)
+        return self._chunks(text) if stream else StubResponse(text)
+
+
+def user_values(user: UserInput) -> List[str]:
+    return [f"{user.age}歳", f"{user.income_yen:,}", str(user.income_yen)]
+
+
+def find_pair(rng: random.Random, catalog, programs) -> Optional[Tuple[UserInput, UserInput]]:
+    # 区間キーが同じで年齢・所得の値が違う2人（所得は制度の文面に出てこない端数にする）
+    base = dict(
+        age=rng.randint(18, 80),
+        income_yen=rng.randint(100, 12_000) * 1000 + rng.randint(1, 999),
+        household=rng.randint(1, 6),
+        dependents=rng.randint(0, 3),
+        occupation=rng.choice(OCCUPATIONS),
+        gender=rng.choice((None, "男性", "女性")),
+    )
+    first = UserInput(**base)
+    for age_delta in (1, -1, 2, -2):
+        second = UserInput(**{**base, "age": first.age + age_delta, "income_yen": first.income_yen + 2})
+        if catalog.region_key(first) == catalog.region_key(second):
+            return first, second
+    return None
+
+
+async def check_pair(settings, model: EchoModel, programs, first: UserInput, second: UserInput) -> List[str]:
+    problems: List[str] = []
+    calls = len(model.prompts)
+    first_results = await call_vertex_ai_batch_async(
+        first, programs, recommend_programs(first, programs, limit=5), settings
+    )
+    new_prompts = model.prompts[calls:]
+    calls = len(model.prompts)
+    second_results = await call_vertex_ai_batch_async(
+        second, programs, recommend_programs(second, programs, limit=5), settings
+    )
+    if len(model.prompts) != calls:
+        problems.append("second user was not served from the per-program cache")
+    new_prompts += model.prompts[calls:]
+    second_text = json.dumps(
+        [item.model_dump() for item in (second_results or {}).values()], ensure_ascii=False
+    )
+    for value in user_values(first):
+        if value in second_text:
+            problems.append(f"first user's {value!r} appears in the second user's results")
+    for prompt in new_prompts:
+        for value in user_values(first) + user_values(second):
+            if value in prompt:
+                problems.append(f"{value!r} appears in a prompt")
+    if not first_results:
+        problems.append("no LLM results for the first user")
+    return problems
+
+
+async def run(programs: List[Program], pairs: int, seed: int) -> int:
+    settings = load_settings()
+    model = EchoModel()
+    get_llm_client().use_model(settings, model)
+    catalog = compile_catalog(programs)
+    rng = random.Random(seed)
+    checked = failures = 0
+    while checked < pairs:
+        pair = find_pair(rng, catalog, programs)
+        if pair is None:
+            continue
+        checked += 1
+        for problem in await check_pair(settings, model, programs, *pair):
+            failures += 1
+            print(f"{pair[0].age}歳/{pair[1].age}歳: {problem}")
+    print(f"{checked} user pairs, {len(model.prompts)} LLM call(s), {failures} problem(s)")
+    return failures
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--programs", type=int, default=200, help="synthetic catalog size")
+    parser.add_argument("--pairs", type=int, default=20, help="user pairs in the same outcome region")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    programs = [Program.model_validate(item) for item in generate_programs(args.programs)]
+    return 1 if asyncio.run(run(programs, args.pairs, args.seed)) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+"""Check the generated rule predicates against the original interpreted checks.
+
+`reference_checks` is a frozen copy of the rule checks `_evaluate_program`
+ran before they were compiled into per-program predicates
+(app/services/rule_predicates.py). The script evaluates random and
+boundary-value users against a synthetic catalog plus hand-written edge
+cases (min > max, empty and long keyword lists, ProgramRecord inputs) and
+exits with status 1 if any Reason list, match count or check count differs.
+Run it after changing MESSAGES or the code generator.
+
+    python scripts/check_rule_predicates.py --programs 400 --users 300
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+sys.path.insert(0, str(Path(__file__).parents[1]))
+
+from app.models import Program, Reason, UserInput  # noqa: E402
+from app.services.program_record import to_records  # noqa: E402
+from app.services.rag_engine import _evaluate_program, compile_catalog  # noqa: E402
+from app.services.rule_predicates import RANGE_FIELDS, compile_predicate  # noqa: E402
+from synthetic_catalog import generate_programs  # noqa: E402
+
+OCCUPATIONS = ("会社員", "公務員", "自営業", "フリーランス", "学生", "無職", "", "年金受給者", "経営者", "求職中")
+GENDERS = (None, "", "男性", "女性", " 女性 ", "その他", "妊婦")
+USER_FIELDS = ("age", "income_yen", "household", "dependents")
+
+
+def reference_checks(user: UserInput, eligibility) -> Tuple[List[Reason], int, int]:
+    reasons: List[Reason] = []
+
+    total_checks = 0
+    matched = 0
+    evidence_ref = 0
+
+    def add_check(is_match: bool, ok_text: str, ng_text: str) -> None:
+        nonlocal total_checks, matched
+        total_checks += 1
+        if is_match:
+            matched += 1
+            if ok_text:
+                reasons.append(Reason(text=ok_text, evidence_ref=evidence_ref))
+            return
+        if ng_text:
+            reasons.append(Reason(text=ng_text, evidence_ref=evidence_ref))
+
+    # Age
+    if eligibility.age_min is not None or eligibility.age_max is not None:
+        ok = True
+        if eligibility.age_min is not None and user.age < eligibility.age_min:
+            ok = False
+            add_check(
+                False,
+                "",
+                f"年齢が{eligibility.age_min}歳以上に満たないため対象外の可能性。{eligibility.age_min}歳以上で対象になります。",
+            )
+        if eligibility.age_max is not None and user.age > eligibility.age_max:
+            ok = False
+            add_check(
+                False,
+                "",
+                f"年齢が{eligibility.age_max}歳以下に収まらないため対象外の可能性。{eligibility.age_max}歳以下で対象になります。",
+            )
+        if ok:
+            add_check(True, "対象年齢に該当する", "")
+
+    # Income
+    if eligibility.income_min_yen is not None or eligibility.income_max_yen is not None:
+        ok = True
+        if eligibility.income_min_yen is not None and user.income_yen < eligibility.income_min_yen:
+            ok = False
+            add_check(
+                False,
+                "",
+                f"所得が下限（{eligibility.income_min_yen:,}円）に達していないため対象外の可能性。",
+            )
+        if eligibility.income_max_yen is not None and user.income_yen > eligibility.income_max_yen:
+            ok = False
+            add_check(
+                False,
+                "",
+                f"所得が上限（{eligibility.income_max_yen:,}円）を超えているため対象外の可能性。控除後所得で再確認してください。",
+            )
+        if ok:
+            if eligibility.income_min_yen is not None and eligibility.income_max_yen is not None:
+                add_check(True, "所得レンジの条件に該当する", "")
+            elif eligibility.income_min_yen is not None:
+                add_check(True, "所得下限の条件に該当する", "")
+            else:
+                add_check(True, "所得上限に該当する", "")
+
+    # Household
+    if eligibility.household_min is not None or eligibility.household_max is not None:
+        ok = True
+        if eligibility.household_min is not None and user.household < eligibility.household_min:
+            ok = False
+            add_check(
+                False,
+                "",
+                f"世帯人数が{eligibility.household_min}人以上に満たないため対象外の可能性。条件を満たす世帯構成で確認してください。",
+            )
+        if eligibility.household_max is not None and user.household > eligibility.household_max:
+            ok = False
+            add_check(
+                False,
+                "",
+                f"世帯人数が{eligibility.household_max}人以下に収まらないため対象外の可能性。住民票の分離条件を確認してください。",
+            )
+        if ok:
+            add_check(True, "世帯条件に該当する", "")
+
+    # Dependents
+    if eligibility.dependents_min is not None or eligibility.dependents_max is not None:
+        dependents = user.dependents or 0
+        ok = True
+        if eligibility.dependents_min is not None and dependents < eligibility.dependents_min:
+            ok = False
+            add_check(
+                False,
+                "",
+                f"扶養人数が{eligibility.dependents_min}人以上に満たないため対象外の可能性。妊娠中の届出など例外条件を確認してください。",
+            )
+        if eligibility.dependents_max is not None and dependents > eligibility.dependents_max:
+            ok = False
+            add_check(
+                False,
+                "",
+                f"扶養人数が{eligibility.dependents_max}人以下に収まらないため対象外の可能性。世帯構成の条件を確認してください。",
+            )
+        if ok:
+            add_check(True, "扶養人数の条件に該当する", "")
+
+    # Gender
+    if eligibility.gender_keywords:
+        user_gender = (user.gender or "").strip()
+        if not user_gender:
+            add_check(
+                False,
+                "",
+                f"性別条件（{', '.join(eligibility.gender_keywords)}）の判定に必要な情報が未入力です。",
+            )
+        elif any(keyword in user_gender for keyword in eligibility.gender_keywords):
+            add_check(True, "性別条件に該当する", "")
+        else:
+            add_check(
+                False,
+                "",
+                f"性別条件（{', '.join(eligibility.gender_keywords)}）に合致しないため対象外の可能性。",
+            )
+
+    # Occupation
+    if eligibility.occupation_keywords:
+        keywords = eligibility.occupation_keywords
+        occupation = user.occupation or ""
+        if any(key in occupation for key in keywords):
+            add_check(True, "職業条件に合致する", "")
+        else:
+            add_check(
+                False,
+                "",
+                "職業条件に合致しない可能性。経営者や求職者など対象となる区分で申請できるか確認してください。",
+            )
+
+    return reasons, matched, total_checks
+
+
+def edge_programs(template: Program) -> List[Program]:
+    base = template.model_dump()
+
+    def make(**eligibility) -> Program:
+        return Program.model_validate({**base, "eligibility": eligibility})
+
+    return [
+        make(),
+        make(age_min=60, age_max=20),
+        make(gender_keywords=[]),
+        make(gender_keywords=["女性", "女", "母", "妊婦", "ひとり親"]),
+        make(occupation_keywords=["会社員", "自営", "学生", "無職", "年金", "経営"]),
+        make(income_min_yen=1_000_000),
+        make(income_max_yen=3_000_000),
+        make(income_min_yen=1_000_000, income_max_yen=3_000_000, household_min=2, household_max=2),
+        make(dependents_min=1, dependents_max=1, household_max=2, gender_keywords=["男性"], occupation_keywords=["会社員"]),
+    ]
+
+
+def sample_users(programs: Sequence[Program], count: int, rng: random.Random) -> List[UserInput]:
+    # しきい値ちょうど・前後の値を混ぜ、境界の < / > の取り違えを検出できるようにする
+    boundaries: List[List[int]] = [[] for _ in RANGE_FIELDS]
+    for program in programs:
+        for dimension, names in enumerate(RANGE_FIELDS):
+            for name in names:
+                value = getattr(program.eligibility, name)
+                if value is not None:
+                    boundaries[dimension] += [value - 1, value, value + 1]
+    randoms = (
+        lambda: rng.randint(0, 100),
+        lambda: rng.choice([0, rng.randint(0, 12_000_000), rng.randint(0, 300) * 10_000]),
+        lambda: rng.randint(1, 8),
+        lambda: rng.choice([0, 1, 2, 3, 5]),
+    )
+    users = []
+    for _ in range(count):
+        values = {}
+        for dimension, field in enumerate(USER_FIELDS):
+            if boundaries[dimension] and rng.random() < 0.5:
+                values[field] = max(0, rng.choice(boundaries[dimension]))
+            else:
+                values[field] = randoms[dimension]()
+        values["household"] = max(1, values["household"])
+        if rng.random() < 0.2:
+            values["dependents"] = None
+        users.append(UserInput(**values, occupation=rng.choice(OCCUPATIONS), gender=rng.choice(GENDERS)))
+    return users
+
+
+def compare(users: Sequence[UserInput], programs: Sequence[object]) -> List[str]:
+    mismatches = []
+    catalog = compile_catalog(programs)
+    for user in users:
+        for position, program in enumerate(programs):
+            expected = reference_checks(user, program.eligibility)
+            results = {
+                "compile_predicate": compile_predicate(program.eligibility)(user),
+                "catalog": catalog.predicates[position](user),
+            }
+            for name, verdict in results.items():
+                actual = (verdict.reasons, verdict.matched, verdict.total)
+                if actual != expected:
+                    mismatches.append(f"{name}: {program.program_id} {user!r}: expected {expected!r}, got {actual!r}")
+            evaluation = _evaluate_program(user, program)
+            if (evaluation.reasons, evaluation.matched_checks, evaluation.total_checks) != expected:
+                mismatches.append(f"_evaluate_program: {program.program_id} {user!r}")
+    return mismatches
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--programs", type=int, default=400)
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    programs = [Program.model_validate(item) for item in generate_programs(args.programs, seed=args.seed)]
+    programs += edge_programs(programs[0])
+    users = sample_users(programs, args.users, rng)
+    catalogs = {"Program": programs, "ProgramRecord": to_records(programs)}
+
+    failed = False
+    for name, catalog in catalogs.items():
+        mismatches = compare(users, catalog)
+        print(f"{name}: {len(users) * len(catalog)} user x program pairs, {len(mismatches)} mismatch(es)")
+        for line in mismatches[:10]:
+            print(f"  {line}")
+        failed = failed or bool(mismatches)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+"""Compile data/seed_programs.json into the memory-mapped catalog snapshot.
+
+    python scripts/compile_catalog_snapshot.py [--input PATH] [--output PATH]
+
+LocalStore only uses the snapshot while its recorded SHA-256 matches the JSON,
+so re-run this after editing the seed file.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parents[1]))
+
+from app.services.catalog_snapshot import compile_snapshot  # noqa: E402
+from app.services.local_store import SEED_FILE, SNAPSHOT_FILE  # noqa: E402
+
+DATA_DIR = Path(__file__).parents[1] / "data"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--input", type=Path, default=DATA_DIR / SEED_FILE)
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+    output = args.output or args.input.with_name(SNAPSHOT_FILE)
+
+    started = time.perf_counter()
+    count = compile_snapshot(args.input, output)
+    elapsed = time.perf_counter() - started
+    print(f"Compiled {count} programs into {output} ({output.stat().st_size} bytes, {elapsed:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+"""Local stand-in for Vertex AI used by load tests (fully offline).
+
+Answers the requests of app.services.http_stub_model.HttpStubModel with a
+result for every `[program_id]` in the prompt. Latency before the first
+byte follows a configurable distribution, and a share of the calls fail
+with an HTTP error or return malformed JSON (truncated or garbled).
+Start the API with VERTEX_STUB_URL=http://127.0.0.1:<port> to use it.
+
+    python scripts/fake_vertex_server.py --port 9100 --latency lognormal:1.5,0.4 \\
+        --error-rate 0.02 --malformed-rate 0.05
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import math
+import random
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from llm_stub import fake_response_text, prompt_program_ids
+
+LATENCY_KINDS = ("const", "uniform", "normal", "lognormal", "exp")
+
+
+def latency_sampler(spec: str, rng: random.Random) -> Callable[[], float]:
+    """Parse `kind:params` (seconds) into a sampler.
+
+    const:0.8 / uniform:0.5,2.0 / normal:1.0,0.3 / lognormal:<median>,<sigma> / exp:<mean>
+    """
+    kind, _, raw = spec.partition(":")
+    params = [float(value) for value in raw.split(",") if value]
+    if kind == "const":
+        return lambda: params[0]
+    if kind == "uniform":
+        return lambda: rng.uniform(params[0], params[1])
+    if kind == "normal":
+        return lambda: max(0.0, rng.gauss(params[0], params[1]))
+    if kind == "lognormal":
+        mu = math.log(params[0])
+        return lambda: rng.lognormvariate(mu, params[1])
+    if kind == "exp":
+        return lambda: rng.expovariate(1.0 / params[0])
+    raise ValueError(f"unknown latency distribution {kind!r} (expected one of {', '.join(LATENCY_KINDS)})")
+
+
+@dataclass
+class FakeConfig:
+    latency: Callable[[], float]
+    error_rate: float
+    error_status: int
+    malformed_rate: float
+    chunk_size: int
+    chunk_delay: float
+    rng: random.Random
+    counters: dict = field(default_factory=lambda: {"requests": 0, "errors": 0, "malformed": 0, "programs": 0})
+
+
+def malform(text: str, rng: random.Random) -> str:
+    # 途中で切れた応答と、JSON として壊れた応答を半々で返す
+    if rng.random() < 0.5:
+        return text[: rng.randint(1, max(1, len(text) - 1))]
+    position = rng.randint(0, len(text))
+    return text[:position] + "}{,\"broken" + text[position:]
+
+
+def create_app(config: FakeConfig) -> FastAPI:
+    app = FastAPI(title="fake vertex")
+
+    @app.get("/stats")
+    async def stats() -> dict:
+        return config.counters
+
+    @app.post("/models/{model}:generateContent")
+    async def generate(model: str, request: Request):
+        body = await request.json()
+        config.counters["requests"] += 1
+        await asyncio.sleep(config.latency())
+        if config.rng.random() < config.error_rate:
+            config.counters["errors"] += 1
+            return JSONResponse({"error": "injected failure"}, status_code=config.error_status)
+
+        program_ids = prompt_program_ids(body.get("prompt", ""))
+        config.counters["programs"] += len(program_ids)
+        text = fake_response_text(program_ids)
+        if config.rng.random() < config.malformed_rate:
+            config.counters["malformed"] += 1
+            text = malform(text, config.rng)
+        if not body.get("stream"):
+            return {"text": text}
+        return StreamingResponse(chunks(text, config), media_type="text/plain; charset=utf-8")
+
+    return app
+
+
+async def chunks(text: str, config: FakeConfig) -> AsyncIterator[str]:
+    for start in range(0, len(text), config.chunk_size):
+        if start and config.chunk_delay:
+            await asyncio.sleep(config.chunk_delay)
+        yield text[start : start + config.chunk_size]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", default="lognormal:1.0,0.3", help="time to first byte, e.g. const:0.5")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--chunk-size", type=int, default=256, help="characters per streamed chunk")
+    parser.add_argument("--chunk-delay", type=float, default=0.01, help="seconds between streamed chunks")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    config = FakeConfig(
+        latency=latency_sampler(args.latency, rng),
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        malformed_rate=args.malformed_rate,
+        chunk_size=args.chunk_size,
+        chunk_delay=args.chunk_delay,
+        rng=rng,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
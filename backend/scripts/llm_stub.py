@@ -0,0 +1,70 @@
+"""In-process stand-in for the Vertex AI GenerativeModel used by benchmarks.
+
+The stub answers every prompt with a well-formed result for each program id
+found in the prompt (`[program_id]` lines), so the whole LLM path —
+prompt building, streaming parse and validation — runs without network.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import re
+from typing import AsyncIterator, List
+
+PROGRAM_ID_LINE = re.compile(r"^\[(.+?)\]$", re.M)
+
+
+def prompt_program_ids(prompt: str) -> List[str]:
+    return PROGRAM_ID_LINE.findall(prompt)
+
+
+def fake_result(program_id: str) -> dict:
+    return {
+        "program_id": program_id,
+        "reasons": [
+            {"text": f"{program_id} の対象条件を満たしています", "evidence_ref": 0},
+            {"text": "申請前に必要書類を確認してください", "evidence_ref": 0},
+        ],
+        "deadline": {"date": "2026-12-31", "evidence_ref": None},
+        "todo": [
+            {"text": "区の窓口に申請方法を確認する", "evidence_ref": 0},
+            {"text": "必要書類をそろえる", "evidence_ref": 0},
+        ],
+        "evidence": [
+            {"page": 1, "source_url": "https://www.city.minato.tokyo.jp/", "snippet": "制度概要"},
+            {"page": 2, "source_url": "https://www.city.minato.tokyo.jp/", "snippet": "対象者"},
+        ],
+    }
+
+
+def fake_response_text(program_ids: List[str]) -> str:
+    return json.dumps({"results": [fake_result(program_id) for program_id in program_ids]}, ensure_ascii=False)
+
+
+class StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class StubModel:
+    """Mimics `generate_content` / `generate_content_async` (including stream=True)."""
+
+    def __init__(self, latency: float = 0.0, chunk_size: int = 512):
+        self.latency = latency
+        self.chunk_size = chunk_size
+
+    def generate_content(self, prompt: str, generation_config=None, stream: bool = False) -> StubResponse:
+        return StubResponse(fake_response_text(prompt_program_ids(prompt)))
+
+    async def generate_content_async(self, prompt: str, generation_config=None, stream: bool = False):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        text = fake_response_text(prompt_program_ids(prompt))
+        if not stream:
+            return StubResponse(text)
+        return self._chunks(text)
+
+    async def _chunks(self, text: str) -> AsyncIterator[StubResponse]:
+        for start in range(0, len(text), self.chunk_size):
+            yield StubResponse(text[start : start + self.chunk_size])
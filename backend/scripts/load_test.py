@@ -0,0 +1,301 @@
+#!/usr/bin/env python
+"""Open-loop load test of /api/recommendations against a fake Vertex AI.
+
+Starts scripts/fake_vertex_server.py and the API (uvicorn, with
+VERTEX_STUB_URL pointing at the fake server), then sends requests built from
+synthetic UserInput profiles at a fixed arrival rate (Poisson arrivals that
+do not wait for earlier responses). For each rate it reports throughput,
+status counts and p50/p95/p99 latency of the end-to-end request and of each
+server stage (Server-Timing: rules / llm / merge). Runs fully offline.
+
+    python scripts/load_test.py --rates 5 10 20 --duration 30 --fake-latency lognormal:1.5,0.4
+    python scripts/load_test.py --target http://127.0.0.1:8000 --rates 10   # already running API
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+BACKEND_DIR = Path(__file__).parents[1]
+SCRIPTS_DIR = Path(__file__).parent
+OCCUPATIONS = ("会社員", "公務員", "自営業", "フリーランス", "パート・アルバイト", "学生", "無職", "年金受給者")
+GENDERS = (None, "男性", "女性")
+STAGES = ("rules", "llm", "merge", "total")
+
+
+@dataclass
+class Sample:
+    scheduled: float
+    status: int
+    latency: float
+    stages: Dict[str, float] = field(default_factory=dict)
+    error: Optional[str] = None
+
+
+def synthetic_profiles(count: int, seed: int) -> List[dict]:
+    rng = random.Random(seed)
+    profiles = []
+    for _ in range(count):
+        household = rng.randint(1, 6)
+        profile = {
+            "age": rng.randint(18, 85),
+            "income_yen": int(rng.lognormvariate(15.2, 0.6)) // 10000 * 10000,
+            "household": household,
+            "dependents": rng.randint(0, household - 1),
+            "occupation": rng.choice(OCCUPATIONS),
+        }
+        gender = rng.choice(GENDERS)
+        if gender:
+            profile["gender"] = gender
+        profiles.append(profile)
+    return profiles
+
+
+def parse_server_timing(header: str) -> Dict[str, float]:
+    stages = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip() == "dur":
+                stages[name] = float(value) / 1000
+    return stages
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+async def run_rate(
+    client: httpx.AsyncClient,
+    rate: float,
+    duration: float,
+    profiles: List[dict],
+    rng: random.Random,
+    drain_timeout: float,
+) -> dict:
+    samples: List[Sample] = []
+
+    async def fire(scheduled: float, profile: dict) -> None:
+        # 遅延は予定時刻から測る（クライアント側の送信遅れも含め、coordinated omission を避ける）
+        try:
+            response = await client.post("/api/recommendations", json=profile)
+        except httpx.HTTPError as exc:
+            samples.append(Sample(scheduled, 0, time.perf_counter() - scheduled, error=type(exc).__name__))
+            return
+        samples.append(
+            Sample(
+                scheduled,
+                response.status_code,
+                time.perf_counter() - scheduled,
+                parse_server_timing(response.headers.get("server-timing", "")),
+            )
+        )
+
+    tasks = []
+    started = time.perf_counter()
+    next_at = started
+    while next_at < started + duration:
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.ensure_future(fire(next_at, rng.choice(profiles))))
+        next_at += rng.expovariate(rate)
+    _, pending = await asyncio.wait(tasks, timeout=drain_timeout) if tasks else (set(), set())
+    for task in pending:
+        task.cancel()
+    # スループットは最初の送信から最後の応答までの区間で割る
+    finished = max((sample.scheduled + sample.latency for sample in samples), default=started)
+    return summarize(rate, duration, finished - started, samples, len(pending))
+
+
+def summarize(rate: float, duration: float, elapsed: float, samples: List[Sample], unfinished: int) -> dict:
+    ok = [sample for sample in samples if 200 <= sample.status < 300]
+    statuses: Dict[str, int] = {}
+    for sample in samples:
+        key = str(sample.status) if sample.status else (sample.error or "error")
+        statuses[key] = statuses.get(key, 0) + 1
+    if unfinished:
+        statuses["unfinished"] = unfinished
+    latencies = {"request": [sample.latency for sample in ok]}
+    for stage in STAGES:
+        latencies[f"server:{stage}"] = [sample.stages[stage] for sample in ok if stage in sample.stages]
+    return {
+        "offered_rps": rate,
+        "sent": len(samples) + unfinished,
+        "throughput_rps": len(ok) / elapsed if elapsed else 0.0,
+        "success_ratio": len(ok) / (len(samples) + unfinished) if samples or unfinished else 0.0,
+        "duration": duration,
+        "statuses": statuses,
+        "latency": {
+            name: {
+                "p50": percentile(values, 0.50),
+                "p95": percentile(values, 0.95),
+                "p99": percentile(values, 0.99),
+            }
+            for name, values in latencies.items()
+        },
+    }
+
+
+def print_report(report: dict) -> None:
+    print(
+        f"== {report['offered_rps']:g} req/s offered: sent {report['sent']}, "
+        f"throughput {report['throughput_rps']:.2f} req/s, success {report['success_ratio'] * 100:.1f}%"
+    )
+    print(f"  statuses: {json.dumps(report['statuses'])}")
+    print(f"  {'stage':<16} {'p50':>10} {'p95':>10} {'p99':>10}")
+    for name, values in report["latency"].items():
+        cells = ["n/a" if values[key] is None else f"{values[key] * 1000:.1f}ms" for key in ("p50", "p95", "p99")]
+        print(f"  {name:<16} {cells[0]:>10} {cells[1]:>10} {cells[2]:>10}")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until(url: str, timeout: float, process: subprocess.Popen) -> None:
+    deadline = time.perf_counter() + timeout
+    with httpx.Client(timeout=1.0) as client:
+        while time.perf_counter() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"process exited with {process.returncode} before {url} answered")
+            try:
+                if client.get(url).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            time.sleep(0.05)
+    raise RuntimeError(f"{url} did not become ready within {timeout}s")
+
+
+def start(stack: ExitStack, command: List[str], env: Dict[str, str], log: Optional[Path]) -> subprocess.Popen:
+    output = open(log, "ab") if log else subprocess.DEVNULL
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=output, stderr=subprocess.STDOUT)
+
+    def stop() -> None:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        if log:
+            output.close()
+
+    stack.callback(stop)
+    return process
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rates", type=float, nargs="+", default=[5.0, 10.0, 20.0], help="requests per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of traffic per rate")
+    parser.add_argument("--drain-timeout", type=float, default=120.0)
+    parser.add_argument("--profiles", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--target", default=None, help="use an already running API instead of starting one")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers of the started API")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="extra env for the API")
+    parser.add_argument("--fake-latency", default="lognormal:1.0,0.3")
+    parser.add_argument("--fake-error-rate", type=float, default=0.0)
+    parser.add_argument("--fake-malformed-rate", type=float, default=0.0)
+    parser.add_argument("--fake-chunk-delay", type=float, default=0.01)
+    parser.add_argument("--log-dir", type=Path, default=None, help="write server logs here")
+    parser.add_argument("--json", type=Path, default=None, help="write the reports as JSON")
+    args = parser.parse_args()
+
+    profiles = synthetic_profiles(args.profiles, args.seed)
+    rng = random.Random(args.seed)
+    if args.log_dir:
+        args.log_dir.mkdir(parents=True, exist_ok=True)
+
+    with ExitStack() as stack:
+        fake_stats_url = None
+        target = args.target
+        if target is None:
+            fake_port, api_port = free_port(), free_port()
+            fake = start(
+                stack,
+                [
+                    sys.executable,
+                    str(SCRIPTS_DIR / "fake_vertex_server.py"),
+                    "--port", str(fake_port),
+                    "--latency", args.fake_latency,
+                    "--error-rate", str(args.fake_error_rate),
+                    "--malformed-rate", str(args.fake_malformed_rate),
+                    "--chunk-delay", str(args.fake_chunk_delay),
+                    "--seed", str(args.seed),
+                ],
+                dict(os.environ),
+                args.log_dir / "fake_vertex.log" if args.log_dir else None,
+            )
+            wait_until(f"http://127.0.0.1:{fake_port}/stats", 30, fake)
+            fake_stats_url = f"http://127.0.0.1:{fake_port}/stats"
+
+            # 外部サービスに一切つながないよう、DB・キャッシュ・本物の Vertex AI は使わない
+            env = dict(os.environ)
+            env.update(
+                USE_MYSQL="false",
+                USE_FIRESTORE="false",
+                USE_VERTEX_AI="true",
+                VERTEX_STUB_URL=f"http://127.0.0.1:{fake_port}",
+                LLM_CACHE_ENABLED="false",
+            )
+            env.update(item.split("=", 1) for item in args.env)
+            api = start(
+                stack,
+                [
+                    sys.executable, "-m", "uvicorn", "app.main:app",
+                    "--host", "127.0.0.1", "--port", str(api_port),
+                    "--workers", str(args.workers), "--log-level", "warning",
+                ],
+                env,
+                args.log_dir / "api.log" if args.log_dir else None,
+            )
+            target = f"http://127.0.0.1:{api_port}"
+            wait_until(f"{target}/api/ready", 60, api)
+
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+        reports = []
+
+        async def run_all() -> None:
+            async with httpx.AsyncClient(base_url=target, timeout=args.drain_timeout, limits=limits) as client:
+                for rate in args.rates:
+                    report = await run_rate(client, rate, args.duration, profiles, rng, args.drain_timeout)
+                    print_report(report)
+                    reports.append(report)
+
+        asyncio.run(run_all())
+        fake_stats = httpx.get(fake_stats_url).json() if fake_stats_url else None
+        if fake_stats is not None:
+            print(f"fake vertex: {json.dumps(fake_stats)}")
+
+    if args.json:
+        args.json.write_text(
+            json.dumps({"target": args.target, "reports": reports, "fake_vertex": fake_stats}, ensure_ascii=False, indent=2),
+            encoding="utf-8",
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -64,10 +64,22 @@ try:
         eligibility JSON,
         deadline DATE,
         gray_zone_guidance JSON,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
     )
     """
     cur.execute(create_table_sql)
+    # 既存テーブルにはカタログキャッシュの版確認に使う updated_at を追加する
+    cur.execute(
+        "SELECT COUNT(*) FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = %s AND TABLE_NAME = 'programs' AND COLUMN_NAME = 'updated_at'",
+        (cfg["database"],),
+    )
+    if cur.fetchone()[0] == 0:
+        cur.execute(
+            "ALTER TABLE programs ADD COLUMN updated_at TIMESTAMP "
+            "DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP"
+        )
     cur.execute("ALTER TABLE programs CONVERT TO CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
     print("Table 'programs' created/verified.")
 
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""Generate synthetic program catalogs for benchmarks.
+
+Programs are derived from data/seed_programs.json with unique ids and jittered
+eligibility ranges, spread over several municipalities.
+
+    python scripts/synthetic_catalog.py 100000 /tmp/catalog/seed_programs.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import json
+import random
+from pathlib import Path
+from typing import List, Sequence
+
+SEED_PATH = Path(__file__).parents[1] / "data" / "seed_programs.json"
+MUNICIPALITIES = ("港区", "千代田区", "中央区", "新宿区", "渋谷区")
+
+
+def generate_programs(
+    count: int,
+    seed: int = 0,
+    municipalities: Sequence[str] = MUNICIPALITIES,
+) -> List[dict]:
+    templates = json.loads(SEED_PATH.read_text(encoding="utf-8"))
+    rng = random.Random(seed)
+    programs = []
+    for idx in range(count):
+        program = copy.deepcopy(templates[idx % len(templates)])
+        municipality = municipalities[idx % len(municipalities)]
+        program["program_id"] = f"{program['program_id']}_{idx:06d}"
+        program["program_name"] = f"{program['program_name']} #{idx}"
+        program["municipality"] = municipality
+        eligibility = program["eligibility"]
+        for field, spread in (("age_min", 10), ("age_max", 10), ("income_min_yen", 2_000_000), ("income_max_yen", 2_000_000)):
+            value = eligibility.get(field)
+            if value is not None:
+                eligibility[field] = max(0, value + rng.randint(-spread, spread))
+        programs.append(program)
+    return programs
+
+
+def write_catalog(path: Path, count: int, seed: int = 0) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(generate_programs(count, seed), ensure_ascii=False), encoding="utf-8")
+    return path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("count", type=int)
+    parser.add_argument("output", type=Path)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    write_catalog(args.output, args.count, args.seed)
+    print(f"Wrote {args.count} programs to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -16,6 +16,16 @@ resource "google_cloud_run_v2_service" "default" {
         container_port = 8080
       }
 
+      # カタログの読み込みなど起動処理が終わってからトラフィックを流す
+      startup_probe {
+        http_get {
+          path = "/api/ready"
+        }
+        period_seconds    = 1
+        timeout_seconds   = 1
+        failure_threshold = 60
+      }
+
       volume_mounts {
         name       = "cloudsql"
         mount_path = "/cloudsql"